@@ -0,0 +1,63 @@
+# JSON read API (/api/v1/feed, /api/v1/resources/<id>): the public shape of
+# a post, sparse fieldsets and the `since` stamp of delta responses. The
+# routes in app.py load the posts; responses are compressed by
+# compression.py like every other page.
+from datetime import datetime
+
+API_VERSION = 1
+
+# Fields a client can ask for (`fields=id,upvotes_count,latest_status`); id
+# is always sent
+FIELDS = ('id', 'name', 'content', 'image_url', 'image_variants', 'upvotes_count', 'comments_count',
+          'created_at', 'latest_status', 'author_name', 'importance', 'importance_rank', 'version',
+          'can_edit', 'can_delete')
+
+
+def parse_fields(value):
+    """Requested fields in FIELDS order (all of them when `value` is empty);
+    raises ValueError naming unknown ones."""
+    if not value:
+        return FIELDS
+    wanted = {f.strip() for f in value.split(',') if f.strip()}
+    unknown = wanted.difference(FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))} (choose from {', '.join(FIELDS)})")
+    return tuple(f for f in FIELDS if f == 'id' or f in wanted)
+
+
+def parse_since(value):
+    """A delta's `since` (the `as_of` of an earlier response, or ISO 8601) as
+    a version stamp; None when absent."""
+    if value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        raise ValueError('since must be a timestamp (the as_of of an earlier response) or ISO 8601')
+
+
+def status_fields(status):
+    """The part of a status update row a client shows."""
+    if not status:
+        return None
+    return {
+        'status_message': status.get('status_message') or '',
+        'crowd_level': status.get('crowd_level') or '',
+        'importance': status.get('chips_available') or '',
+        'queue_length': status.get('queue_length') or '',
+        'created_at': status.get('created_at'),
+    }
+
+
+def serialize(post, fields):
+    item = {}
+    for field in fields:
+        value = post.get(field)
+        if field == 'latest_status':
+            value = status_fields(value)
+        item[field] = value
+    return item
@@ -1,14 +1,103 @@
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify
-from uuid import uuid4
-from supabase import create_client, Client
+from flask import Flask, Blueprint, current_app, render_template, request, redirect, url_for, session, jsonify, Response, stream_with_context, send_from_directory, abort, make_response
+from flask import before_render_template, template_rendered
+from uuid import uuid4, uuid5, NAMESPACE_URL
+import base64
+import bisect
+import hashlib
+import hmac
+import json
+import logging
+import mimetypes
+import re
+import threading
+import time
+from markupsafe import Markup
+from werkzeug.local import LocalProxy
 import os
 from config import Config
 from datetime import datetime, timedelta, timezone
+from cache import make_cache
+from clients import get_supabase, local_database, make_client, reset_request_client
+from fanout import gather
+from auth_tokens import refresh_tokens, seal_token, unseal_token, verify_access_token
+from upvotes import UpvoteEngine, make_upvote_store
+from profiles import ProfileCache
+from search import blend, make_search
+import summary
+import ingest
+import api
+import compression
+import assets
+import click
+from events import make_event_bus, format_sse
+import queue
+import instrumentation
+from uploads import ImagePipeline, LocalImageStorage, UploadError, make_image_storage, spool_upload
+from jobs import JobQueue
+from ratelimit import make_rate_limiting
+from sessions import make_session_interface
+import retention
 
-supabase_url = Config.SUPABASE_URL
-supabase_key = Config.SUPABASE_KEY
+# Each request gets its own Supabase client (its own auth state) on top of a
+# shared keep-alive connection pool, see clients.py
+supabase = LocalProxy(get_supabase)
 
-supabase: Client = create_client(supabase_url, supabase_key)
+# User-independent feed data shared by every request: 'post:<id>' holds the
+# formatted post without per-viewer flags, 'page:<feed version>:...' the ids
+# of a feed page, 'order' the sort keys of the whole feed (for deltas, and
+# pages until sql/feed_views.sql has been run)
+feed_cache = make_cache(Config.FEED_CACHE_URL, max_entries=Config.FEED_CACHE_MAX_ENTRIES,
+                        ttl=Config.FEED_CACHE_TTL, prefix='morphx:feed:')
+
+# Posts whose delete job is queued, by id; never evicted (a mark must last
+# until its job is done or dead), so on Redis use a noeviction policy
+delete_marks = make_cache(Config.FEED_CACHE_URL, max_entries=None, ttl=Config.FEED_CACHE_TTL,
+                          prefix='morphx:deleting:')
+
+# Time of the last write to each post ('post:<id>') and to the feed as a
+# whole ('feed'); they key rendered cards and the pages' ETags
+post_versions = make_cache(Config.FEED_CACHE_URL, max_entries=Config.POST_VERSION_MAX_ENTRIES,
+                           ttl=Config.POST_VERSION_TTL, prefix='morphx:version:')
+# Rendered _post_card.html per post version and viewer class
+card_cache = make_cache(Config.FEED_CACHE_URL, max_entries=Config.CARD_CACHE_MAX_ENTRIES,
+                        ttl=Config.CARD_CACHE_TTL, prefix='morphx:card:')
+
+# Time of the newest ingested reading per resource ('<resource_id>'), so
+# bulk ingestion can drop older ones that arrive late
+ingest_watermarks = make_cache(Config.FEED_CACHE_URL, max_entries=Config.INGEST_WATERMARK_MAX_ENTRIES,
+                               ttl=Config.INGEST_WATERMARK_TTL, prefix='morphx:ingest:')
+
+# Live per-post updates pushed to /events subscribers
+event_bus = make_event_bus(Config.EVENT_BROKER_URL)
+SSE_HEARTBEAT_SECONDS = 15
+_sse_streams = 0
+_sse_streams_lock = threading.Lock()
+
+# Deferred write-side work (cascading deletes, image cleanup, secondary
+# writes) run after the response from a durable outbox (see jobs.py)
+job_queue = JobQueue(Config.JOB_OUTBOX_PATH,
+                     workers=Config.JOB_WORKERS,
+                     max_attempts=Config.JOB_MAX_ATTEMPTS,
+                     base_delay=Config.JOB_RETRY_BASE_DELAY,
+                     max_delay=Config.JOB_RETRY_MAX_DELAY,
+                     lease=Config.JOB_LEASE_SECONDS)
+
+# Post search; the in-memory index follows the event bus (see search.py)
+search_backend = make_search(Config.SEARCH_BACKEND_URL,
+                             load_documents=lambda ids: load_search_documents(ids),
+                             events=event_bus,
+                             get_client=lambda: supabase,
+                             rebuild_interval=Config.SEARCH_REBUILD_INTERVAL)
+
+# Uploaded images are resized and stored off the request thread
+image_pipeline = ImagePipeline(make_image_storage(Config.IMAGE_STORAGE_URL),
+                               widths=Config.IMAGE_VARIANT_WIDTHS,
+                               workers=Config.IMAGE_WORKERS,
+                               upload_workers=Config.IMAGE_UPLOAD_WORKERS)
+
+
+# Fraction of an access token's lifetime after which a request refreshes it
+TOKEN_REFRESH_AFTER = 0.5
 
 
 def save_sb_session(auth_session):
@@ -19,134 +108,941 @@ def save_sb_session(auth_session):
     # Supabase returns expires_in (seconds)
     expires_at = datetime.now(timezone.utc) + timedelta(seconds=auth_session.expires_in)
     session['sb_expires_at'] = expires_at.timestamp()
+    session['sb_refresh_at'] = refresh_due(expires_at.timestamp())
+    # new id for the signed-in session
+    if hasattr(session, 'regenerate'):
+        session.regenerate()
+
+
+def refresh_due(expires_at):
+    """When to refresh a token expiring at `expires_at`: halfway through its
+    lifetime, so the token handed to background work always has a good part
+    of it left."""
+    now_ts = datetime.now(timezone.utc).timestamp()
+    return now_ts + max(0, expires_at - now_ts) * TOKEN_REFRESH_AFTER
 
 
 def ensure_sb_session():
     # If no tokens, not logged in
     if not session.get('sb_access') or not session.get('sb_refresh'):
         return False
-    # Refresh if expiring in < 2 minutes
+    # Refresh once past refresh_due() or expiring in < 2 minutes (once per
+    # refresh token, shared by concurrent requests)
     now_ts = datetime.now(timezone.utc).timestamp()
-    if session.get('sb_expires_at', 0) - now_ts < 120:
-        try:
-            # Set current session on client and refresh
-            supabase.auth.set_session(session['sb_access'], session['sb_refresh'])
-            refreshed = supabase.auth.refresh_session()
-            save_sb_session(refreshed.session)
-        except Exception as e:
-            print(f"Supabase refresh failed: {e}")
+    expires_at = session.get('sb_expires_at', 0)
+    if now_ts >= session.get('sb_refresh_at', expires_at) or expires_at - now_ts < 120:
+        tokens = refresh_tokens(session['sb_refresh'])
+        if not tokens:
             return False
+        session['sb_access'] = tokens['access_token']
+        session['sb_refresh'] = tokens['refresh_token']
+        session['sb_expires_at'] = tokens['expires_at']
+        session['sb_refresh_at'] = refresh_due(tokens['expires_at'])
+        # rebuild the request's client with the new access token
+        reset_request_client()
+    # Verify signature and expiry (locally, or with the auth server when no
+    # key is configured); once per token, since only the server writes the
+    # session
+    if session.get('sb_verified') == session['sb_expires_at']:
+        return True
+    claims = verify_access_token(session['sb_access'])
+    if not claims:
+        return False
+    if session.get('user_id') and claims.get('sub') not in (None, session['user_id']):
+        return False
+    session['sb_verified'] = session['sb_expires_at']
     return True
 
 
-def set_client_session_from_flask():
-    """Ensure the supabase client carries the user's auth for Storage/DB policies."""
-    access = session.get('sb_access')
-    refresh = session.get('sb_refresh')
-    if access and refresh:
+IMPORTANCE_ORDER = {
+    'critical': 4,
+    'high': 3,
+    'medium': 2,
+    'low': 1
+}
+
+# Bulk feed queries: ids per in_() filter (keeps the URL short) and rows per
+# page (stays under PostgREST's max-rows cap)
+FEED_ID_CHUNK = 100
+FEED_PAGE_ROWS = 1000
+
+# Page sizes for cursor-paginated lists
+FEED_PAGE_SIZE = 20
+COMMENTS_PAGE_SIZE = 50
+PROFILE_PAGE_SIZE = 20
+SEARCH_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# How long a notice for a user (e.g. a failed delete) waits for their next visit
+NOTICE_TTL = 7 * 86400
+
+
+def _chunks(values, size):
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+def select_in(table, columns, column, values, order_by=None, tiebreak='id'):
+    """Fetch every row of `table` whose `column` is in `values`.
+
+    Issues one query per FEED_ID_CHUNK ids (plus one per extra page of
+    FEED_PAGE_ROWS results) instead of one query per value.
+    """
+    rows = []
+    values = list(dict.fromkeys(v for v in values if v))
+    for chunk in _chunks(values, FEED_ID_CHUNK):
+        start = 0
+        while True:
+            query = supabase.table(table).select(columns).in_(column, chunk)
+            if order_by:
+                query = query.order(order_by, desc=True)
+            # unique tie-breaker keeps range() pages stable
+            resp = query.order(tiebreak).range(start, start + FEED_PAGE_ROWS - 1).execute()
+            page = resp.data or []
+            rows.extend(page)
+            if len(page) < FEED_PAGE_ROWS:
+                break
+            start += FEED_PAGE_ROWS
+    return rows
+
+
+# Deterministic like ids make replayed upvote writes idempotent
+UPVOTE_NAMESPACE = uuid5(NAMESPACE_URL, 'morphx/likes')
+
+
+def load_upvoters(resource_id):
+    return [row['user_id'] for row in select_in('likes', 'id,user_id', 'resource_id', [resource_id])]
+
+
+def write_upvotes(ops):
+    """Apply coalesced upvote changes to `likes`.
+
+    One upsert for all new upvotes and one delete per resource, made as the
+    service role when configured, otherwise as each user (for RLS).
+    """
+    by_token = {}
+    for resource_id, user_id, member, access_token in ops:
+        token = Config.SUPABASE_SERVICE_KEY or unseal_token(access_token)
+        by_token.setdefault(token, []).append((resource_id, user_id, member))
+    for token, group in by_token.items():
+        client = make_client(token)
+        inserts = [{
+            'id': str(uuid5(UPVOTE_NAMESPACE, f'{resource_id}:{user_id}')),
+            'resource_id': resource_id,
+            'user_id': user_id,
+            'like_type': 'upvote'
+        } for resource_id, user_id, member in group if member]
+        if inserts:
+            client.table('likes').upsert(inserts, on_conflict='id', ignore_duplicates=True).execute()
+        deletes = {}
+        for resource_id, user_id, member in group:
+            if not member:
+                deletes.setdefault(resource_id, []).append(user_id)
+        for resource_id, user_ids in deletes.items():
+            client.table('likes').delete().eq('resource_id', resource_id).in_('user_id', user_ids).execute()
+    if Config.POST_SUMMARIES:
+        counts = upvote_engine.counts({resource_id for resource_id, _, _, _ in ops})
+        client = summary_client()
+        for resource_id, count in counts.items():
+            client.table(summary.SUMMARY_TABLE).update({'upvotes_count': count}).eq('id', resource_id).execute()
+
+
+# Authoritative upvote counts/membership; `likes` is written behind
+upvote_engine = UpvoteEngine(
+    make_upvote_store(Config.UPVOTE_STORE_URL, ttl=Config.UPVOTE_MEMBERS_TTL),
+    load_members=load_upvoters,
+    write_batch=write_upvotes,
+    journal_dir=Config.UPVOTE_JOURNAL_DIR,
+    flush_interval=Config.UPVOTE_FLUSH_INTERVAL
+)
+
+
+# Author profiles by user_id; misses are fetched in one bulk query
+profile_cache = ProfileCache(
+    make_cache(Config.PROFILE_CACHE_URL, max_entries=Config.PROFILE_CACHE_MAX_ENTRIES,
+               ttl=Config.PROFILE_CACHE_TTL, prefix='morphx:profiles:'),
+    load_many=lambda user_ids: select_in('user_profiles', '*', 'user_id', user_ids, tiebreak='user_id'),
+    negative_ttl=Config.PROFILE_CACHE_NEGATIVE_TTL
+)
+
+
+# Set once a feed read finds sql/feed_views.sql hasn't been run
+feed_views_missing = False
+
+
+def missing_relation(error):
+    # Postgres' undefined_table, or PostgREST not knowing the relation
+    return getattr(error, 'code', None) in ('42P01', 'PGRST205')
+
+
+def note_missing_feed_views(error):
+    global feed_views_missing
+    if not feed_views_missing:
+        print(f"Feed views unavailable (run sql/feed_views.sql), reading the raw tables: {error}")
+    feed_views_missing = True
+
+
+def stat_queries(tweet_ids, from_views):
+    """The two calls fetching the posts' counts and latest statuses: reads of
+    the per-post views in sql/feed_views.sql, one row per post whatever its
+    numbers of likes and replies, or every like and reply of the posts."""
+    if from_views:
+        return (lambda: select_in('post_counts', '*', 'resource_id', tweet_ids, tiebreak='resource_id'),
+                lambda: select_in('latest_statuses', '*', 'resource_id', tweet_ids, tiebreak='resource_id'))
+    return (lambda: select_in('likes', 'id,resource_id', 'resource_id', tweet_ids),
+            lambda: select_in('tweet_replies', '*', 'resource_id', tweet_ids, order_by='created_at'))
+
+
+def join_stats(tweet_ids, counts, statuses, from_views):
+    """({id: (upvotes, replies)}, {id: latest status}) from stat_queries' rows."""
+    if from_views:
+        return ({row['resource_id']: (row['upvotes_count'], row['comments_count']) for row in counts},
+                {row['resource_id']: row for row in statuses})
+    upvotes, comments, latest = {}, {}, {}
+    for like in counts:
+        upvotes[like['resource_id']] = upvotes.get(like['resource_id'], 0) + 1
+    # newest first, so the first reply seen per resource is its latest
+    for reply in statuses:
+        comments[reply['resource_id']] = comments.get(reply['resource_id'], 0) + 1
+        latest.setdefault(reply['resource_id'], reply)
+    return {rid: (upvotes.get(rid, 0), comments.get(rid, 0)) for rid in tweet_ids}, latest
+
+
+def build_posts(tweets):
+    """Join tweets with their upvotes, replies, latest status and author name.
+
+    Counts and latest status are loaded concurrently with bulk in_() queries
+    for the whole batch of tweets (authors come from the profile cache) and
+    joined in memory.
+    """
+    tweet_ids = [t['id'] for t in tweets]
+    author_ids = [t.get('author_id') for t in tweets]
+    from_views = not feed_views_missing
+    counts, statuses, profiles = gather(
+        *stat_queries(tweet_ids, from_views),
+        lambda: profile_cache.get_many(author_ids),
+        return_exceptions=True
+    )
+    if from_views and (missing_relation(counts) or missing_relation(statuses)):
+        note_missing_feed_views(counts if missing_relation(counts) else statuses)
+        return build_posts(tweets)
+
+    counts_by_resource = {}
+    latest_by_resource = {}
+    if isinstance(counts, Exception) or isinstance(statuses, Exception):
+        print(f"Error fetching counts and status: {counts if isinstance(counts, Exception) else statuses}")
+    else:
+        counts_by_resource, latest_by_resource = join_stats(tweet_ids, counts, statuses, from_views)
+    # the upvote engine's counts include writes not flushed to `likes` yet
+    upvotes_by_resource = {rid: upvotes for rid, (upvotes, _) in counts_by_resource.items()}
+    upvotes_by_resource.update(upvote_engine.counts(tweet_ids))
+
+    names_by_author = {}
+    if isinstance(profiles, Exception):
+        print(f"Error fetching author name: {profiles}")
+    else:
+        for user_id, profile in profiles.items():
+            names_by_author[user_id] = profile.get('full_name')
+
+    formatted_posts = []
+    for tweet in tweets:
+        latest_status = latest_by_resource.get(tweet['id'])
+        author_name = names_by_author.get(tweet.get('author_id')) or 'Campus Member'
+
+        importance_value = ''
+        importance_rank = 0
+        if latest_status and latest_status.get('chips_available'):
+            importance_value = latest_status['chips_available']
+            importance_rank = IMPORTANCE_ORDER.get(str(importance_value).lower(), 0)
+
+        formatted_post = {
+            'id': tweet['id'],
+            'name': tweet.get('name', tweet.get('content', 'Untitled Resource')),
+            'content': tweet.get('content', ''),
+            'image_url': tweet.get('image_url'),
+            'image_variants': tweet.get('image_variants') or {},
+            'upvotes_count': upvotes_by_resource.get(tweet['id'], 0),
+            'comments_count': counts_by_resource.get(tweet['id'], (0, 0))[1],
+            'created_at': tweet['created_at'],
+            'latest_status': latest_status,
+            'author_name': author_name,
+            'author_id': tweet.get('author_id'),
+            'importance': importance_value,
+            'importance_rank': importance_rank
+        }
+        formatted_posts.append(formatted_post)
+    return formatted_posts
+
+
+def search_documents(tweets):
+    """(id, name, content, latest status messages) per tweet, for the search index."""
+    replies = select_in('tweet_replies', 'id,resource_id,status_message,created_at', 'resource_id',
+                        [t['id'] for t in tweets], order_by='created_at')
+    statuses = {}
+    for reply in replies:
+        messages = statuses.setdefault(reply.get('resource_id'), [])
+        if reply.get('status_message') and len(messages) < Config.SEARCH_STATUSES_PER_POST:
+            messages.append(reply['status_message'])
+    return [(t['id'], t.get('name'), t.get('content'), statuses.get(t['id'], [])) for t in tweets]
+
+
+def load_search_documents(ids=None):
+    """Search documents for the posts in `ids`, or for every post."""
+    if ids is not None:
+        return search_documents(select_in('tweets', 'id,name,content', 'id', ids))
+    documents = []
+    for tweets in summary.tweet_batches(supabase, FEED_PAGE_ROWS):
+        documents.extend(search_documents(tweets))
+    return documents
+
+
+summary_log = logging.getLogger('morphx.summaries')
+
+
+def summary_client():
+    # post_summaries is server-maintained: written as the service role (the
+    # table has no write policies), or directly on the local backend
+    return make_client(Config.SUPABASE_SERVICE_KEY) if Config.SUPABASE_SERVICE_KEY else supabase
+
+
+def sync_summary(resource_id):
+    """Rebuild one post's summary row after a write to its tweet or replies."""
+    if not Config.POST_SUMMARIES:
+        return
+    try:
+        tweets = supabase.table('tweets').select('*').eq('id', resource_id).limit(1).execute().data or []
+        if tweets:
+            summary.upsert_summaries(summary_client(), build_posts(tweets))
+        else:
+            summary.delete_summary(summary_client(), resource_id)
+    except Exception as e:
+        summary_log.error("Summary sync failed for %s: %s", resource_id, e)
+
+
+def sync_summaries(resource_ids):
+    """sync_summary for many existing posts with one build and one upsert."""
+    if not Config.POST_SUMMARIES or not resource_ids:
+        return
+    try:
+        tweets = select_in('tweets', '*', 'id', resource_ids)
+        summary.upsert_summaries(summary_client(), build_posts(tweets))
+    except Exception as e:
+        summary_log.error("Summary sync failed for %d posts: %s", len(resource_ids), e)
+
+
+def with_viewer_flags(post):
+    """Copy of a cached post with the current user's edit/delete rights."""
+    author_id = post.get('author_id') or ''
+    is_owner = session.get('user_id') == author_id
+    return dict(post, can_edit=is_owner, can_delete=is_owner or session.get('user_role') == 'faculty')
+
+
+def bump_version(*resource_ids):
+    """Record a write to posts (and so to the feed); returns the new stamp."""
+    now = time.time()
+    stamps = {'feed': now}
+    for resource_id in resource_ids:
+        if resource_id:
+            stamps[f'post:{resource_id}'] = now
+    post_versions.set_many(stamps)
+    return now
+
+
+def current_versions(keys):
+    """{key: stamp}; keys without one (never written or evicted) start now."""
+    found = post_versions.get_many(keys)
+    missing = {k: time.time() for k in keys if k not in found}
+    if missing:
+        post_versions.set_many(missing)
+        found.update(missing)
+    return found
+
+
+def invalidate_post(resource_id, membership_changed=False):
+    """Drop one post from the feed cache and move it (or add/remove it) in the cached order."""
+    if resource_id:
+        feed_cache.delete(f'post:{resource_id}')
+    version = bump_version(resource_id)
+    if membership_changed:
+        # API deltas resend the id list after this
+        post_versions.set('members', version)
+    if resource_id:
+        patch_feed_order([resource_id])
+
+
+def invalidate_posts(resource_ids):
+    """invalidate_post for many existing posts, in one cache round trip each way."""
+    feed_cache.delete(*[f'post:{i}' for i in resource_ids])
+    bump_version(*resource_ids)
+    patch_feed_order(resource_ids)
+
+
+def patch_cached_post(resource_id, **fields):
+    version = bump_version(resource_id)
+    post = feed_cache.get(f'post:{resource_id}')
+    if post is not None:
+        feed_cache.set(f'post:{resource_id}', dict(post, version=version, **fields))
+    patch_feed_order([resource_id], **fields)
+
+
+_order_lock = threading.Lock()
+
+
+def patch_feed_order(resource_ids, **fields):
+    """Move written posts to their new place in the cached feed order, so a
+    write costs a build of those posts (which their next render needs
+    anyway) instead of the whole order. Posts that are gone or being deleted
+    drop out, new ones are added; `fields` override the built posts' values.
+
+    Patches from two workers can race on a shared cache; the loser's post
+    keeps its old place until the order expires (FEED_CACHE_TTL).
+    """
+    if feed_cache.get('order') is None:
+        return
+    deleting = being_deleted(resource_ids)
+    live = [i for i in resource_ids if i not in deleting]
+    posts = load_cached_posts(live) if live else {}
+    with _order_lock:
+        order = feed_cache.get('order')
+        if order is None:
+            return
+        moved = set(resource_ids)
+        order = [key for key in order if key[-1] not in moved]
+        for post in posts.values():
+            bisect.insort(order, feed_sort_key(dict(post, **fields)))
+        feed_cache.set('order', order)
+
+
+def publish_post_event(event_type, resource_id, **fields):
+    try:
+        event_bus.publish(dict(fields, type=event_type, id=resource_id))
+    except Exception as e:
+        print(f"Event publish failed: {e}")
+
+
+def being_deleted(resource_ids):
+    """Those of `resource_ids` whose deletion is still queued (kept out of
+    the feed and search until it's done)."""
+    return set(delete_marks.get_many(resource_ids))
+
+
+def job_token():
+    """Token stored with a job for its writes: none when the service role
+    key is configured, else the current user's (RLS), sealed so the outbox
+    holds no usable token."""
+    return None if Config.SUPABASE_SERVICE_KEY else seal_token(session.get('sb_access'))
+
+
+def job_client(payload):
+    return make_client(Config.SUPABASE_SERVICE_KEY or unseal_token(payload.get('access_token')))
+
+
+def add_notice(user_id, message):
+    """Show `message` to the user on their next feed page."""
+    if user_id:
+        key = f'notices:{user_id}'
+        feed_cache.set(key, (feed_cache.get(key) or []) + [message], ttl=NOTICE_TTL)
+
+
+def pop_notices():
+    user_id = session.get('user_id')
+    if not user_id:
+        return []
+    notices = feed_cache.get(f'notices:{user_id}') or []
+    if notices:
+        feed_cache.delete(f'notices:{user_id}')
+    return notices
+
+
+def cleanup_post_images(resource_id, image_url, variants, access_token=None):
+    """Queue removal of a post's uploaded image and variants from storage."""
+    keys = image_pipeline.keys_for(image_url, variants, f'posts/{resource_id}')
+    if keys:
+        digest = hashlib.sha1(json.dumps(sorted(keys)).encode()).hexdigest()
+        job_queue.enqueue('delete_images', {'keys': keys, 'access_token': access_token}, key=f'images:{digest}')
+
+
+@job_queue.handler('delete_images')
+def delete_images(payload):
+    image_pipeline.storage.delete(payload['keys'], job_client(payload))
+
+
+@job_queue.handler('attach_images')
+def attach_post_images(payload):
+    """Store a processed upload's URLs on its tweet, or remove the images if
+    the post was deleted while they were processed."""
+    resource_id = payload['resource_id']
+    client = job_client(payload)
+    try:
+        resp = client.table('tweets').update({'image_url': payload['image_url'], 'image_variants': payload['variants']}).eq('id', resource_id).execute()
+    except Exception as e:
+        # tweets.image_variants not migrated yet (sql/tweet_image_variants.sql)
+        print(f"Storing image variants failed, keeping the original only: {e}")
+        resp = client.table('tweets').update({'image_url': payload['image_url']}).eq('id', resource_id).execute()
+    if not resp.data:
+        cleanup_post_images(resource_id, payload['image_url'], payload['variants'], payload.get('access_token'))
+        return
+    invalidate_post(resource_id)
+    sync_summary(resource_id)
+    publish_post_event('edited', resource_id)
+
+
+@job_queue.handler('insert_status')
+def insert_status(payload):
+    """A secondary status update (e.g. a new post's first one); the row id
+    makes a retried insert a no-op."""
+    row = payload['row']
+    job_client(payload).table('tweet_replies').upsert(row, on_conflict='id', ignore_duplicates=True).execute()
+    invalidate_post(row['resource_id'])
+    sync_summary(row['resource_id'])
+    publish_post_event('status', row['resource_id'], **post_delta(row['resource_id']))
+
+
+@job_queue.handler('delete_post')
+def delete_post(payload):
+    """Delete a post's likes, replies and status updates, then the post and its images."""
+    resource_id = payload['resource_id']
+    client = job_client(payload)
+    # independent tables, so concurrently
+    gather(
+        lambda: client.table('likes').delete().eq('resource_id', resource_id).execute(),
+        lambda: client.table('replies').delete().eq('resource_id', resource_id).execute(),
+        lambda: client.table('tweet_replies').delete().eq('resource_id', resource_id).execute()
+    )
+    resp = client.table('tweets').delete().eq('id', resource_id).execute()
+    if not resp.data and make_client().table('tweets').select('id').eq('id', resource_id).execute().data:
+        # RLS let nothing through; retried, then reported by delete_post_failed
+        raise RuntimeError(f"Post {resource_id} was not deleted")
+    upvote_engine.forget(resource_id)
+    invalidate_post(resource_id, membership_changed=True)
+    delete_marks.delete(resource_id)
+    publish_post_event('deleted', resource_id)
+    cleanup_post_images(resource_id, payload.get('image_url'), payload.get('image_variants'), payload.get('access_token'))
+    if Config.STATUS_HOT_DAYS:
         try:
-            supabase.auth.set_session(access, refresh)
+            client.table(retention.ARCHIVE_TABLE).delete().eq('resource_id', resource_id).execute()
+            client.table(retention.ROLLUP_TABLE).delete().eq('resource_id', resource_id).execute()
         except Exception as e:
-            print(f"set_session failed: {e}")
+            print(f"Deleting archived statuses failed: {e}")
 
 
-def fetch_posts():
+@job_queue.on_dead('delete_post')
+def delete_post_failed(payload, error):
+    """Put a post whose delete gave up back in the feed and tell the user who deleted it."""
+    resource_id = payload['resource_id']
+    delete_marks.delete(resource_id)
+    invalidate_post(resource_id, membership_changed=True)
+    sync_summary(resource_id)
+    publish_post_event('created', resource_id)
+    add_notice(payload.get('user_id'), f"Deleting \"{payload.get('name') or 'your post'}\" failed, so it is back "
+                                       f"in the feed. Please try again.")
+
+
+def schedule_compaction(day=None):
+    """Queue the status compaction pass of `day` (a UTC date, today by
+    default; later days wait for their midnight). Once per day however many
+    processes ask."""
+    today = datetime.now(timezone.utc).date()
+    day = day or today
+    delay = (datetime.combine(day, datetime.min.time(), timezone.utc) - datetime.now(timezone.utc)).total_seconds()
+    job_queue.enqueue('compact_statuses', {'day': day.isoformat()}, key=f'compact:{day.isoformat()}:',
+                      delay=max(0.0, delay))
+
+
+_compaction_scheduled_pid = None
+
+
+def schedule_compaction_once():
+    global _compaction_scheduled_pid
+    if Config.STATUS_HOT_DAYS and _compaction_scheduled_pid != os.getpid():
+        _compaction_scheduled_pid = os.getpid()
+        schedule_compaction()
+
+
+def compact_statuses_step(client, cutoff, after):
+    """One batch of a compaction pass; refreshes the posts whose counts changed."""
+    after, touched, done = retention.compact_step(client, cutoff, after, resources=Config.RETENTION_BATCH_POSTS,
+                                            max_rows=Config.RETENTION_BATCH_ROWS,
+                                            bucket_seconds=Config.STATUS_BUCKET_SECONDS)
+    if touched:
+        # counts are unchanged (post_counts adds the rollups), but cached
+        # posts built before sql/status_retention.sql was run are not
+        invalidate_posts(touched)
+        sync_summaries(touched)
+    return after, touched, done
+
+
+@job_queue.handler('compact_statuses')
+def compact_statuses(payload):
+    """A step of the daily pass: archive a batch, then queue the next one
+    (or tomorrow's pass). Keys carry the step number, so a retried step does
+    not queue its successor twice."""
+    cutoff = payload.get('cutoff') or (datetime.now(timezone.utc) - timedelta(days=Config.STATUS_HOT_DAYS)).isoformat()
+    after, _, done = compact_statuses_step(job_client(payload), cutoff, payload.get('after'))
+    if not done:
+        step = payload.get('step', 0) + 1
+        job_queue.enqueue('compact_statuses', {'day': payload['day'], 'cutoff': cutoff, 'after': after, 'step': step},
+                          key=f"compact:{payload['day']}:{step}")
+    elif Config.STATUS_HOT_DAYS:
+        schedule_compaction(datetime.now(timezone.utc).date() + timedelta(days=1))
+
+
+def post_delta(resource_id):
+    """Counts and latest status of one post, for live update events."""
+    post = load_cached_posts([resource_id]).get(resource_id)
+    if not post:
+        return {}
+    return {k: post.get(k) for k in ('upvotes_count', 'comments_count', 'latest_status', 'importance')}
+
+
+def load_cached_posts(ids, tweets=None):
+    """Return {id: post} for `ids`, building and caching the ones that are missing.
+
+    Each post carries the version stamp it was built under; a cached post
+    whose stamp is behind the current one (a write raced its build) is
+    rebuilt.
+    """
+    cached = feed_cache.get_many([f'post:{i}' for i in ids])
+    versions = current_versions([f'post:{i}' for i in ids])
+    missing = [i for i in ids
+               if f'post:{i}' not in cached or cached[f'post:{i}'].get('version') != versions[f'post:{i}']]
+    if missing:
+        if tweets is None:
+            tweets = select_in('tweets', '*', 'id', missing, order_by='created_at')
+        else:
+            missing_set = set(missing)
+            tweets = [t for t in tweets if t['id'] in missing_set]
+        built = {f"post:{p['id']}": dict(p, version=versions[f"post:{p['id']}"]) for p in build_posts(tweets)}
+        feed_cache.set_many(built)
+        for i in missing:
+            cached.pop(f'post:{i}', None)
+        cached.update(built)
+    return {key[len('post:'):]: post for key, post in cached.items()}
+
+
+def feed_sort_key(post):
+    # importance, upvotes, created_at; id breaks ties so cursors are stable
+    return [post.get('importance_rank', 0), post.get('upvotes_count', 0), str(post.get('created_at') or ''), post['id']]
+
+
+def ranked_keys():
+    """Feed sort keys of every post from the feed_ranking view, in keyset
+    pages of FEED_PAGE_ROWS; no post is built."""
+    keys = []
+    after = None
+    while True:
+        rows = summary.page_query(supabase, FEED_PAGE_ROWS, after, table='feed_ranking',
+                                  columns=','.join(summary.FEED_ORDER)).execute().data or []
+        keys.extend(feed_sort_key(row) for row in rows)
+        if len(rows) < FEED_PAGE_ROWS:
+            return keys
+        after = keys[-1]
+
+
+def built_keys():
+    """Feed sort keys of every post, building each post (no feed views)."""
+    keys = []
+    for tweets in summary.tweet_batches(supabase, FEED_PAGE_ROWS):
+        deleting = being_deleted([t['id'] for t in tweets])
+        tweets = [t for t in tweets if t['id'] not in deleting]
+        posts = load_cached_posts([t['id'] for t in tweets], tweets)
+        keys.extend(feed_sort_key(p) for p in posts.values())
+    return keys
+
+
+def feed_order():
+    """Ascending list of feed sort keys for every post (cached, and patched
+    by writes rather than dropped)."""
+    order = feed_cache.get('order')
+    if order is not None:
+        return order
+    keys = None
+    if not feed_views_missing:
+        try:
+            keys = ranked_keys()
+        except Exception as e:
+            if not missing_relation(e):
+                raise
+            note_missing_feed_views(e)
+    if keys is None:
+        keys = built_keys()
+    else:
+        deleting = being_deleted([key[-1] for key in keys])
+        keys = [key for key in keys if key[-1] not in deleting]
+        # stamp posts never written yet now, not at the next delta (which
+        # would resend them all as changed)
+        current_versions([f'post:{key[-1]}' for key in keys])
+    order = sorted(keys)
+    feed_cache.set('order', order)
+    return order
+
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor; raises ValueError on a malformed cursor."""
     try:
-        # Fetch tweets (treating them as resources)
-        tweets_response = supabase.table('tweets').select("*").order('created_at', desc=True).execute()
-        tweets = tweets_response.data
-
-        importance_order = {
-            'critical': 4,
-            'high': 3,
-            'medium': 2,
-            'low': 1
-        }
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        key = json.loads(raw)
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if not isinstance(key, list) or len(key) != 4:
+        raise ValueError('Invalid cursor')
+    rank, upvotes, created_at, post_id = key
+    if not all(isinstance(n, int) and not isinstance(n, bool) for n in (rank, upvotes)):
+        raise ValueError('Invalid cursor')
+    check_keyset(created_at, post_id)
+    return key
 
-        formatted_posts = []
-        for tweet in tweets:
-            # Get upvotes count (using resource_id to match your schema)
-            try:
-                upvotes_response = supabase.table('likes').select('id', count='exact').eq('resource_id', tweet['id']).execute()
-                upvotes_count = upvotes_response.count if hasattr(upvotes_response, 'count') else len(upvotes_response.data)
-            except Exception as e:
-                print(f"Error fetching upvotes: {e}")
-                upvotes_count = 0
 
-            # Get comments count from tweet_replies
-            try:
-                comments_response = supabase.table('tweet_replies').select('id', count='exact').eq('resource_id', tweet['id']).execute()
-                comments_count = comments_response.count if hasattr(comments_response, 'count') else len(comments_response.data)
-            except Exception as e:
-                print(f"Error fetching comments: {e}")
-                comments_count = 0
+def fetch_summary_page(limit, cursor):
+    """Feed page as one ordered range scan over post_summaries."""
+    rows = summary.page_query(supabase, limit + 1 if limit else None,
+                              decode_cursor(cursor) if cursor else None).execute().data or []
+    next_cursor = None
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(feed_sort_key(rows[-1]))
+    # unflushed upvotes
+    counts = upvote_engine.counts([r['id'] for r in rows])
+    versions = current_versions([f"post:{r['id']}" for r in rows])
+    page = [with_viewer_flags(dict(r, upvotes_count=counts.get(r['id'], r.get('upvotes_count', 0)),
+                                   version=versions[f"post:{r['id']}"])) for r in rows]
+    return page, next_cursor
+
+
+def fetch_ranked_page(limit, cursor):
+    """Feed page as one keyset range query over the feed_ranking view;
+    only the page's posts are built.
+
+    The page's ids are cached under the feed's version stamp, so any write
+    retires them without a delete, and pages are only queried again after
+    one.
+    """
+    after_key = decode_cursor(cursor) if cursor else None
+    page_key = f"page:{current_versions(['feed'])['feed']}:{limit}:{cursor or ''}"
+    cached = feed_cache.get(page_key)
+    if cached is None:
+        rows = summary.page_query(supabase, limit + 1, after_key, table='feed_ranking',
+                                  columns=','.join(summary.FEED_ORDER)).execute().data or []
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(feed_sort_key(rows[-1]))
+        cached = [[row['id'] for row in rows], next_cursor]
+        feed_cache.set(page_key, cached)
+    ids, next_cursor = cached
+    deleting = being_deleted(ids)
+    posts = load_cached_posts([i for i in ids if i not in deleting])
+    return [with_viewer_flags(posts[i]) for i in ids if i in posts], next_cursor
 
-            # Get latest status update (using resource_id to match your schema)
-            try:
-                status_response = supabase.table('tweet_replies').select('*').eq('resource_id', tweet['id']).order('created_at', desc=True).limit(1).execute()
-                latest_status = status_response.data[0] if status_response.data else None
-            except Exception as e:
-                print(f"Error fetching status: {e}")
-                latest_status = None
 
-            # Resolve author name from user_profiles when possible
-            author_name = 'Campus Member'
+def fetch_feed_page(limit=FEED_PAGE_SIZE, cursor=None):
+    """One page of the ranked feed after `cursor`.
+
+    Returns (posts, next_cursor); next_cursor is None on the last page.
+    """
+    try:
+        if Config.POST_SUMMARIES:
+            return fetch_summary_page(limit, cursor)
+        if limit and not feed_views_missing:
             try:
-                author_id = tweet.get('author_id')
-                if author_id:
-                    author_resp = supabase.table('user_profiles').select('full_name').eq('user_id', author_id).limit(1).execute()
-                    if author_resp.data:
-                        author_name = author_resp.data[0].get('full_name') or 'Campus Member'
+                return fetch_ranked_page(limit, cursor)
             except Exception as e:
-                print(f"Error fetching author name: {e}")
-
-            importance_value = ''
-            importance_rank = 0
-            if latest_status and latest_status.get('chips_available'):
-                importance_value = latest_status['chips_available']
-                importance_rank = importance_order.get(str(importance_value).lower(), 0)
-
-            formatted_post = {
-                'id': tweet['id'],
-                'name': tweet.get('name', tweet.get('content', 'Untitled Resource')),
-                'content': tweet.get('content', ''),
-                'image_url': tweet.get('image_url'),
-                'upvotes_count': upvotes_count,
-                'comments_count': comments_count,
-                'created_at': tweet['created_at'],
-                'latest_status': latest_status,
-                'author_name': author_name,
-                'can_edit': session.get('user_id') == (tweet.get('author_id') or ''),
-                'can_delete': session.get('user_id') == (tweet.get('author_id') or '') or session.get('user_role') == 'faculty',
-                'importance': importance_value,
-                'importance_rank': importance_rank
-            }
-            formatted_posts.append(formatted_post)
-        
-        # Sort: importance desc, upvotes desc, created_at desc
-        formatted_posts.sort(key=lambda p: (p.get('importance_rank', 0), p.get('upvotes_count', 0), str(p.get('created_at') or '')), reverse=True)
-
-        return formatted_posts
-        
+                if not missing_relation(e):
+                    raise
+                note_missing_feed_views(e)
+        order = feed_order()
+        end = bisect.bisect_left(order, decode_cursor(cursor)) if cursor else len(order)
+        start = max(0, end - limit) if limit else 0
+        page_keys = order[start:end][::-1]
+        posts = load_cached_posts([k[-1] for k in page_keys])
+        page = [with_viewer_flags(posts[k[-1]]) for k in page_keys if k[-1] in posts]
+        next_cursor = encode_cursor(page_keys[-1]) if start > 0 and page_keys else None
+        return page, next_cursor
+    except ValueError:
+        raise
     except Exception as e:
         print(f"Error fetching posts: {e}")
-        return []
+        return [], None
+
+
+_template_fingerprint = None
+
+
+def template_fingerprint():
+    """Hash of every template's source, so a deploy changes cards and ETags."""
+    global _template_fingerprint
+    if _template_fingerprint is None:
+        digest = hashlib.sha1()
+        for name in sorted(current_app.jinja_env.list_templates()):
+            digest.update(name.encode())
+            digest.update(current_app.jinja_env.loader.get_source(current_app.jinja_env, name)[0].encode())
+        # pages link the fingerprinted asset names
+        if Config.ASSET_PIPELINE:
+            asset_pipeline.manifest()
+            digest.update(asset_pipeline.version.encode())
+        _template_fingerprint = digest.hexdigest()[:12]
+    return _template_fingerprint
+
+
+def viewer_class(post):
+    if not session.get('user_id'):
+        return 'anonymous'
+    if session['user_id'] == post.get('author_id'):
+        return 'owner'
+    if session.get('user_role') == 'faculty':
+        return 'faculty'
+    return 'member'
+
+
+def render_cards(posts):
+    """Card HTML for each post, reused while its version and the viewer's class are unchanged."""
+    keys = [f"{p['id']}:{p.get('version')}:{viewer_class(p)}:{template_fingerprint()}" for p in posts]
+    cards = card_cache.get_many(keys)
+    rendered = {key: render_template('_post_card.html', post=post)
+                for key, post in zip(keys, posts) if key not in cards}
+    if rendered:
+        card_cache.set_many(rendered)
+        cards.update(rendered)
+    return [Markup(cards[key]) for key in keys]
+
+
+def page_validators(parts, stamp=None):
+    """(etag, last_modified) for a page built from `parts` as seen by this viewer.
+
+    Last-Modified can't tell viewers apart, so it is only given to anonymous ones.
+    """
+    viewer = [session.get(k) for k in ('user_id', 'username', 'full_name', 'user_role', 'is_admin')]
+    raw = json.dumps([template_fingerprint(), viewer, parts], default=str)
+    etag = hashlib.sha1(raw.encode()).hexdigest()
+    last_modified = None
+    if stamp and not session.get('user_id'):
+        last_modified = datetime.fromtimestamp(int(stamp), timezone.utc)
+    return etag, last_modified
+
+
+def not_modified(etag, last_modified):
+    """A 304 response if the client's copy is current, else None."""
+    if request.if_none_match:
+        fresh = request.if_none_match.contains_weak(etag)
+    else:
+        fresh = bool(last_modified and request.if_modified_since and last_modified <= request.if_modified_since)
+    return with_validators(Response(status=304), etag, last_modified) if fresh else None
+
+
+def with_validators(response, etag, last_modified):
+    response = make_response(response)
+    response.set_etag(etag, weak=True)
+    if last_modified:
+        response.last_modified = last_modified
+    # revalidate every time; the page depends on the viewer's session
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Cookie')
+    return response
+
+
+def fetch_posts():
+    """The whole feed, highest ranked first."""
+    posts, _ = fetch_feed_page(limit=None)
+    return posts
+
+
+# Cursor fields end up inside PostgREST filter strings, so only an ISO 8601
+# timestamp and a uuid are let through
+_CURSOR_TIME = re.compile(r'\d{4}-\d\d-\d\d[T ]\d\d:\d\d:\d\d(\.\d{1,6})?(Z|[+-]\d\d(:?\d\d)?)?')
+_CURSOR_ID = re.compile(r'[0-9a-fA-F]{8}-(?:[0-9a-fA-F]{4}-){3}[0-9a-fA-F]{12}')
+
 
-app = Flask(__name__)
-app.config.from_object(Config)
-app.secret_key = app.config['SECRET_KEY']
-app.permanent_session_lifetime = timedelta(days=7)
+def check_keyset(created_at, row_id):
+    """Raise ValueError unless (created_at, row_id) can go in a keyset filter."""
+    if not (isinstance(created_at, str) and isinstance(row_id, str)
+            and _CURSOR_TIME.fullmatch(created_at) and _CURSOR_ID.fullmatch(row_id)):
+        raise ValueError('Invalid cursor')
+    try:
+        retention.parse_time(created_at)
+    except ValueError:
+        raise ValueError('Invalid cursor')
+
+
+def parse_keyset_cursor(cursor):
+    """(created_at, id) of a keyset_page() cursor, None for no cursor; raises
+    ValueError on a malformed one."""
+    if not cursor:
+        return None
+    created_at, _, row_id = cursor.partition('|')
+    check_keyset(created_at, row_id)
+    return created_at, row_id
+
+
+def keyset_page(query, limit, cursor=None):
+    """Newest-first page of `query` after `cursor` (created_at|id of the last row seen).
+
+    Returns (rows, next_cursor); raises ValueError on a malformed cursor.
+    """
+    if cursor:
+        created_at, row_id = parse_keyset_cursor(cursor)
+        query = query.or_(f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt."{row_id}")')
+    rows = query.order('created_at', desc=True).order('id', desc=True).limit(limit + 1).execute().data or []
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = f"{rows[-1]['created_at']}|{rows[-1]['id']}"
+    return rows, next_cursor
+
+
+def merge_pages(pages, limit):
+    """One newest-first page from keyset_page() pages of tables with disjoint
+    ids (tweet_replies and its archive) read with the same cursor."""
+    rows = sorted((row for rows, _ in pages for row in rows),
+                  key=lambda r: (retention.parse_time(r['created_at']), r['id']), reverse=True)
+    more = len(rows) > limit or any(next_cursor for _, next_cursor in pages)
+    rows = rows[:limit]
+    return rows, (f"{rows[-1]['created_at']}|{rows[-1]['id']}" if more and rows else None)
+
+
+def page_args(default_limit):
+    limit = request.args.get('limit', default_limit, type=int)
+    return max(1, min(limit, MAX_PAGE_SIZE)), request.args.get('cursor') or None
+
+# Routes, request hooks and CLI commands; create_app() puts them on an app
+bp = Blueprint('main', __name__, cli_group=None)
+
+# Minified, fingerprinted and precompressed CSS/JS (see assets.py):
+# url_for('static', ...) links the built name, served cached for good
+asset_pipeline = assets.AssetPipeline(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static'),
+                                      Config.ASSET_BUILD_DIR)
+
+@bp.app_url_defaults
+def fingerprint_static_url(endpoint, values):
+    if endpoint == 'static' and Config.ASSET_PIPELINE and 'filename' in values:
+        values['filename'] = asset_pipeline.built_name(values['filename'], check=current_app.debug)
+
+def static_file(filename):
+    if not (Config.ASSET_PIPELINE and asset_pipeline.is_built(filename)):
+        return current_app.send_static_file(filename)
+    encoding = request.accept_encodings.best_match(asset_pipeline.encodings(filename))
+    response = send_from_directory(asset_pipeline.build_dir, filename + (assets.ENCODINGS[encoding] if encoding else ''),
+                                   mimetype=mimetypes.guess_type(filename)[0], max_age=Config.ASSET_MAX_AGE)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
 
 # Custom decorator to check if user is logged in
 def login_required(f):
     def decorated_function(*args, **kwargs):
         if 'username' not in session:
-            return redirect(url_for('login'))
+            return redirect(url_for('main.login'))
         # keep Supabase session alive
         if not ensure_sb_session():
             # if refresh failed, force re-login
             session.clear()
-            return redirect(url_for('login'))
+            return redirect(url_for('main.login'))
         return f(*args, **kwargs)
     decorated_function.__name__ = f.__name__
     return decorated_function
@@ -155,40 +1051,359 @@ def login_required(f):
 def admin_required(f):
     def decorated_function(*args, **kwargs):
         if not session.get('is_admin'):
-            return redirect(url_for('index'))
+            return redirect(url_for('main.index'))
         decorated_function.__name__ = f.__name__
         return f(*args, **kwargs)
     decorated_function.__name__ = f.__name__
     return decorated_function
 
-@app.route('/')
+# Throttling of write endpoints and coalescing of identical writes (see ratelimit.py)
+rate_limiter, coalescer = make_rate_limiting(Config.RATE_LIMIT_URL, Config.RATE_LIMITS, Config.COALESCE_WINDOW)
+
+def too_many_requests(retry_after):
+    message = f'Too many requests, try again in {retry_after} seconds'
+    if request.is_json or request.accept_mimetypes.best == 'application/json':
+        response = jsonify({'success': False, 'error': message})
+    else:
+        response = make_response(message)
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+# Custom decorator to limit how often one user writes to an endpoint (RATE_LIMITS)
+def rate_limited(f):
+    def decorated_function(*args, **kwargs):
+        if request.method != 'GET':
+            retry_after = rate_limiter.check(f.__name__, session.get('user_id') or request.remote_addr)
+            if retry_after is not None:
+                return too_many_requests(retry_after)
+        return f(*args, **kwargs)
+    decorated_function.__name__ = f.__name__
+    return decorated_function
+
+def write_key(*parts):
+    """Coalescing key of a user's write: the same parts give the same key."""
+    return hashlib.sha1(json.dumps([session.get('user_id'), *parts]).encode()).hexdigest()
+
+# Per-request timing of backend calls and renders (see instrumentation.py)
+request_log = instrumentation.RequestLog(Config.DEBUG_REQUEST_HISTORY)
+
+def debug_requests_enabled():
+    return Config.DEBUG_REQUESTS or current_app.debug
+
+@bp.before_app_request
+def begin_request_trace():
+    instrumentation.start_trace()
+
+@bp.before_app_request
+def start_background_jobs():
+    # per process, so each worker also runs jobs left by ones that died
+    job_queue.start()
+    schedule_compaction_once()
+    search_backend.start()
+
+@bp.after_app_request
+def end_request_trace(response):
+    trace = instrumentation.current_trace()
+    if trace is None:
+        return response
+    if Config.SERVER_TIMING:
+        response.headers['Server-Timing'] = instrumentation.server_timing(trace)
+    instrumentation.finish_trace(trace, response.status_code, Config.N_PLUS_ONE_THRESHOLD)
+    if debug_requests_enabled() and not request.path.startswith('/_debug/'):
+        request_log.add(trace)
+        response.headers['X-Request-Trace'] = trace.id
+    return response
+
+@bp.after_app_request
+def compress_response(response):
+    if Config.COMPRESS_RESPONSES:
+        compression.compress_response(response, request.accept_encodings, Config.COMPRESS_MIN_BYTES)
+    return response
+
+# Prometheus scrape endpoint (per process); off until METRICS_TOKEN is set,
+# since routes, tables and queue depths are nobody else's business
+@bp.route('/metrics')
+def metrics():
+    if not Config.METRICS_TOKEN:
+        abort(404)
+    if not hmac.compare_digest(request.headers.get('Authorization', '').encode(),
+                               f'Bearer {Config.METRICS_TOKEN}'.encode()):
+        return '', 401
+    try:
+        for state, count in job_queue.depth().items():
+            instrumentation.JOB_QUEUE_DEPTH.set(count, state)
+    except Exception as e:
+        print(f"Job queue depth unavailable: {e}")
+    return Response(instrumentation.exposition(), mimetype='text/plain; version=0.0.4')
+
+# Recent requests with their backend calls and renders (debug only)
+@bp.route('/_debug/requests')
+@bp.route('/_debug/requests/<trace_id>')
+def debug_requests(trace_id=None):
+    if not debug_requests_enabled():
+        abort(404)
+    if trace_id:
+        trace = request_log.get(trace_id)
+        if trace is None:
+            abort(404)
+        return render_template('debug_requests.html', trace=trace, threshold=Config.N_PLUS_ONE_THRESHOLD)
+    return render_template('debug_requests.html', traces=request_log.recent(), threshold=Config.N_PLUS_ONE_THRESHOLD)
+
+@bp.route('/')
 def index():
-    posts = fetch_posts()
-    return render_template('index.html', posts=posts)
+    posts, next_cursor = fetch_feed_page()
+    notices = pop_notices()
+    etag, last_modified = feed_validators('index', posts, next_cursor)
+    unchanged = not notices and not_modified(etag, last_modified)
+    if unchanged:
+        return unchanged
+    page = render_template('index.html', posts=posts, cards=render_cards(posts), next_cursor=next_cursor,
+                           notices=notices)
+    if notices:
+        # shown once, so not revalidated from the browser's copy
+        return page
+    return with_validators(page, etag, last_modified)
 
-@app.route('/about')
+def feed_validators(view, posts, next_cursor):
+    """Validators for a feed page: its posts' versions, changed by any write to them."""
+    stamp = current_versions(['feed'])['feed']
+    return page_validators([view, next_cursor, [[p['id'], p.get('version')] for p in posts]], stamp)
+
+# Next page of the feed for infinite scroll
+@bp.route('/feed')
+def feed():
+    limit, cursor = page_args(FEED_PAGE_SIZE)
+    try:
+        posts, next_cursor = fetch_feed_page(limit, cursor)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    etag, last_modified = feed_validators('feed', posts, next_cursor)
+    unchanged = not_modified(etag, last_modified)
+    if unchanged:
+        return unchanged
+    return with_validators(jsonify({
+        'success': True,
+        'html': render_template('_post_cards.html', cards=render_cards(posts)),
+        'count': len(posts),
+        'next_cursor': next_cursor
+    }), etag, last_modified)
+
+# Rendered card for one post, used by the live feed to insert/replace cards
+@bp.route('/post_card/<resource_id>')
+def post_card(resource_id):
+    post = load_cached_posts([resource_id]).get(resource_id)
+    if not post:
+        return '', 404
+    etag, last_modified = page_validators(['card', resource_id, post.get('version')], post.get('version'))
+    unchanged = not_modified(etag, last_modified)
+    if unchanged:
+        return unchanged
+    return with_validators(render_cards([with_viewer_flags(post)])[0], etag, last_modified)
+
+def feed_changes(since):
+    """Ranked posts written after the `since` stamp, and the feed's ids when
+    posts were added or removed since then (else None)."""
+    versions = current_versions(['members'])
+    if Config.POST_SUMMARIES:
+        posts = fetch_posts()
+        ids = [p['id'] for p in posts]
+        changed = [p for p in posts if p.get('version', 0) > since]
+    else:
+        ids = [k[-1] for k in reversed(feed_order())]
+        versions.update(current_versions([f'post:{i}' for i in ids]))
+        changed_ids = [i for i in ids if versions[f'post:{i}'] > since]
+        posts = load_cached_posts(changed_ids)
+        changed = [with_viewer_flags(posts[i]) for i in changed_ids if i in posts]
+    return changed, ids if versions['members'] > since else None
+
+# Compact JSON feed for apps and signage: sparse fields (`fields=`), pages
+# (`limit`, `cursor`) or only the posts changed since an earlier response
+# (`since=<as_of>`)
+@bp.route('/api/v1/feed')
+def api_feed():
+    # the id list's stamp has to predate as_of, or the first delta resends it
+    current_versions(['members'])
+    # stamped before reading, so writes made meanwhile come in the next delta
+    as_of = time.time()
+    limit, cursor = page_args(FEED_PAGE_SIZE)
+    try:
+        fields = api.parse_fields(request.args.get('fields'))
+        since = api.parse_since(request.args.get('since'))
+        if since is not None and cursor:
+            raise ValueError('cursor and since cannot be combined')
+        if since is None:
+            posts, next_cursor = fetch_feed_page(limit, cursor)
+            ids = None
+        else:
+            posts, ids = feed_changes(since)
+            next_cursor = None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    etag, last_modified = feed_validators(['api', fields, since, ids], posts, next_cursor)
+    unchanged = not_modified(etag, last_modified)
+    if unchanged:
+        return unchanged
+    body = {'version': api.API_VERSION, 'as_of': as_of, 'posts': [api.serialize(p, fields) for p in posts]}
+    if since is None:
+        body['next_cursor'] = next_cursor
+    elif ids is not None:
+        body['ids'] = ids
+    return with_validators(jsonify(body), etag, last_modified)
+
+@bp.route('/api/v1/resources/<resource_id>')
+def api_resource(resource_id):
+    try:
+        fields = api.parse_fields(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    post = None
+    if not being_deleted([resource_id]):
+        post = load_cached_posts([resource_id]).get(resource_id)
+    if not post:
+        return jsonify({'error': 'Not found'}), 404
+    etag, last_modified = page_validators(['api', fields, resource_id, post.get('version')], post.get('version'))
+    unchanged = not_modified(etag, last_modified)
+    if unchanged:
+        return unchanged
+    return with_validators(jsonify({'version': api.API_VERSION, 'post': api.serialize(with_viewer_flags(post), fields)}),
+                           etag, last_modified)
+
+@bp.route('/api/v1/resources/<resource_id>/history')
+def api_resource_history(resource_id):
+    """Busy-ness over time: per bucket, the min/max/last crowd level and
+    queue length of the post's status updates in the last `hours`."""
+    try:
+        hours = min(max(float(request.args.get('hours', 168)), 1), 24 * 366)
+    except ValueError:
+        return jsonify({'error': 'hours must be a number'}), 400
+    if being_deleted([resource_id]) or not load_cached_posts([resource_id]).get(resource_id):
+        return jsonify({'error': 'Not found'}), 404
+    since = (datetime.now(timezone.utc) - timedelta(hours=hours)).isoformat()
+    buckets = retention.history(supabase, resource_id, since, Config.STATUS_BUCKET_SECONDS)
+    crowd_levels = list(retention.CROWD_RANK)
+    for bucket in buckets:
+        # ranks back to labels for clients
+        for field in ('crowd_min', 'crowd_max'):
+            bucket[field] = crowd_levels[bucket[field] - 1] if bucket[field] else None
+    return jsonify({'version': api.API_VERSION, 'id': resource_id, 'bucket_seconds': Config.STATUS_BUCKET_SECONDS,
+                    'buckets': buckets})
+
+# Posts matching a text query, ranked by relevance blended with the feed order
+@bp.route('/search')
+def search():
+    query = request.args.get('q', '').strip()
+    limit, _ = page_args(SEARCH_PAGE_SIZE)
+    posts = []
+    if query:
+        try:
+            hits = search_backend.search(query, Config.SEARCH_CANDIDATES)
+            deleting = being_deleted([post_id for post_id, _ in hits])
+            hits = [hit for hit in hits if hit[0] not in deleting]
+            found = load_cached_posts([post_id for post_id, _ in hits])
+            posts = [with_viewer_flags(p) for p in blend(hits, found, limit)]
+        except Exception as e:
+            print(f"Search error: {e}")
+    etag, last_modified = feed_validators(['search', query, limit], posts, None)
+    unchanged = not_modified(etag, last_modified)
+    if unchanged:
+        return unchanged
+    page = render_template('index.html', posts=posts, cards=render_cards(posts), next_cursor=None, query=query)
+    return with_validators(page, etag, last_modified)
+
+# Server-Sent Events stream of per-post changes
+@bp.route('/events')
+def events():
+    global _sse_streams
+    with _sse_streams_lock:
+        if Config.SSE_MAX_STREAMS is not None and _sse_streams >= Config.SSE_MAX_STREAMS:
+            # keep threads for ordinary requests; EventSource doesn't retry a 204
+            return '', 204
+        _sse_streams += 1
+
+    def release():
+        global _sse_streams
+        with _sse_streams_lock:
+            _sse_streams -= 1
+
+    def stream():
+        q = event_bus.subscribe()
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                try:
+                    yield format_sse(q.get(timeout=SSE_HEARTBEAT_SECONDS))
+                except queue.Empty:
+                    # comment line keeps proxies from closing an idle stream
+                    yield ': ping\n\n'
+        finally:
+            event_bus.unsubscribe(q)
+
+    response = Response(stream_with_context(stream()), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.call_on_close(release)
+    return response
+
+# Images kept by file:// storage or the local data backend (in production
+# they come from Supabase Storage)
+@bp.route('/uploads/<path:key>')
+def uploaded_image(key):
+    if isinstance(image_pipeline.storage, LocalImageStorage):
+        root = image_pipeline.storage.root
+    elif local_database() is not None:
+        root = local_database().storage_dir
+    else:
+        return '', 404
+    return send_from_directory(root, key, max_age=31536000)
+
+@bp.route('/about')
 def about():
     return render_template('about.html')
 
-@app.route('/login', methods=['GET', 'POST'])
+@bp.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         email = request.form['username']  # This is actually email
         password = request.form['password']
         try:
-            response = supabase.auth.sign_in_with_password({
-                "email": email,
-                "password": password
-            })
+            # Sign in; the profile comes from the cache, or is looked up by
+            # email at the same time
+            def sign_in():
+                return supabase.auth.sign_in_with_password({
+                    "email": email,
+                    "password": password
+                })
+            cached_profile = profile_cache.cached_by_email(email)
+            if cached_profile:
+                response, profile_response = sign_in(), None
+            else:
+                response, profile_response = gather(
+                    sign_in,
+                    lambda: supabase.table('user_profiles').select('*').eq('email', email).execute(),
+                    return_exceptions=True
+                )
+            if isinstance(response, Exception):
+                raise response
             if response.user:
                 # Persist Supabase tokens
                 save_sb_session(response.session)
+                reset_request_client()
                 
-                # Get user profile from our custom table
-                profile_response = supabase.table('user_profiles').select('*').eq('user_id', response.user.id).execute()
+                # Get user profile from our custom table; retry by user_id (as the
+                # signed-in user) if the email lookup failed or was hidden by RLS
+                profile_rows = []
+                if cached_profile and cached_profile.get('user_id') == response.user.id:
+                    profile_rows = [cached_profile]
+                elif profile_response is not None and not isinstance(profile_response, Exception):
+                    profile_rows = [p for p in profile_response.data or [] if p.get('user_id') == response.user.id]
+                    if profile_rows:
+                        profile_cache.prime(profile_rows[0])
+                if not profile_rows:
+                    profile = profile_cache.get(response.user.id, recheck_missing=True)
+                    profile_rows = [profile] if profile else []
                 
-                if profile_response.data:
-                    profile = profile_response.data[0]
+                if profile_rows:
+                    profile = profile_rows[0]
                     session['username'] = email
                     session['user_id'] = response.user.id
                     session['user_role'] = profile['role']
@@ -204,7 +1419,7 @@ def login():
                     session['user_role'] = 'student'  # Default role
                     session['is_admin'] = False
                 
-                return redirect(url_for('index'))
+                return redirect(url_for('main.index'))
             else:
                 return render_template('login.html', error="Invalid credentials")
         except Exception as e:
@@ -212,7 +1427,7 @@ def login():
             return render_template('login.html', error=f"Login failed: {str(e)}")
     return render_template('login.html')
 
-@app.route('/register', methods=['GET', 'POST'])
+@bp.route('/register', methods=['GET', 'POST'])
 def register():
     if request.method == 'POST':
         email = request.form['email']
@@ -254,13 +1469,15 @@ def register():
                 profile_response = supabase.table('user_profiles').insert(profile_data).execute()
                 
                 if profile_response.data:
+                    # drop a cached "no profile" entry for this user
+                    profile_cache.invalidate(user_id, email)
                     session['username'] = email
                     session['user_id'] = user_id
                     session['user_role'] = role
                     session['full_name'] = full_name
                     session['is_admin'] = (role == 'admin')
                     
-                    return redirect(url_for('profile'))
+                    return redirect(url_for('main.profile'))
                 else:
                     return render_template('register.html', error="Failed to create user profile")
             else:
@@ -272,27 +1489,33 @@ def register():
     
     return render_template('register.html')
 
-@app.route('/profile')
+@bp.route('/profile')
 @login_required
 def profile():
     # Fetch posts created by this user
     my_posts = []
+    next_cursor = None
+    limit, cursor = page_args(PROFILE_PAGE_SIZE)
+    try:
+        parse_keyset_cursor(cursor)
+    except ValueError as e:
+        abort(400, str(e))
     try:
         user_id = session.get('user_id')
         if user_id:
-            resp = supabase.table('tweets').select('*').eq('author_id', user_id).order('created_at', desc=True).execute()
-            my_posts = resp.data or []
+            query = supabase.table('tweets').select('*').eq('author_id', user_id)
+            my_posts, next_cursor = keyset_page(query, limit, cursor)
     except Exception as e:
         print(f"Error fetching my posts: {e}")
         my_posts = []
-    return render_template('profile.html', username=session['username'], my_posts=my_posts)
+    return render_template('profile.html', username=session['username'], my_posts=my_posts, next_cursor=next_cursor)
 
-@app.route('/admin')
+@bp.route('/admin')
 @admin_required
 def admin():
     return render_template('admin.html')
 
-@app.route('/logout')
+@bp.route('/logout')
 @login_required
 def logout():
     try:
@@ -301,37 +1524,29 @@ def logout():
     except Exception as e:
         print(f"Supabase sign_out error: {e}")
     session.clear()
-    return redirect(url_for('index'))
+    return redirect(url_for('main.index'))
 
 # Upvote/Unupvote resource (using existing likes table)
-@app.route('/upvote_resource', methods=['POST'])
+@bp.route('/upvote_resource', methods=['POST'])
 @login_required
+@rate_limited
 def upvote_resource():
     resource_id = request.json.get('resource_id')
     user_id = session['user_id']
-    
+    # journaled with the change, so a replay after a crash can still write it
+    access_token = job_token()
+
+    def toggle():
+        # Answered from the upvote engine; the likes row is written in the background
+        action, upvotes_count = upvote_engine.toggle(resource_id, user_id, access_token)
+        patch_cached_post(resource_id, upvotes_count=upvotes_count)
+        publish_post_event('upvotes', resource_id, upvotes_count=upvotes_count)
+        return action, upvotes_count
+
     try:
-        # Check if user already upvoted this resource
-        existing_upvote = supabase.table('likes').select('id').eq('resource_id', resource_id).eq('user_id', user_id).execute()
-        
-        if existing_upvote.data:
-            # Remove upvote
-            supabase.table('likes').delete().eq('resource_id', resource_id).eq('user_id', user_id).execute()
-            action = 'unupvoted'
-        else:
-            # Add upvote
-            upvote_data = {
-                'id': str(uuid4()),
-                'resource_id': resource_id,
-                'user_id': user_id,
-                'like_type': 'upvote'
-            }
-            supabase.table('likes').insert(upvote_data).execute()
-            action = 'upvoted'
-        
-        # Get updated upvotes count
-        upvotes_response = supabase.table('likes').select('id', count='exact').eq('resource_id', resource_id).execute()
-        upvotes_count = upvotes_response.count if hasattr(upvotes_response, 'count') else len(upvotes_response.data)
+        # a click while the previous toggle is still running gets its result;
+        # once it is done, the next click toggles back
+        action, upvotes_count = coalescer.run(write_key('upvote', resource_id), toggle, 'upvote', window=0)
         
         return jsonify({
             'success': True,
@@ -344,7 +1559,7 @@ def upvote_resource():
         return jsonify({'success': False, 'error': str(e)})
 
 # Create new resource (only faculty can create) - using tweets table
-@app.route('/create_post', methods=['GET', 'POST'])
+@bp.route('/create_post', methods=['GET', 'POST'])
 @login_required
 def create_post():
     if request.method == 'POST':
@@ -361,35 +1576,14 @@ def create_post():
         if not name or not name.strip():
             return render_template('create_post.html', error="Resource name/title cannot be empty")
         
-        # If an image file is provided, upload to Supabase Storage and get public URL
+        # Spool the image to disk now; resizing and upload happen after the post is created
+        spooled = None
         if image_file and image_file.filename:
             try:
-                # ensure client has user session (for RLS/policies on storage)
-                set_client_session_from_flask()
-                ext = os.path.splitext(image_file.filename)[1].lower() or '.jpg'
-                file_key = f"posts/{uuid4()}{ext}"
-                image_bytes = image_file.read()
-                # Upload file bytes with correct contentType and upsert
-                upload_resp = supabase.storage.from_('images').upload(
-                    file_key,
-                    image_bytes,
-                    {"contentType": image_file.mimetype or "image/jpeg", "upsert": True}
-                )
-                print("upload_resp:", upload_resp)
-                # If SDK returns dict with error, don't set URL
-                if isinstance(upload_resp, dict) and upload_resp.get('error'):
-                    print("Storage upload error:", upload_resp['error'])
-                else:
-                    public = supabase.storage.from_('images').get_public_url(file_key)
-                    print("public_url_resp:", public)
-                    if isinstance(public, dict):
-                        image_url = (public.get('data') or {}).get('publicUrl') or image_url
-                    elif isinstance(public, str):
-                        image_url = public or image_url
-            except Exception as e:
-                print(f"Image upload failed: {e}")
-                # proceed without image
-        
+                spooled = spool_upload(image_file, Config.MAX_IMAGE_BYTES)
+            except UploadError as e:
+                return render_template('create_post.html', error=str(e))
+
         try:
             new_id = str(uuid4())
             resource_data = {
@@ -400,8 +1594,12 @@ def create_post():
                 'author_id': session.get('user_id')
             }
             supabase.table('tweets').insert(resource_data).execute()
+            invalidate_post(new_id, membership_changed=True)
 
-            # Create an initial status update if provided
+            sync_summary(new_id)
+            publish_post_event('created', new_id)
+
+            # The initial status update, if provided, is written after the response
             if crowd_level or chips_available or queue_length:
                 status_data = {
                     'id': str(uuid4()),
@@ -412,21 +1610,32 @@ def create_post():
                     'queue_length': queue_length,
                     'user_id': session.get('user_id')
                 }
-                try:
-                    supabase.table('tweet_replies').insert(status_data).execute()
-                except Exception as e:
-                    print(f"Warning: initial status insert failed: {e}")
-
-            return redirect(url_for('index'))
+                job_queue.enqueue('insert_status', {'row': status_data, 'access_token': job_token()},
+                                  key=f"status:{status_data['id']}")
+            if spooled:
+                # the worker uploads with the user's token (RLS/policies on storage)
+                client = make_client(session.get('sb_access'))
+                token = job_token()
+                image_pipeline.submit(spooled, f"posts/{new_id}", client,
+                                      on_done=lambda url, variants: job_queue.enqueue(
+                                          'attach_images',
+                                          {'resource_id': new_id, 'image_url': url, 'variants': variants,
+                                           'access_token': token},
+                                          key=f'attach:{new_id}'))
+                spooled = None
+            return redirect(url_for('main.index'))
         except Exception as e:
             print(f"Resource creation error: {e}")
+            if spooled:
+                os.remove(spooled[0])
             return render_template('create_post.html', error="Failed to create resource")
     
     return render_template('create_post.html')
 
 # Update resource status (only faculty can update) - using tweet_replies table
-@app.route('/update_status/<resource_id>', methods=['POST'])
+@bp.route('/update_status/<resource_id>', methods=['POST'])
 @login_required
+@rate_limited
 def update_status(resource_id):
     status_message = request.form.get('status_message', '')
     crowd_level = request.form.get('crowd_level', '')
@@ -444,34 +1653,135 @@ def update_status(resource_id):
             'queue_length': queue_length,
             'user_id': session['user_id']
         }
-        supabase.table('tweet_replies').insert(status_data).execute()
-        return redirect(url_for('index'))
+
+        def write():
+            supabase.table('tweet_replies').insert(status_data).execute()
+            invalidate_post(resource_id)
+            sync_summary(resource_id)
+            publish_post_event('status', resource_id, **post_delta(resource_id))
+
+        # a resubmitted form is written once
+        coalescer.run(write_key('status', resource_id, status_message, crowd_level, chips_available, queue_length),
+                      write, 'status')
+        return redirect(url_for('main.index'))
     except Exception as e:
         print(f"Status update error: {e}")
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
+
+def ingest_identity():
+    """(user_id, client) for the request's bearer token, an INGEST_KEYS key or a
+    Supabase access token (checked locally with SUPABASE_JWT_SECRET or the
+    JWKS, else by the auth server); None when it is neither."""
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not token.strip():
+        return None
+    token = token.strip()
+    for key, user_id in Config.INGEST_KEYS.items():
+        if hmac.compare_digest(token.encode(), key.encode()):
+            # device keys write as the service role when configured
+            return user_id, make_client(Config.SUPABASE_SERVICE_KEY or None)
+    claims = verify_access_token(token)
+    if claims and claims.get('sub'):
+        return claims['sub'], make_client(token)
+    return None
+
+# Bulk status updates from kiosks and sensors: a JSON array (or NDJSON, one
+# update per line) answered with a result per item
+@bp.route('/api/status_updates', methods=['POST'])
+def ingest_status_updates():
+    identity = ingest_identity()
+    if identity is None:
+        return jsonify({'success': False, 'error': 'A valid bearer token is required'}), 401
+    user_id, client = identity
+    try:
+        items = ingest.parse_batch(request.get_data(), request.mimetype)
+    except ingest.IngestError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    if len(items) > Config.INGEST_MAX_BATCH:
+        return jsonify({'success': False, 'error': f'At most {Config.INGEST_MAX_BATCH} updates per request'}), 413
+
+    now = datetime.now(timezone.utc)
+    results, latest = ingest.latest_readings(items, now, Config.INGEST_MAX_CLOCK_SKEW)
+    if latest:
+        try:
+            known = {row['id'] for row in select_in('tweets', 'id', 'id', list(latest))}
+        except Exception as e:
+            print(f"Ingest resource lookup failed: {e}")
+            return jsonify({'success': False, 'error': 'Backend unavailable, retry later'}), 503
+        watermarks = ingest_watermarks.get_many(list(latest))
+        for resource_id, (index, reading) in list(latest.items()):
+            if resource_id not in known:
+                results[index].update(status='invalid', error='Unknown resource_id')
+            elif reading['observed_at'].timestamp() <= watermarks.get(resource_id, float('-inf')):
+                results[index]['status'] = 'stale'
+            else:
+                continue
+            del latest[resource_id]
+
+    # created_at is the reading's own time, so even a late reading that slips
+    # past an evicted watermark never displaces a newer latest status
+    rows = []
+    for resource_id, (index, reading) in latest.items():
+        row = {k: v for k, v in reading.items() if k != 'observed_at'}
+        row.update(id=str(uuid4()), user_id=user_id, created_at=reading['observed_at'].isoformat())
+        rows.append(row)
+        results[index].update(status='accepted', id=row['id'])
+    if rows:
+        try:
+            client.table('tweet_replies').insert(rows).execute()
+        except Exception as e:
+            print(f"Ingest insert failed: {e}")
+            for resource_id, (index, _) in latest.items():
+                results[index] = {'index': index, 'resource_id': resource_id, 'status': 'failed'}
+            return jsonify({'success': False, 'error': 'Backend unavailable, retry later', 'results': results}), 503
+        ingest_watermarks.set_many({rid: reading['observed_at'].timestamp() for rid, (_, reading) in latest.items()})
+        resource_ids = list(latest)
+        invalidate_posts(resource_ids)
+        sync_summaries(resource_ids)
+        try:
+            posts = load_cached_posts(resource_ids)
+        except Exception as e:
+            print(f"Ingest event deltas failed: {e}")
+            posts = {}
+        for resource_id in resource_ids:
+            post = posts.get(resource_id) or {}
+            publish_post_event('status', resource_id,
+                               **{k: post.get(k) for k in ('upvotes_count', 'comments_count', 'latest_status', 'importance')})
+
+    accepted = len(rows)
+    return jsonify({'success': True, 'accepted': accepted, 'rejected': len(results) - accepted, 'results': results})
 
 # Delete resource (owner or faculty can delete) - using tweets table
-@app.route('/delete_resource/<resource_id>', methods=['POST'])
+@bp.route('/delete_resource/<resource_id>', methods=['POST'])
 @login_required
 def delete_resource(resource_id):
     try:
         # Fetch the tweet to verify ownership
-        tweet_resp = supabase.table('tweets').select('author_id').eq('id', resource_id).limit(1).execute()
+        tweet_resp = supabase.table('tweets').select('*').eq('id', resource_id).limit(1).execute()
         if not tweet_resp.data:
             return jsonify({'success': False, 'error': 'Not found'})
-        author_id = tweet_resp.data[0].get('author_id')
+        tweet = tweet_resp.data[0]
+        author_id = tweet.get('author_id')
         is_owner = session.get('user_id') == author_id
         is_faculty = session.get('user_role') == 'faculty'
         if not (is_owner or is_faculty):
             return jsonify({'success': False, 'error': 'Not authorized'})
 
-        # Delete related data first
-        supabase.table('likes').delete().eq('resource_id', resource_id).execute()
-        supabase.table('replies').delete().eq('resource_id', resource_id).execute()
-        supabase.table('tweet_replies').delete().eq('resource_id', resource_id).execute()
-        
-        # Delete the resource (tweet)
-        supabase.table('tweets').delete().eq('id', resource_id).execute()
+        # Hide the post now; its rows and images are deleted in the background.
+        # The mark lasts until the job is done or dead (delete_post_failed)
+        upvote_engine.forget(resource_id)
+        delete_marks.set(resource_id, True, ttl=job_queue.horizon())
+        invalidate_post(resource_id, membership_changed=True)
+        if Config.POST_SUMMARIES:
+            summary.delete_summary(summary_client(), resource_id)
+        job_queue.enqueue('delete_post', {
+            'resource_id': resource_id,
+            'image_url': tweet.get('image_url'),
+            'image_variants': tweet.get('image_variants'),
+            'name': tweet.get('name'),
+            'user_id': session.get('user_id'),
+            'access_token': job_token()
+        }, key=f'delete:{resource_id}')
         
         return jsonify({'success': True})
     except Exception as e:
@@ -479,22 +1789,23 @@ def delete_resource(resource_id):
         return jsonify({'success': False, 'error': str(e)})
 
 # Edit resource (owner or faculty can edit) - using tweets table
-@app.route('/edit_post/<resource_id>', methods=['GET', 'POST'])
+@bp.route('/edit_post/<resource_id>', methods=['GET', 'POST'])
 @login_required
 def edit_post(resource_id):
     # Ownership check
     try:
-        tw_resp = supabase.table('tweets').select('author_id').eq('id', resource_id).limit(1).execute()
+        tw_resp = supabase.table('tweets').select('*').eq('id', resource_id).limit(1).execute()
         if not tw_resp.data:
-            return redirect(url_for('index'))
-        author_id = tw_resp.data[0].get('author_id')
+            return redirect(url_for('main.index'))
+        current = tw_resp.data[0]
+        author_id = current.get('author_id')
         is_owner = session.get('user_id') == author_id
         is_faculty = session.get('user_role') == 'faculty'
         if not (is_owner or is_faculty):
-            return redirect(url_for('index'))
+            return redirect(url_for('main.index'))
     except Exception as e:
         print(f"Ownership check failed: {e}")
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
 
     if request.method == 'POST':
         name = request.form['name']
@@ -510,8 +1821,17 @@ def edit_post(resource_id):
                 'content': content,
                 'image_url': image_url
             }
+            image_replaced = (current.get('image_url') or '') != image_url
+            if image_replaced and 'image_variants' in current:
+                # the variants belong to the old image
+                update_data['image_variants'] = {}
             supabase.table('tweets').update(update_data).eq('id', resource_id).execute()
-            return redirect(url_for('index'))
+            if image_replaced:
+                cleanup_post_images(resource_id, current.get('image_url'), current.get('image_variants'), job_token())
+            invalidate_post(resource_id)
+            sync_summary(resource_id)
+            publish_post_event('edited', resource_id)
+            return redirect(url_for('main.index'))
         except Exception as e:
             print(f"Resource update error: {e}")
             return render_template('edit_post.html', post={'id': resource_id, 'name': name, 'content': content, 'image_url': image_url}, error="Failed to update resource")
@@ -523,44 +1843,162 @@ def edit_post(resource_id):
             post = resource_response.data[0]
             return render_template('edit_post.html', post=post)
         else:
-            return redirect(url_for('index'))
+            return redirect(url_for('main.index'))
     except Exception as e:
         print(f"Error fetching resource: {e}")
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
 
-@app.route('/comments/<resource_id>', methods=['GET', 'POST'])
+@bp.route('/comments/<resource_id>', methods=['GET', 'POST'])
 @login_required
+@rate_limited
 def comments(resource_id):
     if request.method == 'POST':
         comment_text = request.form.get('comment', '').strip()
         if comment_text:
+            row = {
+                'id': str(uuid4()),
+                'resource_id': resource_id,
+                'status_message': comment_text,
+                'user_id': session.get('user_id')
+            }
+
+            def write():
+                supabase.table('tweet_replies').insert(row).execute()
+                invalidate_post(resource_id)
+                sync_summary(resource_id)
+                publish_post_event('comments', resource_id, **post_delta(resource_id))
+
             try:
-                supabase.table('tweet_replies').insert({
-                    'id': str(uuid4()),
-                    'resource_id': resource_id,
-                    'status_message': comment_text,
-                    'user_id': session.get('user_id')
-                }).execute()
+                # a resubmitted form is written once
+                coalescer.run(write_key('comment', resource_id, comment_text), write, 'comment')
             except Exception as e:
                 print(f"Insert comment failed: {e}")
-        return redirect(url_for('comments', resource_id=resource_id))
+        return redirect(url_for('main.comments', resource_id=resource_id))
 
     # GET -> list existing comments
     comments_list = []
+    next_cursor = None
+    limit, cursor = page_args(COMMENTS_PAGE_SIZE)
     try:
-        resp = supabase.table('tweet_replies').select('*').eq('resource_id', resource_id).order('created_at', desc=True).execute()
-        comments_list = resp.data or []
-    except Exception as e:
-        print(f"Fetch comments failed: {e}")
-    # Also fetch the post header
+        parse_keyset_cursor(cursor)
+    except ValueError as e:
+        abort(400, str(e))
     post = None
+    # every comment (and edit) bumps the post's version, so the page can be
+    # validated before anything is fetched
+    version = current_versions([f'post:{resource_id}'])[f'post:{resource_id}']
+    etag, last_modified = page_validators(['comments', resource_id, limit, cursor, version], version)
+    unchanged = not_modified(etag, last_modified)
+    if unchanged:
+        return unchanged
+    # Fetch the comments (hot and archived) and the post header concurrently
+    page, archived, pr = gather(
+        lambda: keyset_page(supabase.table('tweet_replies').select('*').eq('resource_id', resource_id), limit, cursor),
+        lambda: (keyset_page(supabase.table(retention.ARCHIVE_TABLE).select('*').eq('resource_id', resource_id),
+                             limit, cursor) if Config.STATUS_HOT_DAYS else ([], None)),
+        lambda: supabase.table('tweets').select('*').eq('id', resource_id).limit(1).execute(),
+        return_exceptions=True
+    )
+    if isinstance(archived, Exception):
+        print(f"Fetch archived comments failed: {archived}")
+        archived = ([], None)
+    if isinstance(page, Exception):
+        print(f"Fetch comments failed: {page}")
+    else:
+        comments_list, next_cursor = merge_pages([page, archived], limit)
+    if isinstance(pr, Exception):
+        print(f"Fetch post for comments failed: {pr}")
+    elif pr.data:
+        post = pr.data[0]
+    commenter_names = {}
     try:
-        pr = supabase.table('tweets').select('*').eq('id', resource_id).limit(1).execute()
-        if pr.data:
-            post = pr.data[0]
+        profiles = profile_cache.get_many(c.get('user_id') for c in comments_list)
+        commenter_names = {user_id: p.get('full_name') for user_id, p in profiles.items()}
     except Exception as e:
-        print(f"Fetch post for comments failed: {e}")
-    return render_template('comments.html', post=post, comments=comments_list)
+        print(f"Fetch commenter names failed: {e}")
+    page = render_template('comments.html', post=post, comments=comments_list, next_cursor=next_cursor,
+                           commenter_names=commenter_names)
+    return with_validators(page, etag, last_modified)
+
+@bp.cli.command('rebuild-summaries')
+def rebuild_summaries_command():
+    """Backfill post_summaries from tweets, likes, tweet_replies and user_profiles."""
+    written = summary.rebuild_all(summary_client(), build_posts)
+    click.echo(f"Rebuilt {written} post summaries")
+
+@bp.cli.command('check-summaries')
+@click.option('--fix', is_flag=True, help='Rewrite stale/missing rows and remove orphaned ones.')
+def check_summaries_command(fix):
+    """Report post_summaries rows that disagree with the raw tables."""
+    report = summary.check_all(summary_client(), build_posts, fix=fix)
+    click.echo(f"Checked {report['checked']} posts")
+    for kind in ('missing', 'stale', 'orphaned'):
+        click.echo(f"  {kind}: {len(report[kind])}" + (f" ({', '.join(report[kind][:10])})" if report[kind] else ''))
+
+@bp.cli.command('build-assets')
+def build_assets_command():
+    """Minify, fingerprint and precompress static CSS/JS ahead of a deploy."""
+    for name, built in sorted(asset_pipeline.build().items()):
+        click.echo(f"{name} -> {built}")
+
+@bp.cli.command('compact-statuses')
+@click.option('--days', type=float, help='Keep this many days hot (default STATUS_HOT_DAYS).')
+def compact_statuses_command(days):
+    """Archive and roll up old status updates now, in batches."""
+    days = days if days is not None else Config.STATUS_HOT_DAYS
+    if not days:
+        raise click.UsageError('Set STATUS_HOT_DAYS or pass --days')
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=days)).isoformat()
+    client = job_client({})
+    after, done, posts = None, False, set()
+    while not done:
+        after, touched, done = compact_statuses_step(client, cutoff, after)
+        posts.update(touched)
+    click.echo(f"Compacted status updates older than {cutoff} on {len(posts)} posts")
+
+@bp.cli.command('jobs')
+@click.option('--retry', 'retry_id', type=int, help='Requeue this dead job.')
+@click.option('--retry-all', is_flag=True, help='Requeue every dead job.')
+def jobs_command(retry_id, retry_all):
+    """Show background jobs by state and the dead-letter list."""
+    if retry_id is not None or retry_all:
+        click.echo(f"Requeued {job_queue.retry(retry_id)} jobs")
+    click.echo(', '.join(f"{state}: {count}" for state, count in job_queue.depth().items()))
+    for job in job_queue.dead():
+        click.echo(f"  #{job['id']} {job['kind']} after {job['attempts']} attempts: {job['last_error']}")
+
+
+
+def create_app():
+    """Build the Flask app.
+
+    Nothing here connects to a backend: clients, pools, stores and worker
+    threads are created on first use in the process that uses them, and
+    again after a fork, so a preloading gunicorn master can build the app
+    once for all its workers (see gunicorn.conf.py).
+    """
+    if Config.POST_SUMMARIES and not Config.SUPABASE_SERVICE_KEY and not Config.DATA_BACKEND_URL.startswith('sqlite://'):
+        # RLS lets users read post_summaries but not write it
+        raise RuntimeError("POST_SUMMARIES needs SUPABASE_SERVICE_KEY to keep post_summaries up to date")
+    if Config.STATUS_HOT_DAYS and not Config.SUPABASE_SERVICE_KEY and not Config.DATA_BACKEND_URL.startswith('sqlite://'):
+        # only the service role writes the archive and the rollups
+        raise RuntimeError("STATUS_HOT_DAYS needs SUPABASE_SERVICE_KEY to archive status updates")
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.secret_key = app.config['SECRET_KEY']
+    app.permanent_session_lifetime = timedelta(days=7)
+    # Session data server-side, the cookie only carries its id (see sessions.py)
+    session_interface = make_session_interface(Config.SESSION_URL, Config.SESSION_REFRESH_SECONDS,
+                                               Config.SESSION_SWEEP_SECONDS)
+    if session_interface is not None:
+        app.session_interface = session_interface
+    # Reject oversized uploads before reading them (a little headroom for the other form fields)
+    app.config['MAX_CONTENT_LENGTH'] = Config.MAX_IMAGE_BYTES + 1024 * 1024
+    app.register_blueprint(bp)
+    app.view_functions['static'] = static_file
+    before_render_template.connect(instrumentation.template_started, app)
+    template_rendered.connect(instrumentation.template_finished, app)
+    return app
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    create_app().run(debug=True)
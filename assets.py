@@ -0,0 +1,131 @@
+# Static asset build: the CSS and JS under static/ minified, named by content
+# hash and precompressed (.gz, plus .br with the brotli package), so
+# pages can link them with a year-long immutable Cache-Control. app.py points
+# url_for('static', ...) at the built names and serves them.
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+
+ASSET_TYPES = ('.css', '.js')
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Precompressed copies: encoding -> file suffix
+ENCODINGS = {'br': '.br', 'gzip': '.gz'} if brotli else {'gzip': '.gz'}
+
+
+def minify_css(text):
+    text = re.sub(r'/\*.*?\*/', '', text, flags=re.S)
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'\s*([{};,>])\s*', r'\1', text)
+    # not before ':', which would join a descendant selector like `a :hover`
+    text = re.sub(r':\s+', ':', text)
+    return text.replace(';}', '}').strip()
+
+
+def minify_js(text):
+    # Line by line only: newlines stay, so automatic semicolon insertion and
+    # regex literals are left alone
+    lines = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line and not line.startswith('//'):
+            lines.append(line)
+    return '\n'.join(lines) + '\n'
+
+
+MINIFIERS = {'.css': minify_css, '.js': minify_js}
+
+
+def _write(path, data, replace=False):
+    # built names are content hashes, so workers building at once write the
+    # same bytes; the rename keeps a reader from seeing half a file
+    if os.path.exists(path) and not replace:
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class AssetPipeline:
+    """Builds static/ CSS and JS into build_dir and maps names both ways.
+
+    Earlier builds are left in place, so pages cached with older names keep
+    working after a deploy.
+    """
+
+    def __init__(self, source_dir, build_dir):
+        self.source_dir = source_dir
+        self.build_dir = build_dir
+        self._manifest = None
+        self._built_names = set()
+        self._mtimes = None
+        self._lock = threading.Lock()
+        self.version = ''
+
+    def _sources(self):
+        for root, _, files in os.walk(self.source_dir):
+            for name in sorted(files):
+                if name.endswith(ASSET_TYPES):
+                    path = os.path.join(root, name)
+                    yield os.path.relpath(path, self.source_dir).replace(os.sep, '/'), path
+
+    def _source_mtimes(self):
+        return {name: os.stat(path).st_mtime_ns for name, path in self._sources()}
+
+    def build(self):
+        """Build every asset; returns the manifest {source name: built name}."""
+        manifest = {}
+        mtimes = {}
+        for name, path in self._sources():
+            mtimes[name] = os.stat(path).st_mtime_ns
+            stem, ext = os.path.splitext(name)
+            with open(path, encoding='utf-8') as f:
+                data = MINIFIERS[ext](f.read()).encode()
+            built = f'{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+            target = os.path.join(self.build_dir, built)
+            _write(target, data)
+            _write(target + '.gz', gzip.compress(data, compresslevel=9, mtime=0))
+            if brotli:
+                _write(target + '.br', brotli.compress(data, quality=11))
+            manifest[name] = built
+        if not brotli:
+            print("Assets built without .br copies: install the 'brotli' package (requirements.txt)")
+        version = hashlib.sha1(json.dumps(manifest, sort_keys=True).encode()).hexdigest()[:12]
+        _write(os.path.join(self.build_dir, 'manifest.json'),
+               json.dumps(manifest, indent=2, sort_keys=True).encode(), replace=True)
+        self._manifest, self._built_names, self._mtimes, self.version = manifest, set(manifest.values()), mtimes, version
+        return manifest
+
+    def manifest(self, check=False):
+        """The current manifest, built on first use (and again when `check`
+        is set and a source changed, for debug mode)."""
+        if self._manifest is None or (check and self._source_mtimes() != self._mtimes):
+            with self._lock:
+                if self._manifest is None or (check and self._source_mtimes() != self._mtimes):
+                    self.build()
+        return self._manifest
+
+    def built_name(self, name, check=False):
+        """Fingerprinted name of a static file; other files keep their name."""
+        return self.manifest(check).get(name, name)
+
+    def is_built(self, name):
+        """Whether `name` is a built file (of this build or an earlier one)."""
+        self.manifest()
+        if name in self._built_names:
+            return True
+        return (name.endswith(ASSET_TYPES) and '..' not in name.split('/')
+                and os.path.isfile(os.path.join(self.build_dir, name)))
+
+    def encodings(self, name):
+        """Encodings precompressed for a built file, best first."""
+        return [e for e, suffix in ENCODINGS.items() if os.path.isfile(os.path.join(self.build_dir, name + suffix))]
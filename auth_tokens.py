@@ -0,0 +1,148 @@
+import base64
+import hashlib
+import threading
+import time
+
+import jwt
+from cryptography.fernet import Fernet, InvalidToken
+
+from cache import make_cache
+from clients import local_database, make_client, shared_http_client
+from config import Config
+from instrumentation import timed
+
+# Refreshed token sets keyed by the refresh token they replaced, so every
+# request still carrying the old cookie gets the same new tokens
+token_cache = make_cache(Config.TOKEN_CACHE_URL, max_entries=10000,
+                         ttl=Config.TOKEN_CACHE_TTL, prefix='morphx:tokens:')
+
+_refresh_locks = {}
+_refresh_locks_guard = threading.Lock()
+
+_jwks = {'keys': {}, 'fetched_at': 0.0}
+_jwks_lock = threading.Lock()
+
+
+def _jwks_key(kid):
+    """Signing key `kid` from the project's cached JWKS."""
+    now = time.monotonic()
+    with _jwks_lock:
+        age = now - _jwks['fetched_at']
+        # refetch when stale, or for an unknown kid (key rotation) at most every 30s
+        if age >= Config.JWKS_TTL or (kid not in _jwks['keys'] and age >= 30):
+            try:
+                with timed('auth', 'jwks', 'get'):
+                    resp = shared_http_client().get(
+                        f"{Config.SUPABASE_URL.rstrip('/')}/auth/v1/.well-known/jwks.json",
+                        headers={'apikey': Config.SUPABASE_KEY})
+                resp.raise_for_status()
+                jwk_set = jwt.PyJWKSet.from_dict(resp.json())
+                _jwks['keys'] = {k.key_id: k for k in jwk_set.keys}
+            except Exception as e:
+                print(f"JWKS fetch failed: {e}")
+            _jwks['fetched_at'] = now
+        return _jwks['keys'].get(kid)
+
+
+def _remote_claims(token):
+    """Claims of a token the auth server accepted (auth.get_user), cached
+    for up to TOKEN_CACHE_TTL seconds; None if it was rejected."""
+    claims = jwt.decode(token, options={'verify_signature': False, 'verify_exp': True})
+    key = 'user:' + hashlib.sha256(token.encode()).hexdigest()
+    if token_cache.get(key) is not None:
+        return claims
+    try:
+        user = make_client().auth.get_user(token).user
+    except Exception as e:
+        print(f"Supabase get_user failed: {e}")
+        return None
+    if not user or user.id != claims.get('sub'):
+        return None
+    token_cache.set(key, True, ttl=max(1, min(int(claims['exp'] - time.time()), Config.TOKEN_CACHE_TTL)))
+    return claims
+
+
+def verify_access_token(token):
+    """Claims of a Supabase access token, or None if invalid/expired.
+
+    HS256 tokens are checked locally against SUPABASE_JWT_SECRET (or the
+    local backend's secret) and asymmetric ones against the cached JWKS.
+    Without key material the auth server checks the token instead.
+    """
+    try:
+        header = jwt.get_unverified_header(token)
+        alg = header.get('alg', 'HS256')
+        key = None
+        if alg == 'HS256':
+            db = local_database()
+            key = Config.SUPABASE_JWT_SECRET or (db.jwt_secret if db is not None else None)
+        elif header.get('kid'):
+            jwk = _jwks_key(header['kid'])
+            key = jwk.key if jwk else None
+        if key is None:
+            return _remote_claims(token)
+        return jwt.decode(token, key, algorithms=[alg], audience='authenticated', leeway=10)
+    except jwt.PyJWTError:
+        return None
+
+
+def _fernet():
+    return Fernet(base64.urlsafe_b64encode(hashlib.sha256(Config.SECRET_KEY.encode()).digest()))
+
+
+def seal_token(token):
+    """`token` encrypted with SECRET_KEY, for storing outside the session
+    (job payloads, upvote journals)."""
+    return _fernet().encrypt(token.encode()).decode() if token else None
+
+
+def unseal_token(sealed):
+    """The token seal_token() encrypted, or None (also when SECRET_KEY changed)."""
+    if not sealed:
+        return None
+    try:
+        return _fernet().decrypt(sealed.encode()).decode()
+    except InvalidToken:
+        return None
+
+
+def _lock_for(key):
+    with _refresh_locks_guard:
+        lock = _refresh_locks.get(key)
+        if lock is None:
+            lock = _refresh_locks[key] = threading.Lock()
+        return lock
+
+
+def refresh_tokens(refresh_token):
+    """Exchange a refresh token for new tokens, once per refresh token.
+
+    Concurrent callers with the same refresh token wait for a single
+    refresh and share its result (Supabase rotates refresh tokens, so a
+    second refresh with the old one would fail). Returns a dict with
+    access_token, refresh_token and expires_at, or None on failure.
+    """
+    key = hashlib.sha256(refresh_token.encode()).hexdigest()
+    cached = token_cache.get(key)
+    if cached is not None:
+        return cached
+    lock = _lock_for(key)
+    with lock:
+        cached = token_cache.get(key)
+        if cached is not None:
+            return cached
+        try:
+            refreshed = make_client().auth.refresh_session(refresh_token).session
+            tokens = {
+                'access_token': refreshed.access_token,
+                'refresh_token': refreshed.refresh_token,
+                'expires_at': time.time() + refreshed.expires_in,
+            }
+            token_cache.set(key, tokens)
+            return tokens
+        except Exception as e:
+            print(f"Supabase refresh failed: {e}")
+            return None
+        finally:
+            with _refresh_locks_guard:
+                _refresh_locks.pop(key, None)
@@ -0,0 +1,81 @@
+"""Many simulated users hitting /profile at once against the local stub.
+
+Checks that every response only contains the requesting user's posts
+(per-request auth isolation) and compares throughput of the shared
+keep-alive pool against opening a new HTTP client per request.
+
+    python benchmarks/concurrency.py --users 50 --requests 20 --delay 0.005
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.stub_server import BENCH_JWT_SECRET, bench_token, start_stub  # noqa: E402
+
+
+def run(app, users, requests_per_user, state):
+    def simulate(user):
+        client = app.test_client()
+        with client.session_transaction() as s:
+            s.update(username=f'{user}@campus.edu', user_id=user, user_role='student',
+                     sb_access=bench_token(user), sb_refresh='r', sb_expires_at=time.time() + 3600)
+        leaks = 0
+        for _ in range(requests_per_user):
+            body = client.get('/profile').get_data(as_text=True)
+            if f'post-of-{user}' not in body or body.count('post-of-') != 1:
+                leaks += 1
+        return leaks
+
+    requests_before, connections_before = state.requests, state.connections
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as pool:
+        leaks = sum(pool.map(simulate, [f'user{i}' for i in range(users)]))
+    elapsed = time.perf_counter() - start
+    total = users * requests_per_user
+    return {
+        'requests': total,
+        'rps': total / elapsed,
+        'wrong_user_responses': leaks,
+        'backend_calls': state.requests - requests_before,
+        'tcp_connections': state.connections - connections_before,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=20)
+    parser.add_argument('--delay', type=float, default=0.005, help='stub latency per call (s)')
+    args = parser.parse_args()
+
+    tables = {'tweets': [{'id': f'p{i}', 'name': f'post-of-user{i}', 'content': '', 'author_id': f'user{i}',
+                          'created_at': '2025-01-01T00:00:00+00:00'} for i in range(args.users)]}
+    url, state, _ = start_stub(args.delay, tables)
+    os.environ['SUPABASE_URL'] = url
+    os.environ['SUPABASE_JWT_SECRET'] = BENCH_JWT_SECRET
+
+    import clients
+    from app import create_app
+    app = create_app()
+
+    pooled = run(app, args.users, args.requests, state)
+
+    shared = clients.shared_http_client
+    clients.shared_http_client = lambda: httpx.Client(timeout=10)
+    try:
+        unpooled = run(app, args.users, args.requests, state)
+    finally:
+        clients.shared_http_client = shared
+
+    for name, result in (('shared pool', pooled), ('client per request', unpooled)):
+        print(f"{name:>20}: {result['rps']:8.1f} req/s  backend calls={result['backend_calls']}  "
+              f"tcp connections={result['tcp_connections']}  wrong-user responses={result['wrong_user_responses']}")
+
+
+if __name__ == '__main__':
+    main()
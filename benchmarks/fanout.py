@@ -0,0 +1,75 @@
+"""Request latency with sequential vs concurrent backend fan-out.
+
+Runs the routes that issue independent Supabase calls (feed build,
+comments page, delete) against the local stub with a fixed per-call delay,
+once with BACKEND_FANOUT_WORKERS=1 (sequential) and once concurrently.
+
+    python benchmarks/fanout.py --delay 0.05 --iterations 10
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.stub_server import BENCH_JWT_SECRET, bench_token, start_stub  # noqa: E402
+
+
+def measure(call, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        call()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--delay', type=float, default=0.05, help='stub latency per call (s)')
+    parser.add_argument('--iterations', type=int, default=10)
+    args = parser.parse_args()
+
+    tables = {
+        'tweets': [{'id': 'p1', 'name': 'Library', 'content': '', 'author_id': 'user1',
+                    'created_at': '2025-01-01T00:00:00+00:00'}],
+        'tweet_replies': [{'id': 'r1', 'resource_id': 'p1', 'status_message': 'quiet', 'user_id': 'user1',
+                           'created_at': '2025-01-01T00:00:00+00:00'}],
+    }
+    # the per-post views of sql/feed_views.sql
+    tables['latest_statuses'] = tables['tweet_replies']
+    tables['post_counts'] = [{'resource_id': 'p1', 'upvotes_count': 0, 'comments_count': 1}]
+    url, _, _ = start_stub(args.delay, tables)
+    os.environ['SUPABASE_URL'] = url
+    os.environ['SUPABASE_JWT_SECRET'] = BENCH_JWT_SECRET
+
+    import app as app_module
+    from config import Config
+
+    client = app_module.create_app().test_client()
+    with client.session_transaction() as s:
+        s.update(username='user1@campus.edu', user_id='user1', user_role='faculty',
+                 sb_access=bench_token('user1'), sb_refresh='r', sb_expires_at=time.time() + 3600)
+
+    def feed_build():
+        app_module.feed_cache.clear()
+        client.get('/')
+
+    routes = {
+        'GET / (cold feed)': feed_build,
+        'GET /comments/<id>': lambda: client.get('/comments/p1'),
+        'POST /delete_resource': lambda: client.post('/delete_resource/p1'),
+    }
+    workers = Config.BACKEND_FANOUT_WORKERS
+    print(f"stub delay {args.delay * 1000:.0f} ms per call, median of {args.iterations}")
+    for name, call in routes.items():
+        Config.BACKEND_FANOUT_WORKERS = 1
+        sequential = measure(call, args.iterations)
+        Config.BACKEND_FANOUT_WORKERS = workers
+        concurrent = measure(call, args.iterations)
+        print(f"{name:>24}: sequential {sequential:7.1f} ms  concurrent {concurrent:7.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
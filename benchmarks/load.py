@@ -0,0 +1,269 @@
+"""Load test of the main routes against the local SQLite backend.
+
+Seeds --posts posts (with about --likes-per-post upvotes and
+--replies-per-post status updates each), signs in --users simulated users
+and drives every route from that many threads, reporting p50/p95/p99
+latency, throughput and backend calls per request. Each backend call
+sleeps --latency-ms to stand in for the round trip to Supabase.
+
+    python benchmarks/load.py --posts 10000 --likes-per-post 100 --users 32
+    python benchmarks/load.py --save benchmarks/baseline.json
+    python benchmarks/load.py --compare benchmarks/baseline.json   # exit 1 on a regression
+
+The delta route polls /api/v1/feed for posts changed since each client's
+previous poll. The bulk ingestion route posts --ingest-batch readings per request (with a
+device key), so its throughput times the batch size is updates per second.
+
+Calls per request include background upvote flushes that land during a
+route's run.
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+IMPORTANCE = ['', '', 'low', 'medium', 'high', 'critical']
+CROWD = ['Low', 'Medium', 'High']
+SEED_CHUNK = 50000
+
+
+def seed(db, posts, likes_per_post, replies_per_post, authors, rng):
+    """Fill the tables with a feed of `posts` posts; returns the post ids."""
+    now = datetime.now(timezone.utc)
+
+    def stamp(max_days=90):
+        return (now - timedelta(seconds=rng.randrange(max_days * 86400))).isoformat()
+
+    author_ids = [str(uuid4()) for _ in range(authors)]
+    db.bulk_insert('user_profiles', [
+        {'user_id': a, 'email': f'author{i}@campus.edu', 'role': 'student', 'full_name': f'Author {i}'}
+        for i, a in enumerate(author_ids)])
+    post_ids = [str(uuid4()) for _ in range(posts)]
+    for start in range(0, posts, SEED_CHUNK):
+        db.bulk_insert('tweets', [
+            {'id': p, 'name': f'Resource {start + i}', 'content': 'Seeded post ' * 8,
+             'image_url': '', 'author_id': rng.choice(author_ids), 'created_at': stamp()}
+            for i, p in enumerate(post_ids[start:start + SEED_CHUNK])])
+
+    # skewed like counts (a few popular posts) drawn from a pool of voters
+    voters = [str(uuid4()) for _ in range(max(1000, likes_per_post * 3))]
+    likes, replies = [], []
+    for p in post_ids:
+        count = min(len(voters), int(rng.expovariate(1 / likes_per_post))) if likes_per_post else 0
+        likes.extend({'id': str(uuid4()), 'resource_id': p, 'user_id': u, 'like_type': 'upvote',
+                      'created_at': stamp()} for u in rng.sample(voters, count))
+        for _ in range(rng.randint(0, 2 * replies_per_post)):
+            replies.append({'id': str(uuid4()), 'resource_id': p, 'status_message': 'Seeded update',
+                            'crowd_level': rng.choice(CROWD), 'chips_available': rng.choice(IMPORTANCE),
+                            'queue_length': str(rng.randrange(30)), 'user_id': rng.choice(author_ids),
+                            'created_at': stamp()})
+        if len(likes) >= SEED_CHUNK:
+            db.bulk_insert('likes', likes)
+            likes = []
+        if len(replies) >= SEED_CHUNK:
+            db.bulk_insert('tweet_replies', replies)
+            replies = []
+    db.bulk_insert('likes', likes)
+    db.bulk_insert('tweet_replies', replies)
+    return post_ids
+
+
+def percentile(quantiles, p):
+    return quantiles[p - 1] if quantiles else 0.0
+
+
+def summarize(samples, errors, elapsed, calls):
+    quantiles = statistics.quantiles(samples, n=100, method='inclusive') if len(samples) > 1 else samples * 99
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'p50_ms': round(percentile(quantiles, 50), 2),
+        'p95_ms': round(percentile(quantiles, 95), 2),
+        'p99_ms': round(percentile(quantiles, 99), 2),
+        'throughput_rps': round(len(samples) / elapsed, 1) if elapsed else 0.0,
+        'calls_per_request': round(calls / len(samples), 2) if samples else 0.0,
+    }
+
+
+def drive(db, clients, total, call, threads):
+    """Run `call(client)` `total` times spread over one thread per client."""
+    per_client = [total // len(clients) + (1 if i < total % len(clients) else 0) for i in range(len(clients))]
+
+    def worker(index):
+        samples, errors = [], 0
+        for _ in range(per_client[index]):
+            start = time.perf_counter()
+            try:
+                status = call(clients[index])
+            except Exception as e:
+                print(f"request failed: {e}")
+                status = 500
+            samples.append((time.perf_counter() - start) * 1000)
+            errors += status >= 500
+        return samples, errors
+
+    calls_before = db.call_count
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(worker, range(len(clients))))
+    elapsed = time.perf_counter() - start
+    samples = [s for r in results for s in r[0]]
+    return summarize(samples, sum(r[1] for r in results), elapsed, db.call_count - calls_before)
+
+
+def compare(results, baseline, tolerance):
+    """Routes whose p95 latency or calls per request grew by more than `tolerance`."""
+    regressions = []
+    for route, current in results.items():
+        before = baseline.get('results', {}).get(route)
+        if not before:
+            continue
+        for metric in ('p95_ms', 'calls_per_request'):
+            if current[metric] > before[metric] * (1 + tolerance) + 0.5:
+                regressions.append(f"{route}: {metric} {before[metric]} -> {current[metric]}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--posts', type=int, default=1000)
+    parser.add_argument('--likes-per-post', type=int, default=20, help='average; skewed per post')
+    parser.add_argument('--replies-per-post', type=int, default=3, help='average')
+    parser.add_argument('--authors', type=int, default=500)
+    parser.add_argument('--users', type=int, default=16, help='concurrent simulated users')
+    parser.add_argument('--requests', type=int, default=200, help='requests per route')
+    parser.add_argument('--cold-requests', type=int, default=3, help='sequential cold-cache feed builds')
+    parser.add_argument('--latency-ms', type=float, default=5.0, help='per backend call')
+    parser.add_argument('--jitter-ms', type=float, default=1.0)
+    parser.add_argument('--ingest-batch', type=int, default=50, help='readings per bulk ingestion request')
+    parser.add_argument('--db', help='SQLite file to use (default: in memory)')
+    parser.add_argument('--summaries', action='store_true', help='serve the feed from post_summaries')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--save', help='write results as JSON')
+    parser.add_argument('--compare', help='baseline JSON from --save; exit 1 on a regression')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative growth for --compare')
+    args = parser.parse_args()
+
+    os.environ['DATA_BACKEND_URL'] = f"sqlite://{args.db or ''}?latency_ms={args.latency_ms}&jitter_ms={args.jitter_ms}"
+    os.environ['UPVOTE_JOURNAL_DIR'] = tempfile.mkdtemp(prefix='morphx-bench-journal-')
+    os.environ['IMAGE_STORAGE_URL'] = 'file://' + tempfile.mkdtemp(prefix='morphx-bench-images-')
+    os.environ['JOB_OUTBOX_PATH'] = os.path.join(tempfile.mkdtemp(prefix='morphx-bench-jobs-'), 'jobs.sqlite3')
+    os.environ['SESSION_URL'] = 'memory://'
+    # measure the routes, not the per-user write limits
+    os.environ['RATE_LIMITS'] = ''
+    if args.summaries:
+        os.environ['POST_SUMMARIES'] = '1'
+    ingest_key = 'bench-ingest-key'
+    os.environ['INGEST_KEYS'] = f'{uuid4()}:{ingest_key}'
+
+    import app as app_module
+    import summary
+
+    db = app_module.local_database()
+    rng = random.Random(args.seed)
+    latency, db.latency, jitter, db.jitter = db.latency, 0.0, db.jitter, 0.0
+    start = time.perf_counter()
+    post_ids = seed(db, args.posts, args.likes_per_post, args.replies_per_post, args.authors, rng)
+    if args.summaries:
+        summary.rebuild_all(app_module.make_client(), app_module.build_posts, batch_size=500)
+    password = 'bench-password'
+    users = []
+    for i in range(args.users):
+        email = f'bench{i}@campus.edu'
+        user_id = db.create_user(email, password, password_method='pbkdf2:sha256:1000')
+        db.bulk_insert('user_profiles', [{'user_id': user_id, 'email': email, 'role': 'faculty',
+                                          'full_name': f'Bench User {i}'}])
+        users.append(email)
+    counts = {t: db.execute(f'select count(*) from {t}')[0][0] for t in ('tweets', 'likes', 'tweet_replies')}
+    print(f"seeded {counts['tweets']} posts, {counts['likes']} likes, {counts['tweet_replies']} status updates "
+          f"in {time.perf_counter() - start:.1f}s")
+    db.latency, db.jitter = latency, jitter
+
+    app = app_module.create_app()
+    clients = [app.test_client() for _ in users]
+    results = {}
+    logins = iter(users)
+    results['POST /login'] = drive(
+        db, clients, len(users),
+        lambda c: c.post('/login', data={'username': next(logins), 'password': password}).status_code,
+        args.users)
+
+    def cold_feed(client):
+        app_module.feed_cache.clear()
+        return client.get('/').status_code
+
+    results['GET / (cold cache)'] = drive(db, clients[:1], args.cold_requests, cold_feed, 1)
+    page_two = clients[0].get('/feed').get_json().get('next_cursor') or ''
+
+    def pick():
+        return rng.choice(post_ids)
+
+    def ingest(client):
+        readings = [{'resource_id': pick(), 'crowd_level': rng.choice(CROWD), 'queue_length': rng.randrange(30),
+                     'importance': rng.choice(IMPORTANCE)} for _ in range(args.ingest_batch)]
+        return client.post('/api/status_updates', json=readings,
+                           headers={'Authorization': f'Bearer {ingest_key}'}).status_code
+
+    # each client polls for what changed since its previous poll, like a signage screen
+    as_of = {}
+
+    def poll(client):
+        response = client.get('/api/v1/feed', query_string={
+            'since': as_of.get(client, 0), 'fields': 'upvotes_count,comments_count,latest_status'
+        }, headers={'Accept-Encoding': 'gzip'})
+        if response.status_code == 200:
+            body = response.data
+            if response.headers.get('Content-Encoding') == 'gzip':
+                body = gzip.decompress(body)
+            as_of[client] = json.loads(body)['as_of']
+        return response.status_code
+
+    routes = {
+        'GET /': lambda c: c.get('/').status_code,
+        'GET /api/v1/feed (delta)': poll,
+        'GET /feed (page 2)': lambda c: c.get(f'/feed?cursor={page_two}').status_code,
+        'POST /upvote_resource': lambda c: c.post('/upvote_resource', json={'resource_id': pick()}).status_code,
+        'GET /comments/<id>': lambda c: c.get(f'/comments/{pick()}').status_code,
+        'POST /comments/<id>': lambda c: c.post(f'/comments/{pick()}', data={'comment': 'bench'}).status_code,
+        'GET /profile': lambda c: c.get('/profile').status_code,
+        'POST /api/status_updates': ingest,
+    }
+    for name, call in routes.items():
+        results[name] = drive(db, clients, args.requests, call, args.users)
+
+    print(f"{args.users} users, {args.latency_ms:g} ms (+{args.jitter_ms:g}) per backend call"
+          + (", feed from post_summaries" if args.summaries else ""))
+    print(f"{'route':>24} {'reqs':>5} {'err':>4} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>7} {'calls/req':>9}")
+    for name, r in results.items():
+        print(f"{name:>24} {r['requests']:>5} {r['errors']:>4} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} "
+              f"{r['p99_ms']:>8.1f} {r['throughput_rps']:>7.1f} {r['calls_per_request']:>9.2f}")
+
+    report = {'params': {k: v for k, v in vars(args).items() if k not in ('save', 'compare')}, 'results': results}
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('params') != report['params']:
+            print(f"warning: {args.compare} was recorded with different parameters: {baseline.get('params')}")
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print(f"no regressions against {args.compare}")
+
+
+if __name__ == '__main__':
+    main()
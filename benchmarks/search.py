@@ -0,0 +1,99 @@
+"""Query latency of the in-memory search index.
+
+Builds an InvertedIndex of --posts synthetic posts (names, descriptions and
+a few status updates) whose words follow a Zipf distribution over a campus
+vocabulary padded to --vocabulary words, then times --queries random one-
+and two-word queries, half of them typed as prefixes, plus single-post
+reindexes as made after each write. Queries are drawn from the most common
+words, so they match far more posts than typical searches would.
+
+    python benchmarks/search.py --posts 100000
+"""
+import argparse
+import itertools
+import os
+import random
+import statistics
+import sys
+import time
+from uuid import uuid4
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from search import InvertedIndex  # noqa: E402
+
+PLACES = ['library', 'canteen', 'gym', 'lab', 'auditorium', 'parking', 'hostel', 'cafeteria', 'bookstore',
+          'clinic', 'pool', 'printer', 'shuttle', 'lounge', 'court', 'studio', 'office', 'garden']
+WORDS = ['queue', 'crowd', 'quiet', 'busy', 'open', 'closed', 'wifi', 'seats', 'coffee', 'lunch', 'exam',
+         'study', 'floor', 'north', 'south', 'east', 'west', 'block', 'room', 'hall', 'desk', 'power',
+         'outlet', 'noise', 'line', 'wait', 'minutes', 'available', 'full', 'empty', 'maintenance']
+
+
+def vocabulary(size, rng):
+    words = PLACES + WORDS
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    while len(words) < size:
+        words.append(''.join(rng.choice(letters) for _ in range(rng.randint(4, 10))))
+    return words
+
+
+def documents(rng, posts, words):
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(words))))
+
+    def sentence(n):
+        return ' '.join(rng.choices(words, cum_weights=cum_weights, k=n))
+
+    for i in range(posts):
+        yield (str(uuid4()), f'{rng.choice(PLACES).title()} {sentence(2)} {i}', sentence(20),
+               [sentence(6) for _ in range(rng.randint(0, 5))])
+
+
+def percentiles(samples):
+    q = statistics.quantiles(samples, n=100, method='inclusive')
+    return q[49], q[94], q[98]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--posts', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--vocabulary', type=int, default=20000)
+    parser.add_argument('--candidates', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    index = InvertedIndex()
+    words = vocabulary(args.vocabulary, rng)
+    docs = list(documents(rng, args.posts, words))
+    start = time.perf_counter()
+    index.load(docs)
+    print(f"indexed {len(index)} posts in {time.perf_counter() - start:.1f}s")
+
+    def query():
+        picked = rng.sample(words[:500], rng.choice((1, 2)))
+        if rng.random() < 0.5:
+            picked[-1] = picked[-1][:rng.randint(2, len(picked[-1]))]
+        return ' '.join(picked)
+
+    samples, matches = [], []
+    for _ in range(args.queries):
+        q = query()
+        t = time.perf_counter()
+        hits = index.search(q, args.candidates)
+        samples.append((time.perf_counter() - t) * 1000)
+        matches.append(len(hits))
+    p50, p95, p99 = percentiles(samples)
+    print(f"search: p50 {p50:.2f} ms, p95 {p95:.2f} ms, p99 {p99:.2f} ms "
+          f"({statistics.mean(matches):.0f} hits returned on average)")
+
+    samples = []
+    for post_id, name, content, statuses in rng.sample(docs, min(len(docs), args.queries)):
+        t = time.perf_counter()
+        index.put(post_id, name, content, statuses + [' '.join(rng.sample(words[:500], 6))])
+        samples.append((time.perf_counter() - t) * 1000)
+    p50, p95, p99 = percentiles(samples)
+    print(f"reindex one post: p50 {p50:.3f} ms, p95 {p95:.3f} ms, p99 {p99:.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+"""Startup time and throughput of each gunicorn worker profile.
+
+Measures the cold import of app.py and create_app() in fresh interpreters,
+then starts gunicorn with each profile of gunicorn.conf.py (with and
+without WEB_PRELOAD) against the local Supabase stub, and reports the time
+from launch to the first successful response and the requests per second
+per core under --concurrency keep-alive clients for --seconds.
+
+    python benchmarks/startup.py --workers 2 --seconds 10
+    python benchmarks/startup.py --profiles threaded,sync --path /api/v1/feed
+
+The stub and the load clients run in this process, on the same machine as
+the workers, so absolute numbers are pessimistic; compare profiles with
+each other. The gevent profile is skipped when gevent isn't installed.
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from benchmarks.stub_server import BENCH_JWT_SECRET, start_stub  # noqa: E402
+
+IMPORT_SNIPPET = """
+import time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.create_app()
+print(imported - start, time.perf_counter() - imported)
+"""
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def measure_import(env, runs):
+    """Median seconds to import app and to run create_app(), each in a fresh interpreter."""
+    imports, creates = [], []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, '-c', IMPORT_SNIPPET], cwd=ROOT, env=env, check=True,
+                             capture_output=True, text=True).stdout.split()
+        imports.append(float(out[-2]))
+        creates.append(float(out[-1]))
+    return statistics.median(imports), statistics.median(creates)
+
+
+def wait_for_first_response(url, process, timeout):
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with {process.returncode}")
+        try:
+            if httpx.get(url, timeout=5).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.01)
+    raise RuntimeError(f"no response from {url} within {timeout}s")
+
+
+def drive(url, concurrency, seconds):
+    """(requests per second, errors) from `concurrency` keep-alive clients."""
+    deadline = time.perf_counter() + seconds
+    lock = threading.Lock()
+    totals = {'ok': 0, 'errors': 0}
+
+    def client():
+        ok = errors = 0
+        with httpx.Client(timeout=10) as http:
+            while time.perf_counter() < deadline:
+                try:
+                    if http.get(url).status_code == 200:
+                        ok += 1
+                    else:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+        with lock:
+            totals['ok'] += ok
+            totals['errors'] += errors
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(client)
+    return totals['ok'] / (time.perf_counter() - start), totals['errors']
+
+
+def run_profile(profile, preload, env, args):
+    port = free_port()
+    env = dict(env, WEB_PROFILE=profile, WEB_PRELOAD='1' if preload else '0', WEB_WORKERS=str(args.workers))
+    launched = time.perf_counter()
+    process = subprocess.Popen(['gunicorn', '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{port}',
+                                '--log-level', 'warning', 'app:create_app()'],
+                               cwd=ROOT, env=env)
+    try:
+        url = f'http://127.0.0.1:{port}{args.path}'
+        wait_for_first_response(url, process, args.timeout)
+        first_response = time.perf_counter() - launched
+        # every worker past its first request before measuring
+        drive(url, args.concurrency, 1)
+        rps, errors = drive(url, args.concurrency, args.seconds)
+    finally:
+        process.terminate()
+        process.wait(30)
+    return {'first_response_s': first_response, 'rps': rps, 'errors': errors}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--profiles', default='threaded,sync,gevent')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='processes per profile (WEB_WORKERS)')
+    parser.add_argument('--concurrency', type=int, default=16, help='load clients')
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--path', default='/')
+    parser.add_argument('--posts', type=int, default=50)
+    parser.add_argument('--delay', type=float, default=0.002, help='stub latency per call (s)')
+    parser.add_argument('--import-runs', type=int, default=5)
+    parser.add_argument('--timeout', type=float, default=60, help='seconds to wait for the first response')
+    args = parser.parse_args()
+
+    tables = {
+        'tweets': [{'id': f'p{i}', 'name': f'Resource {i}', 'content': 'status board', 'author_id': f'user{i % 10}',
+                    'created_at': '2025-01-01T00:00:00+00:00'} for i in range(args.posts)],
+        'tweet_replies': [{'id': f'r{i}', 'resource_id': f'p{i}', 'status_message': 'quiet', 'crowd_level': 'Low',
+                           'user_id': f'user{i % 10}', 'created_at': '2025-01-01T00:00:00+00:00'}
+                          for i in range(args.posts)],
+    }
+    # the per-post views of sql/feed_views.sql
+    tables['latest_statuses'] = tables['tweet_replies']
+    tables['post_counts'] = [{'resource_id': f'p{i}', 'upvotes_count': 0, 'comments_count': 1} for i in range(args.posts)]
+    stub_url, _, _ = start_stub(args.delay, tables)
+    scratch = tempfile.mkdtemp(prefix='morphx-bench-startup-')
+    env = dict(os.environ, SUPABASE_URL=stub_url, SUPABASE_JWT_SECRET=BENCH_JWT_SECRET, SESSION_URL='memory://',
+               JOB_OUTBOX_PATH=os.path.join(scratch, 'jobs.sqlite3'),
+               UPVOTE_JOURNAL_DIR=os.path.join(scratch, 'journal'),
+               IMAGE_STORAGE_URL='file://' + os.path.join(scratch, 'images'),
+               ASSET_BUILD_DIR=os.path.join(scratch, 'assets'))
+
+    import_s, create_s = measure_import(env, args.import_runs)
+    print(f"import app: {import_s * 1000:.0f} ms   create_app(): {create_s * 1000:.1f} ms")
+
+    cores = min(args.workers, os.cpu_count())
+    print(f"{args.workers} workers on {os.cpu_count()} cores, {args.concurrency} clients on {args.path}")
+    for profile in args.profiles.split(','):
+        if profile == 'gevent':
+            try:
+                import gevent  # noqa: F401
+            except ImportError:
+                print(f"{profile:>9}: skipped (gevent not installed)")
+                continue
+        for preload in (False, True):
+            result = run_profile(profile, preload, env, args)
+            label = f"{profile}{' +preload' if preload else ''}"
+            print(f"{label:>17}: first response {result['first_response_s'] * 1000:6.0f} ms   "
+                  f"{result['rps']:7.1f} req/s   {result['rps'] / cores:7.1f} req/s/core   errors={result['errors']}")
+
+
+if __name__ == '__main__':
+    main()
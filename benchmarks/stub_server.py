@@ -0,0 +1,94 @@
+"""Minimal local stand-in for the Supabase REST API, for benchmarks.
+
+Every GET on /rest/v1/<table> answers after DELAY seconds with rows taken
+from `tables`. A Bearer JWT makes the stub answer as its `sub`: rows with
+an author_id/user_id belonging to someone else are hidden, the same way an
+RLS policy would hide them. Use bench_token() to mint such tokens; the
+benchmarks point SUPABASE_JWT_SECRET at BENCH_JWT_SECRET so the app can
+verify them locally.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import jwt
+
+BENCH_JWT_SECRET = 'benchmark-only-jwt-secret-do-not-deploy'
+
+
+def bench_token(user, ttl=3600):
+    return jwt.encode({'sub': user, 'aud': 'authenticated', 'exp': int(time.time()) + ttl},
+                      BENCH_JWT_SECRET, algorithm='HS256')
+
+
+def _token_user(token):
+    try:
+        return jwt.decode(token, options={'verify_signature': False}).get('sub')
+    except jwt.PyJWTError:
+        return None
+
+
+class StubState:
+    def __init__(self, delay=0.0, tables=None):
+        self.delay = delay
+        self.tables = tables or {}
+        self.requests = 0
+        self.connections = 0
+        self.lock = threading.Lock()
+
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def setup(self):
+            super().setup()
+            with state.lock:
+                state.connections += 1
+
+        def log_message(self, *args):
+            pass
+
+        def _reply(self, rows):
+            body = json.dumps(rows).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('Content-Range', f'0-{max(len(rows) - 1, 0)}/{len(rows)}')
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            with state.lock:
+                state.requests += 1
+            if state.delay:
+                time.sleep(state.delay)
+            table = self.path.split('?')[0].rsplit('/', 1)[-1]
+            user = _token_user(self.headers.get('Authorization', '').removeprefix('Bearer '))
+            rows = [r for r in state.tables.get(table, [])
+                    if user is None or r.get('author_id', r.get('user_id', user)) == user]
+            self._reply(rows)
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            self.rfile.read(length)
+            with state.lock:
+                state.requests += 1
+            if state.delay:
+                time.sleep(state.delay)
+            self._reply([])
+
+        do_PATCH = do_DELETE = do_POST
+
+    return Handler
+
+
+def start_stub(delay=0.0, tables=None, port=0):
+    """Start the stub in a daemon thread; returns (base_url, state, server)."""
+    state = StubState(delay, tables)
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_address[1]}', state, server
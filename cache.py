@@ -0,0 +1,172 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """In-process cache with a per-entry TTL and a maximum number of entries
+    (None: never evicts, for entries that must last their TTL)."""
+
+    def __init__(self, max_entries=1000, ttl=60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def get_many(self, keys):
+        found = {}
+        for key in keys:
+            value = self.get(key)
+            if value is not None:
+                found[key] = value
+        return found
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (ttl if ttl is not None else self.ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while self.max_entries is not None and len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def set_many(self, items, ttl=None):
+        for key, value in items.items():
+            self.set(key, value, ttl)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class RedisCache:
+    """Same interface as LRUCache, backed by a Redis-compatible client.
+
+    Values are stored as JSON; size is bounded by the server's own
+    maxmemory/eviction policy rather than max_entries.
+    """
+
+    def __init__(self, client, prefix='morphx:', ttl=60):
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def _key(self, key):
+        return f"{self.prefix}{key}"
+
+    def get(self, key):
+        raw = self.client.get(self._key(key))
+        return json.loads(raw) if raw is not None else None
+
+    def get_many(self, keys):
+        keys = list(keys)
+        if not keys:
+            return {}
+        raws = self.client.mget([self._key(k) for k in keys])
+        return {k: json.loads(raw) for k, raw in zip(keys, raws) if raw is not None}
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self._key(key), json.dumps(value), ex=int(ttl if ttl is not None else self.ttl))
+
+    def set_many(self, items, ttl=None):
+        pipe = self.client.pipeline()
+        for key, value in items.items():
+            pipe.set(self._key(key), json.dumps(value), ex=int(ttl if ttl is not None else self.ttl))
+        pipe.execute()
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*[self._key(k) for k in keys])
+
+    def clear(self):
+        keys = list(self.client.scan_iter(f"{self.prefix}*"))
+        if keys:
+            self.client.delete(*keys)
+
+
+class FakeRedis:
+    """Tiny local stand-in for the Redis commands RedisCache uses."""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key):
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at is not None and expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    def get(self, key):
+        with self._lock:
+            return self._live(key)
+
+    def mget(self, keys):
+        with self._lock:
+            return [self._live(k) for k in keys]
+
+    def set(self, key, value, ex=None):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ex if ex else None)
+        return True
+
+    def delete(self, *keys):
+        with self._lock:
+            return sum(1 for k in keys if self._data.pop(k, None) is not None)
+
+    def scan_iter(self, pattern='*'):
+        prefix = pattern.rstrip('*')
+        with self._lock:
+            return [k for k in self._data if k.startswith(prefix)]
+
+    def pipeline(self):
+        return _FakePipeline(self)
+
+
+class _FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+
+    def set(self, *args, **kwargs):
+        self.calls.append((args, kwargs))
+        return self
+
+    def execute(self):
+        return [self.client.set(*args, **kwargs) for args, kwargs in self.calls]
+
+
+def make_cache(url, max_entries=1000, ttl=60, prefix='morphx:'):
+    """Build a cache from a URL: memory://, fake:// or redis://host:port/db."""
+    if not url or url.startswith('memory://'):
+        return LRUCache(max_entries=max_entries, ttl=ttl)
+    if url.startswith('fake://'):
+        return RedisCache(FakeRedis(), prefix=prefix, ttl=ttl)
+    if url.startswith(('redis://', 'rediss://')):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("Install the 'redis' package to use a redis:// cache URL")
+        return RedisCache(redis.Redis.from_url(url), prefix=prefix, ttl=ttl)
+    raise ValueError(f"Unsupported cache URL: {url}")
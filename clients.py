@@ -0,0 +1,95 @@
+import os
+import threading
+
+from flask import g, has_request_context, session
+
+from config import Config
+from instrumentation import InstrumentedClient
+
+# supabase, httpx and localdb (which pulls in the supabase error types) are
+# imported where first used: they take most of the app's import time, and a
+# worker, CLI command or test may never need them
+
+_http_client = None
+_http_pid = None
+_http_lock = threading.Lock()
+_local_db = None
+_local_db_pid = None
+_local_db_lock = threading.Lock()
+
+
+def shared_http_client():
+    """Keep-alive HTTP connection pool shared by every Supabase client in this process.
+
+    Rebuilt after a fork so workers never share sockets with their parent.
+    """
+    global _http_client, _http_pid
+    if _http_client is None or _http_pid != os.getpid():
+        import httpx
+        with _http_lock:
+            if _http_client is None or _http_pid != os.getpid():
+                _http_client = httpx.Client(
+                    limits=httpx.Limits(max_connections=Config.SUPABASE_HTTP_POOL_SIZE,
+                                        max_keepalive_connections=Config.SUPABASE_HTTP_POOL_SIZE),
+                    timeout=Config.SUPABASE_HTTP_TIMEOUT,
+                )
+                _http_pid = os.getpid()
+    return _http_client
+
+
+def local_database():
+    """The process's LocalDatabase when DATA_BACKEND_URL is sqlite://, else None."""
+    global _local_db, _local_db_pid
+    if not Config.DATA_BACKEND_URL.startswith('sqlite://'):
+        return None
+    if _local_db is None or _local_db_pid != os.getpid():
+        from localdb import open_local_database
+        with _local_db_lock:
+            if _local_db is None or _local_db_pid != os.getpid():
+                _local_db = open_local_database(Config.DATA_BACKEND_URL, jwt_secret=Config.SUPABASE_JWT_SECRET)
+                _local_db_pid = os.getpid()
+    return _local_db
+
+
+def make_client(access_token=None, http_client=None):
+    """A Supabase client acting as `access_token` (anon key when None).
+
+    Clients are cheap wrappers around the shared connection pool; auth state
+    lives on the client, so each request gets its own and never sees another
+    user's session. With a sqlite:// DATA_BACKEND_URL this is a LocalClient
+    with the same interface (see localdb.py). Either way its calls are
+    timed and counted (see instrumentation.py).
+    """
+    db = local_database()
+    if db is not None:
+        from localdb import LocalClient
+        return InstrumentedClient(LocalClient(db, access_token))
+    from supabase import create_client
+    from supabase.lib.client_options import SyncClientOptions
+    from supabase_auth import SyncMemoryStorage
+    options = SyncClientOptions(
+        auto_refresh_token=False,
+        persist_session=False,
+        storage=SyncMemoryStorage(),
+        httpx_client=http_client or shared_http_client(),
+    )
+    if access_token:
+        options.headers['Authorization'] = f'Bearer {access_token}'
+    return InstrumentedClient(create_client(Config.SUPABASE_URL, Config.SUPABASE_KEY, options=options))
+
+
+def get_supabase():
+    """The Supabase client for the current request, authenticated as the session's user."""
+    if not has_request_context():
+        return make_client()
+    client = g.get('supabase_client')
+    if client is None:
+        client = make_client(session.get('sb_access'))
+        g.supabase_client = client
+    return client
+
+
+def reset_request_client():
+    """Forget the request's client, e.g. after its tokens were refreshed."""
+    if has_request_context():
+        g.pop('supabase_client', None)
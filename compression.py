@@ -0,0 +1,48 @@
+# Response compression picked from the client's Accept-Encoding header:
+# brotli (the `brotli` package, in requirements.txt) when it is installed,
+# else gzip.
+# Streamed responses (the SSE stream) and files sent from disk are left
+# alone.
+import gzip
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+COMPRESSIBLE_TYPES = {'application/json', 'application/x-ndjson', 'application/javascript', 'text/html',
+                      'text/plain', 'text/css', 'text/javascript', 'image/svg+xml'}
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Server preference when the client accepts several equally
+ENCODINGS = ('br', 'gzip') if brotli else ('gzip',)
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    # mtime=0 keeps the output (and so its length) the same for the same body
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def compress_response(response, accept_encodings, min_size):
+    """Encode `response` in place with the best encoding the client accepts."""
+    if (response.mimetype not in COMPRESSIBLE_TYPES or response.is_streamed or response.direct_passthrough
+            or 'Content-Encoding' in response.headers or response.status_code in (204, 206, 304)
+            or response.status_code < 200):
+        return response
+    # caches must keep the encodings apart even when this one goes out plain
+    response.vary.add('Accept-Encoding')
+    if response.content_length is not None and response.content_length < min_size:
+        return response
+    encoding = accept_encodings.best_match(ENCODINGS)
+    if encoding is None:
+        return response
+    data = response.get_data()
+    if len(data) < min_size:
+        return response
+    response.set_data(compress(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
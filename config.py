@@ -8,3 +8,174 @@ class Config:
     ADMIN_EMAILS = os.environ.get('ADMIN_EMAILS', 'admin@example.com').split(',')
     ADMIN_PASSWORD = os.environ.get('ADMIN_PASSWORD', 'admin123')
 
+    # Where the app's data lives: supabase:// (SUPABASE_URL) or a local SQLite
+    # stand-in, sqlite:// (in memory, per process) or sqlite:///path/to.db,
+    # optionally with ?latency_ms=&jitter_ms= per backend call (see localdb.py)
+    DATA_BACKEND_URL = os.environ.get('DATA_BACKEND_URL', 'supabase://')
+
+    # Keep-alive connection pool shared by all per-request Supabase clients
+    SUPABASE_HTTP_POOL_SIZE = int(os.environ.get('SUPABASE_HTTP_POOL_SIZE', '20'))
+    SUPABASE_HTTP_TIMEOUT = float(os.environ.get('SUPABASE_HTTP_TIMEOUT', '10'))
+    # Threads for running a request's independent backend calls concurrently
+    # (1 = sequential) and the per-call time limit in seconds
+    BACKEND_FANOUT_WORKERS = int(os.environ.get('BACKEND_FANOUT_WORKERS', '16'))
+    BACKEND_CALL_TIMEOUT = float(os.environ.get('BACKEND_CALL_TIMEOUT', '10'))
+
+    # Local access-token verification: HS256 projects need the JWT secret,
+    # asymmetric keys come from the project's JWKS (cached JWKS_TTL seconds)
+    SUPABASE_JWT_SECRET = os.environ.get('SUPABASE_JWT_SECRET', '')
+    JWKS_TTL = int(os.environ.get('JWKS_TTL', '600'))
+    # Short-lived cache of refreshed tokens: memory:// or redis://host:port/db
+    TOKEN_CACHE_URL = os.environ.get('TOKEN_CACHE_URL', 'memory://')
+    TOKEN_CACHE_TTL = int(os.environ.get('TOKEN_CACHE_TTL', '60'))
+
+    # Sessions (sessions.py): the cookie holds only an id, the data is kept
+    # in memory:// (one worker), sqlite:///path (the workers on one host) or
+    # redis://host:port/db; cookie:// keeps Flask's signed cookie session.
+    # Unchanged sessions are rewritten (expiry slid) at most every
+    # SESSION_REFRESH_SECONDS; expired ones swept every SESSION_SWEEP_SECONDS
+    SESSION_URL = os.environ.get('SESSION_URL', 'sqlite:///' + os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'sessions.sqlite3'))
+    SESSION_REFRESH_SECONDS = int(os.environ.get('SESSION_REFRESH_SECONDS', '60'))
+    SESSION_SWEEP_SECONDS = int(os.environ.get('SESSION_SWEEP_SECONDS', '300'))
+
+    # Service role key for background writes (upvote flushes); without it
+    # they run as the user who made the change
+    SUPABASE_SERVICE_KEY = os.environ.get('SUPABASE_SERVICE_KEY', '')
+    # Upvote counters: memory:// (single worker) or redis://host:port/db,
+    # flushed to `likes` every UPVOTE_FLUSH_INTERVAL seconds and reloaded
+    # from it every UPVOTE_MEMBERS_TTL seconds (0 = never)
+    UPVOTE_STORE_URL = os.environ.get('UPVOTE_STORE_URL', 'memory://')
+    UPVOTE_MEMBERS_TTL = int(os.environ.get('UPVOTE_MEMBERS_TTL', '300'))
+    UPVOTE_FLUSH_INTERVAL = float(os.environ.get('UPVOTE_FLUSH_INTERVAL', '1'))
+    UPVOTE_JOURNAL_DIR = os.environ.get('UPVOTE_JOURNAL_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'upvote-journal'))
+
+    # Serve the feed from the post_summaries table (create it with
+    # sql/post_summaries.sql and backfill with `flask --app app rebuild-summaries`);
+    # needs SUPABASE_SERVICE_KEY, which the server writes the table with
+    POST_SUMMARIES = os.environ.get('POST_SUMMARIES', '').lower() in ('1', 'true', 'yes')
+
+    # Instrumentation: Server-Timing headers, a warning when one request
+    # repeats a backend call shape more than N_PLUS_ONE_THRESHOLD times,
+    # /metrics (404 until METRICS_TOKEN is set, then it needs
+    # `Authorization: Bearer METRICS_TOKEN`) and the /_debug/requests
+    # breakdown of the last DEBUG_REQUEST_HISTORY requests (DEBUG_REQUESTS=1
+    # or debug mode only)
+    SERVER_TIMING = os.environ.get('SERVER_TIMING', '1').lower() in ('1', 'true', 'yes')
+    N_PLUS_ONE_THRESHOLD = int(os.environ.get('N_PLUS_ONE_THRESHOLD', '10'))
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+    DEBUG_REQUESTS = os.environ.get('DEBUG_REQUESTS', '').lower() in ('1', 'true', 'yes')
+    DEBUG_REQUEST_HISTORY = int(os.environ.get('DEBUG_REQUEST_HISTORY', '200'))
+
+    # Response compression (compression.py): JSON, HTML and text bodies of
+    # at least COMPRESS_MIN_BYTES go out gzip- or brotli-encoded (brotli
+    # needs the `brotli` package) when the client accepts it. Set
+    # COMPRESS_RESPONSES=0 when a proxy in front already compresses
+    COMPRESS_RESPONSES = os.environ.get('COMPRESS_RESPONSES', '1').lower() in ('1', 'true', 'yes')
+    COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', '500'))
+
+    # Static CSS/JS (assets.py): minified, content-hashed and precompressed
+    # into ASSET_BUILD_DIR on first use or by `flask --app app build-assets`,
+    # then served with an immutable Cache-Control of ASSET_MAX_AGE seconds.
+    # ASSET_PIPELINE=0 serves static/ as is
+    ASSET_PIPELINE = os.environ.get('ASSET_PIPELINE', '1').lower() in ('1', 'true', 'yes')
+    ASSET_BUILD_DIR = os.environ.get('ASSET_BUILD_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'assets'))
+    ASSET_MAX_AGE = int(os.environ.get('ASSET_MAX_AGE', str(365 * 86400)))
+
+    # Author profiles by user_id (memory:// or redis://host:port/db); users
+    # without a profile are remembered for PROFILE_CACHE_NEGATIVE_TTL seconds
+    PROFILE_CACHE_URL = os.environ.get('PROFILE_CACHE_URL', 'memory://')
+    PROFILE_CACHE_TTL = int(os.environ.get('PROFILE_CACHE_TTL', '300'))
+    PROFILE_CACHE_NEGATIVE_TTL = int(os.environ.get('PROFILE_CACHE_NEGATIVE_TTL', '60'))
+    PROFILE_CACHE_MAX_ENTRIES = int(os.environ.get('PROFILE_CACHE_MAX_ENTRIES', '10000'))
+
+    # Feed cache backend: memory://, fake:// or redis://host:port/db
+    FEED_CACHE_URL = os.environ.get('FEED_CACHE_URL', 'memory://')
+    FEED_CACHE_TTL = int(os.environ.get('FEED_CACHE_TTL', '60'))
+    FEED_CACHE_MAX_ENTRIES = int(os.environ.get('FEED_CACHE_MAX_ENTRIES', '5000'))
+
+    # Per-post version stamps (time of the last write; they drive ETags) and
+    # rendered post cards keyed by version and viewer class, on the feed
+    # cache backend
+    POST_VERSION_TTL = int(os.environ.get('POST_VERSION_TTL', '86400'))
+    POST_VERSION_MAX_ENTRIES = int(os.environ.get('POST_VERSION_MAX_ENTRIES', '100000'))
+    CARD_CACHE_TTL = int(os.environ.get('CARD_CACHE_TTL', '600'))
+    CARD_CACHE_MAX_ENTRIES = int(os.environ.get('CARD_CACHE_MAX_ENTRIES', '20000'))
+
+    # Post search: memory:// (an inverted index per worker, built in the
+    # background as it starts and kept current from the live update broker)
+    # or supabase:// (tsvector columns and the search_posts RPC from
+    # sql/search.sql).
+    # SEARCH_CANDIDATES text matches are re-ranked with importance and upvotes.
+    # The memory index is rebuilt in the background after it lost events and
+    # every SEARCH_REBUILD_INTERVAL seconds (0 = only after lost events)
+    SEARCH_BACKEND_URL = os.environ.get('SEARCH_BACKEND_URL', 'memory://')
+    SEARCH_REBUILD_INTERVAL = int(os.environ.get('SEARCH_REBUILD_INTERVAL', '3600'))
+    SEARCH_CANDIDATES = int(os.environ.get('SEARCH_CANDIDATES', '200'))
+    SEARCH_STATUSES_PER_POST = int(os.environ.get('SEARCH_STATUSES_PER_POST', '10'))
+
+    # Bulk status ingestion (POST /api/status_updates) for kiosks and sensors:
+    # Bearer keys as comma-separated <user id>:<key> pairs (the updates are
+    # posted as that user, written with SUPABASE_SERVICE_KEY), or a user's
+    # Supabase access token (signature checked). Readings more than INGEST_MAX_CLOCK_SKEW seconds
+    # in the future are rejected; the newest reading per resource is
+    # remembered for INGEST_WATERMARK_TTL seconds to drop late, older ones
+    INGEST_KEYS = {key: user_id for user_id, _, key in
+                   (pair.strip().partition(':') for pair in os.environ.get('INGEST_KEYS', '').split(','))
+                   if user_id and key}
+    INGEST_MAX_BATCH = int(os.environ.get('INGEST_MAX_BATCH', '1000'))
+    INGEST_MAX_CLOCK_SKEW = int(os.environ.get('INGEST_MAX_CLOCK_SKEW', '300'))
+    INGEST_WATERMARK_TTL = int(os.environ.get('INGEST_WATERMARK_TTL', '86400'))
+    INGEST_WATERMARK_MAX_ENTRIES = int(os.environ.get('INGEST_WATERMARK_MAX_ENTRIES', '100000'))
+
+    # Write throttling (ratelimit.py): token buckets per user and endpoint,
+    # memory:// (per worker) or redis://host:port/db (shared), as
+    # <endpoint>=<requests>/<seconds> pairs; a caller over the limit gets 429
+    # with Retry-After. Identical status updates and comments from one user
+    # within COALESCE_WINDOW seconds (a double-click) share one backend
+    # operation; upvote toggles only while the first is in flight
+    RATE_LIMIT_URL = os.environ.get('RATE_LIMIT_URL', 'memory://')
+    RATE_LIMITS = {endpoint.strip(): tuple(int(n) for n in limit.split('/', 1))
+                   for endpoint, _, limit in
+                   (pair.partition('=') for pair in os.environ.get(
+                       'RATE_LIMITS', 'upvote_resource=30/60,update_status=10/60,comments=20/60').split(','))
+                   if endpoint.strip() and limit}
+    COALESCE_WINDOW = float(os.environ.get('COALESCE_WINDOW', '1'))
+
+    # Live update broker: memory:// (single worker) or redis://host:port/db
+    EVENT_BROKER_URL = os.environ.get('EVENT_BROKER_URL', 'memory://')
+    # Open /events streams per process (each holds a thread in a gthread
+    # worker); further ones get 204 and the page runs without live updates.
+    # Unset = no limit; gunicorn.conf.py sets it from the worker profile
+    SSE_MAX_STREAMS = int(os.environ['SSE_MAX_STREAMS']) if os.environ.get('SSE_MAX_STREAMS') else None
+
+
+    # Background jobs (jobs.py): a SQLite outbox shared by the processes on
+    # one host, each running JOB_WORKERS at a time. Failed jobs are retried
+    # with exponential backoff from JOB_RETRY_BASE_DELAY up to
+    # JOB_RETRY_MAX_DELAY seconds and dead-lettered after JOB_MAX_ATTEMPTS
+    # (`flask --app app jobs` lists and requeues them); a job held longer
+    # than JOB_LEASE_SECONDS (its process died) runs again
+    JOB_OUTBOX_PATH = os.environ.get('JOB_OUTBOX_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'jobs.sqlite3'))
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', '4'))
+    JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', '8'))
+    JOB_RETRY_BASE_DELAY = float(os.environ.get('JOB_RETRY_BASE_DELAY', '2'))
+    JOB_RETRY_MAX_DELAY = float(os.environ.get('JOB_RETRY_MAX_DELAY', '600'))
+    JOB_LEASE_SECONDS = float(os.environ.get('JOB_LEASE_SECONDS', '300'))
+
+    # Status retention (retention.py, needs sql/status_retention.sql and the
+    # service role key): status updates older than STATUS_HOT_DAYS move to
+    # tweet_replies_archive, summarized in STATUS_BUCKET_SECONDS buckets in
+    # status_rollups. A background pass runs daily, RETENTION_BATCH_POSTS
+    # posts and at most RETENTION_BATCH_ROWS rows per job; 0 days disables it
+    STATUS_HOT_DAYS = float(os.environ.get('STATUS_HOT_DAYS', '0'))
+    STATUS_BUCKET_SECONDS = int(os.environ.get('STATUS_BUCKET_SECONDS', '3600'))
+    RETENTION_BATCH_POSTS = int(os.environ.get('RETENTION_BATCH_POSTS', '100'))
+    RETENTION_BATCH_ROWS = int(os.environ.get('RETENTION_BATCH_ROWS', '2000'))
+
+    # Post images: supabase://<bucket> or file://<directory> (served at
+    # /uploads/), resized in the background to WebP variants of these widths
+    IMAGE_STORAGE_URL = os.environ.get('IMAGE_STORAGE_URL', 'supabase://images')
+    MAX_IMAGE_BYTES = int(os.environ.get('MAX_IMAGE_BYTES', str(8 * 1024 * 1024)))
+    IMAGE_VARIANT_WIDTHS = tuple(int(w) for w in os.environ.get('IMAGE_VARIANT_WIDTHS', '320,640,1280').split(','))
+    IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', '2'))
+    IMAGE_UPLOAD_WORKERS = int(os.environ.get('IMAGE_UPLOAD_WORKERS', '4'))
@@ -0,0 +1,100 @@
+import json
+import queue
+import threading
+
+from instrumentation import EVENTS_DROPPED
+
+
+class Subscription(queue.Queue):
+    """A subscriber's bounded queue; `dropped` counts the events it lost."""
+
+    def __init__(self, maxsize, name):
+        super().__init__(maxsize)
+        self.name = name
+        self.dropped = 0
+
+
+class EventBus:
+    """In-process pub/sub: every subscriber gets its own bounded queue.
+
+    Slow subscribers lose events instead of blocking publishers.
+    """
+
+    def __init__(self, max_queued=100):
+        self.max_queued = max_queued
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self, max_queued=None, name='sse'):
+        q = Subscription(max_queued or self.max_queued, name)
+        with self._lock:
+            self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def publish(self, event):
+        self.deliver(event)
+
+    def deliver(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(event)
+            except queue.Full:
+                q.dropped += 1
+                EVENTS_DROPPED.inc(q.name)
+
+
+class RedisEventBus(EventBus):
+    """EventBus that fans events out to every worker through a Redis channel.
+
+    Publishing goes to Redis only; a listener thread (started on first
+    subscribe, so it runs in the worker rather than a preloading master)
+    delivers each message to this worker's subscribers.
+    """
+
+    def __init__(self, client, channel='morphx:events', max_queued=100):
+        super().__init__(max_queued)
+        self.client = client
+        self.channel = channel
+        self._listener = None
+
+    def subscribe(self, max_queued=None, name='sse'):
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, daemon=True)
+                self._listener.start()
+        return super().subscribe(max_queued, name)
+
+    def publish(self, event):
+        self.client.publish(self.channel, json.dumps(event))
+
+    def _listen(self):
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(self.channel)
+        for message in pubsub.listen():
+            try:
+                self.deliver(json.loads(message['data']))
+            except Exception as e:
+                print(f"Event relay failed: {e}")
+
+
+def make_event_bus(url):
+    """Build an event bus from a URL: memory:// or redis://host:port/db."""
+    if not url or url.startswith('memory://'):
+        return EventBus()
+    if url.startswith(('redis://', 'rediss://')):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("Install the 'redis' package to use a redis:// event broker URL")
+        return RedisEventBus(redis.Redis.from_url(url))
+    raise ValueError(f"Unsupported event broker URL: {url}")
+
+
+def format_sse(event):
+    return f"event: {event.get('type', 'message')}\ndata: {json.dumps(event)}\n\n"
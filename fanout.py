@@ -0,0 +1,83 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from flask import copy_current_request_context, has_request_context
+
+from config import Config
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+_local = threading.local()
+
+
+def _get_executor():
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        with _executor_lock:
+            if _executor is None or _executor_pid != os.getpid():
+                _executor = ThreadPoolExecutor(max_workers=Config.BACKEND_FANOUT_WORKERS,
+                                               thread_name_prefix='backend-fanout')
+                _executor_pid = os.getpid()
+    return _executor
+
+
+def _run_in_worker(call):
+    def run():
+        _local.in_worker = True
+        try:
+            return call()
+        finally:
+            _local.in_worker = False
+    return run
+
+
+def gather(*calls, timeout=None, return_exceptions=False):
+    """Run independent zero-argument backend calls concurrently.
+
+    Returns their results in call order, so latency is roughly that of the
+    slowest call instead of the sum. Each call must finish within `timeout`
+    seconds (Config.BACKEND_CALL_TIMEOUT by default) or TimeoutError is
+    raised and calls that have not started yet are cancelled; a call already
+    in flight is bounded by the HTTP client's own timeout. With
+    return_exceptions=True failures are returned in place of results.
+    """
+    timeout = Config.BACKEND_CALL_TIMEOUT if timeout is None else timeout
+    if len(calls) <= 1 or Config.BACKEND_FANOUT_WORKERS <= 1 or getattr(_local, 'in_worker', False):
+        # sequential (also used for nested fan-out so the pool can't deadlock)
+        results = []
+        for call in calls:
+            try:
+                results.append(call())
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                results.append(e)
+        return results
+
+    if has_request_context():
+        calls = [copy_current_request_context(call) for call in calls]
+    executor = _get_executor()
+    futures = [executor.submit(_run_in_worker(call)) for call in calls]
+    deadline = time.monotonic() + timeout
+    results = []
+    try:
+        for future in futures:
+            try:
+                results.append(future.result(timeout=max(0, deadline - time.monotonic())))
+            except FutureTimeout:
+                error = TimeoutError(f"Backend call exceeded {timeout}s")
+                if not return_exceptions:
+                    raise error
+                results.append(error)
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                results.append(e)
+    except Exception:
+        for future in futures:
+            future.cancel()
+        raise
+    return results
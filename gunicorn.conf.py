@@ -0,0 +1,97 @@
+# gunicorn settings (the Procfile runs `gunicorn 'app:create_app()'`, which
+# reads this file). WEB_PROFILE picks how requests share the cores:
+#
+#   threaded  gthread workers, one process per core plus one, WEB_THREADS
+#             threads each (8, or 32 when a single process is started). The
+#             default: backend calls release the GIL, and each open /events
+#             stream holds only a thread; half the threads can hold one.
+#   sync      one request at a time per process, 2 x cores + 1 processes.
+#             Lowest overhead per request; /events is turned off, since a
+#             stream would hold a whole process.
+#   gevent    one process per core, up to WEB_CONNECTIONS greenlets each;
+#             for thousands of open /events streams. Needs `pip install gevent`.
+#
+# The process counts assume the shared state is shared: UPVOTE_STORE_URL,
+# FEED_CACHE_URL, PROFILE_CACHE_URL, RATE_LIMIT_URL, EVENT_BROKER_URL,
+# TOKEN_CACHE_URL and SESSION_URL. While any of them is memory:// (each
+# process keeps its own) a single process is started, since a second one
+# would answer from its own counters and caches and lose or hide the
+# other's writes.
+#
+# /events streams beyond SSE_MAX_STREAMS per process get 204 (no live
+# updates on that page) instead of taking the threads every other request
+# needs; it defaults to what the profile can hold.
+#
+# WEB_WORKERS overrides the process count. WEB_PRELOAD=1 builds the app once
+# in the master and forks it: workers boot faster and share the imported
+# code, but a code change needs a full restart (HUP doesn't reload it).
+# Backend clients, pools and threads start per worker on first use either
+# way (see create_app in app.py).
+import multiprocessing
+import os
+
+from config import Config
+
+PROFILES = {
+    'threaded': {'worker_class': 'gthread', 'workers': lambda cores: cores + 1, 'threads': 8},
+    'sync': {'worker_class': 'sync', 'workers': lambda cores: 2 * cores + 1, 'threads': 1},
+    'gevent': {'worker_class': 'gevent', 'workers': lambda cores: cores, 'threads': 1},
+}
+
+profile = os.environ.get('WEB_PROFILE', 'threaded')
+if profile not in PROFILES:
+    raise RuntimeError(f"Unknown WEB_PROFILE {profile!r} (choose from {', '.join(PROFILES)})")
+if profile == 'gevent':
+    try:
+        from gevent import monkey
+    except ImportError:
+        raise RuntimeError("Install the 'gevent' package to use WEB_PROFILE=gevent")
+    # before the app (and, with preload, its locks and sockets) is imported
+    monkey.patch_all()
+
+settings = PROFILES[profile]
+cores = multiprocessing.cpu_count()
+
+# memory:// search follows EVENT_BROKER_URL, so it needs no entry of its own
+SHARED_STATE = ('UPVOTE_STORE_URL', 'FEED_CACHE_URL', 'PROFILE_CACHE_URL', 'RATE_LIMIT_URL', 'EVENT_BROKER_URL',
+                'TOKEN_CACHE_URL', 'SESSION_URL')
+per_process_state = [name for name in SHARED_STATE
+                     if not getattr(Config, name) or getattr(Config, name).startswith(('memory://', 'fake://'))]
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+worker_class = settings['worker_class']
+workers = int(os.environ.get('WEB_WORKERS') or (1 if per_process_state else settings['workers'](cores)))
+# one process has to take every open stream itself
+threads = int(os.environ.get('WEB_THREADS') or settings['threads'] * (4 if workers == 1 and profile == 'threaded' else 1))
+worker_connections = int(os.environ.get('WEB_CONNECTIONS', '1000'))
+if Config.SSE_MAX_STREAMS is None:
+    # inherited by the forked workers
+    Config.SSE_MAX_STREAMS = {'threaded': threads // 2, 'sync': 0, 'gevent': worker_connections // 2}[profile]
+preload_app = os.environ.get('WEB_PRELOAD', '0') == '1'
+timeout = int(os.environ.get('WEB_TIMEOUT', '30'))
+graceful_timeout = 30
+keepalive = 5
+
+
+def on_starting(server):
+    if workers > 1 and per_process_state:
+        server.log.warning("%d workers with per-process %s: each worker keeps its own copy, so writes "
+                           "one answers can be lost or unseen by the others; point them at Redis or run "
+                           "one worker", workers, ', '.join(per_process_state))
+    elif per_process_state and not os.environ.get('WEB_WORKERS'):
+        server.log.info("One worker: %s keep state per process", ', '.join(per_process_state))
+
+
+def when_ready(server):
+    if preload_app:
+        # build the asset manifest once for every worker to inherit
+        import app
+        if app.Config.ASSET_PIPELINE:
+            app.asset_pipeline.manifest()
+
+
+def post_worker_init(worker):
+    # start building the search index as the worker boots, not on its first
+    # request
+    import app
+    app.search_backend.start()
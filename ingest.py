@@ -0,0 +1,145 @@
+# Bulk status updates from kiosks and sensors (POST /api/status_updates):
+# parsing, validation and last-writer-wins selection of a batch. The route in
+# app.py checks the resources exist, drops readings older than what was
+# already ingested and writes the rest in one insert.
+import json
+from datetime import datetime, timezone
+
+# Accepted values (any case), stored the way the create/update forms store them
+CROWD_LEVELS = {'low': 'Low', 'medium': 'Medium', 'high': 'High', 'very high': 'Very High'}
+IMPORTANCE_LEVELS = {'low': 'Low', 'medium': 'Medium', 'high': 'High', 'critical': 'Critical'}
+MAX_MESSAGE_LENGTH = 500
+MAX_QUEUE_LABEL_LENGTH = 40
+
+NDJSON_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl', 'application/jsonlines')
+
+
+class IngestError(ValueError):
+    """The request body as a whole can't be read."""
+
+
+def parse_batch(body, mimetype):
+    """Items of a JSON (an array, {"updates": [...]} or one object) or NDJSON
+    body; an unreadable NDJSON line becomes an IngestError in its place."""
+    try:
+        text = body.decode('utf-8')
+    except UnicodeDecodeError:
+        raise IngestError('Body is not UTF-8')
+    if mimetype in NDJSON_TYPES:
+        items = []
+        for number, line in enumerate(text.splitlines(), 1):
+            if not line.strip():
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError:
+                items.append(IngestError(f'Line {number} is not valid JSON'))
+        return items
+    try:
+        data = json.loads(text)
+    except ValueError:
+        raise IngestError('Body is not valid JSON')
+    if isinstance(data, dict):
+        data = data['updates'] if isinstance(data.get('updates'), list) else [data]
+    if not isinstance(data, list):
+        raise IngestError('Expected an array of status updates')
+    return data
+
+
+def parse_timestamp(value, now):
+    """Aware datetime from ISO 8601 or Unix seconds; `now` when missing."""
+    if value is None or value == '':
+        return now
+    if isinstance(value, bool):
+        raise ValueError('observed_at must be ISO 8601 or Unix seconds')
+    if isinstance(value, (int, float)):
+        try:
+            return datetime.fromtimestamp(value, timezone.utc)
+        except (OverflowError, OSError, ValueError):
+            raise ValueError('observed_at is out of range')
+    try:
+        stamp = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError('observed_at must be ISO 8601 or Unix seconds')
+    return stamp if stamp.tzinfo else stamp.replace(tzinfo=timezone.utc)
+
+
+def _choice(item, field, levels):
+    value = item.get(field)
+    if value is None or value == '':
+        return ''
+    level = levels.get(str(value).strip().lower())
+    if level is None:
+        raise ValueError(f"{field} must be one of: {', '.join(levels.values())}")
+    return level
+
+
+def validate(item, now, max_skew):
+    """A reading ready for tweet_replies (plus `observed_at`); raises ValueError."""
+    if not isinstance(item, dict):
+        raise ValueError('Each status update must be an object')
+    resource_id = item.get('resource_id')
+    if not resource_id or not isinstance(resource_id, str):
+        raise ValueError('resource_id is required')
+    observed_at = parse_timestamp(item.get('observed_at'), now)
+    if (observed_at - now).total_seconds() > max_skew:
+        raise ValueError('observed_at is in the future')
+
+    queue_length = item.get('queue_length')
+    if queue_length is None or queue_length == '':
+        queue_length = ''
+    elif isinstance(queue_length, int) and not isinstance(queue_length, bool):
+        if queue_length < 0:
+            raise ValueError('queue_length must not be negative')
+        queue_length = str(queue_length)
+    elif isinstance(queue_length, str) and len(queue_length) <= MAX_QUEUE_LABEL_LENGTH:
+        queue_length = queue_length.strip()
+    else:
+        raise ValueError(f'queue_length must be a count or a label of at most {MAX_QUEUE_LABEL_LENGTH} characters')
+
+    message = item.get('status_message') or ''
+    if not isinstance(message, str) or len(message) > MAX_MESSAGE_LENGTH:
+        raise ValueError(f'status_message must be text of at most {MAX_MESSAGE_LENGTH} characters')
+
+    reading = {
+        'resource_id': resource_id,
+        'status_message': message.strip(),
+        'crowd_level': _choice(item, 'crowd_level', CROWD_LEVELS),
+        'chips_available': _choice(item, 'importance', IMPORTANCE_LEVELS),
+        'queue_length': queue_length,
+        'observed_at': observed_at,
+    }
+    if not any(reading[k] for k in ('status_message', 'crowd_level', 'chips_available', 'queue_length')):
+        raise ValueError('Nothing to update: send crowd_level, queue_length, importance or status_message')
+    return reading
+
+
+def latest_readings(items, now, max_skew):
+    """Validate a batch and keep the newest reading per resource.
+
+    Returns (results, latest): one result dict per item, in order (invalid
+    and superseded items already settled), and {resource_id: (index,
+    reading)} for the survivors. Of equal timestamps the later item wins.
+    """
+    results = []
+    latest = {}
+    for index, item in enumerate(items):
+        result = {'index': index}
+        results.append(result)
+        if isinstance(item, Exception):
+            result.update(status='invalid', error=str(item))
+            continue
+        try:
+            reading = validate(item, now, max_skew)
+        except ValueError as e:
+            result.update(status='invalid', error=str(e))
+            continue
+        result['resource_id'] = reading['resource_id']
+        previous = latest.get(reading['resource_id'])
+        if previous and previous[1]['observed_at'] > reading['observed_at']:
+            result['status'] = 'superseded'
+            continue
+        if previous:
+            results[previous[0]]['status'] = 'superseded'
+        latest[reading['resource_id']] = (index, reading)
+    return results, latest
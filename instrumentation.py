@@ -0,0 +1,369 @@
+# Request-scoped timing of backend calls and template renders, exported as
+# Server-Timing headers, Prometheus text metrics and a debug request log.
+import threading
+import time
+from collections import Counter, deque, namedtuple
+from contextlib import contextmanager
+from uuid import uuid4
+
+from flask import current_app, has_request_context, request
+
+TRACE_KEY = 'morphx.trace'
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Seconds between warnings about the same N+1 (route and call shape)
+N_PLUS_ONE_LOG_INTERVAL = 60.0
+
+# Client methods that don't go over the network
+LOCAL_METHODS = {'get_public_url', 'set_session', 'get_session'}
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * len(BUCKETS), 0.0, 0]
+            for i, bound in enumerate(BUCKETS):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for label_values, (buckets, total, count) in sorted(self._series.items()):
+                labels = _labels(self.labels, label_values)
+                for bound, n in zip(BUCKETS, buckets):
+                    lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {n}')
+                lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {count}')
+                lines.append(f'{self.name}_sum{{{labels}}} {total:.6f}')
+                lines.append(f'{self.name}_count{{{labels}}} {count}')
+        return lines
+
+
+class CounterMetric:
+    def __init__(self, name, help_text, labels):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values = Counter()
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] += amount
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{{{_labels(self.labels, label_values)}}} {value}')
+        return lines
+
+
+class GaugeMetric:
+    def __init__(self, name, help_text, labels):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def set(self, value, *label_values):
+        with self._lock:
+            self._values[label_values] = value
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} gauge']
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{{{_labels(self.labels, label_values)}}} {value}')
+        return lines
+
+
+def _labels(names, values):
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for v in values)
+    return ','.join(f'{n}="{v}"' for n, v in zip(names, escaped))
+
+
+REQUEST_SECONDS = Histogram('morphx_http_request_duration_seconds', 'Time to produce a response.',
+                            ('route', 'method', 'status'))
+BACKEND_SECONDS = Histogram('morphx_backend_call_duration_seconds', 'Supabase table, auth and storage calls.',
+                            ('kind', 'target', 'action'))
+BACKEND_CALLS = Histogram('morphx_backend_calls_per_request', 'Backend calls made by one request.', ('route',))
+TEMPLATE_SECONDS = Histogram('morphx_template_render_seconds', 'Jinja render time.', ('template',))
+BACKEND_ERRORS = CounterMetric('morphx_backend_call_errors_total', 'Backend calls that raised.', ('kind', 'target'))
+N_PLUS_ONE = CounterMetric('morphx_n_plus_one_total', 'Requests that repeated one backend call shape.',
+                           ('route', 'shape'))
+JOB_SECONDS = Histogram('morphx_job_duration_seconds', 'Background job run time.', ('kind',))
+JOB_RESULTS = CounterMetric('morphx_jobs_total', 'Background job runs by outcome (done, retry, dead).',
+                            ('kind', 'outcome'))
+JOB_QUEUE_DEPTH = GaugeMetric('morphx_job_queue_depth', 'Jobs in the outbox by state.', ('state',))
+RATE_LIMITED = CounterMetric('morphx_rate_limited_total', 'Requests refused with 429 by endpoint.', ('endpoint',))
+COALESCED = CounterMetric('morphx_coalesced_requests_total',
+                          'Requests answered with the result of an identical one.', ('operation',))
+EVENTS_DROPPED = CounterMetric('morphx_events_dropped_total',
+                               'Post events lost because a subscriber\'s queue was full.', ('subscriber',))
+SEARCH_REBUILDS = CounterMetric('morphx_search_index_rebuilds_total',
+                                'Full rebuilds of the in-memory search index by reason.', ('reason',))
+METRICS = (REQUEST_SECONDS, BACKEND_SECONDS, BACKEND_CALLS, TEMPLATE_SECONDS, BACKEND_ERRORS, N_PLUS_ONE,
+           JOB_SECONDS, JOB_RESULTS, JOB_QUEUE_DEPTH, RATE_LIMITED, COALESCED, EVENTS_DROPPED, SEARCH_REBUILDS)
+
+
+# offset: seconds from the start of the request to the start of the call
+Call = namedtuple('Call', 'kind target shape seconds error offset')
+
+
+class RequestTrace:
+    def __init__(self, method, path):
+        self.id = uuid4().hex[:12]
+        self.method = method
+        self.path = path
+        self.route = request.url_rule.rule if request.url_rule else '<unmatched>'
+        self.status = None
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.duration = None
+        self.calls = []      # Call
+        self.templates = []  # (name, seconds)
+        self.repeated = {}   # shape -> count, for shapes over the N+1 threshold
+        self._render_starts = []
+
+    def totals(self):
+        """{kind: (calls, seconds)} plus 'template'."""
+        totals = {}
+        for call in list(self.calls):
+            n, total = totals.get(call.kind, (0, 0.0))
+            totals[call.kind] = (n + 1, total + call.seconds)
+        if self.templates:
+            totals['template'] = (len(self.templates), sum(s for _, s in self.templates))
+        return totals
+
+
+def current_trace():
+    if has_request_context():
+        return request.environ.get(TRACE_KEY)
+    return None
+
+
+def start_trace():
+    trace = RequestTrace(request.method, request.full_path.rstrip('?'))
+    request.environ[TRACE_KEY] = trace
+    return trace
+
+
+def finish_trace(trace, status, n_plus_one_threshold):
+    """Close a request's trace and record its metrics; returns the trace."""
+    trace.duration = time.perf_counter() - trace.start
+    trace.status = status
+    REQUEST_SECONDS.observe(trace.duration, trace.route, trace.method, str(status))
+    BACKEND_CALLS.observe(len(trace.calls), trace.route)
+    shapes = Counter(f'{c.kind} {c.target}: {c.shape}' for c in list(trace.calls))
+    for shape, count in shapes.items():
+        if count > n_plus_one_threshold:
+            trace.repeated[shape] = count
+            N_PLUS_ONE.inc(trace.route, shape)
+            warn_n_plus_one(trace.method, trace.route, shape, count)
+    return trace
+
+
+_n_plus_one_warned = {}
+_n_plus_one_lock = threading.Lock()
+
+
+def warn_n_plus_one(method, route, shape, count):
+    """Log a repeated call shape, at most once per N_PLUS_ONE_LOG_INTERVAL
+    for each route and shape (morphx_n_plus_one_total counts every one)."""
+    key = (method, route, shape)
+    now = time.monotonic()
+    with _n_plus_one_lock:
+        last, skipped = _n_plus_one_warned.get(key, (None, 0))
+        if last is not None and now - last < N_PLUS_ONE_LOG_INTERVAL:
+            _n_plus_one_warned[key] = (last, skipped + 1)
+            return
+        _n_plus_one_warned[key] = (now, 0)
+    current_app.logger.warning("Possible N+1 in %s %s: %d x %s%s", method, route, count, shape,
+                               f" (and {skipped} more since the last warning)" if skipped else '')
+
+
+def record_call(kind, target, shape, seconds, error=False):
+    BACKEND_SECONDS.observe(seconds, kind, target, shape.split(' ', 1)[0])
+    if error:
+        BACKEND_ERRORS.inc(kind, target)
+    trace = current_trace()
+    if trace is not None:
+        offset = time.perf_counter() - seconds - trace.start
+        trace.calls.append(Call(kind, target, shape, seconds, error, offset))
+
+
+@contextmanager
+def timed(kind, target, shape):
+    """Time one backend call made outside a client proxy (e.g. a raw HTTP request)."""
+    start = time.perf_counter()
+    error = False
+    try:
+        yield
+    except Exception:
+        error = True
+        raise
+    finally:
+        record_call(kind, target, shape, time.perf_counter() - start, error)
+
+
+def server_timing(trace):
+    """Server-Timing header value; backend durations are summed, so calls
+    that ran concurrently can add up to more than the request took."""
+    parts = []
+    for kind, (n, seconds) in sorted(trace.totals().items()):
+        parts.append(f'{kind};dur={seconds * 1000:.1f};desc="{n} call{"s" if n != 1 else ""}"')
+    parts.append(f'total;dur={(time.perf_counter() - trace.start) * 1000:.1f}')
+    return ', '.join(parts)
+
+
+def exposition():
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.expose())
+    return '\n'.join(lines) + '\n'
+
+
+# -- template signals ---------------------------------------------------------
+
+def template_started(sender, template, context, **extra):
+    trace = current_trace()
+    if trace is not None:
+        trace._render_starts.append(time.perf_counter())
+
+
+def template_finished(sender, template, context, **extra):
+    trace = current_trace()
+    if trace is not None and trace._render_starts:
+        seconds = time.perf_counter() - trace._render_starts.pop()
+        trace.templates.append((template.name, seconds))
+        TEMPLATE_SECONDS.observe(seconds, template.name or '<string>')
+
+
+# -- client proxies -----------------------------------------------------------
+
+def _describe(method, args):
+    if method in ('or_', 'not_'):
+        return method.rstrip('_')
+    if method in ('limit', 'range', 'single', 'maybe_single'):
+        return method
+    if method == 'select':
+        return f"select({','.join(args) or '*'})"
+    if args and isinstance(args[0], str) and method not in ('insert', 'upsert', 'update'):
+        return f'{method.rstrip("_")}({args[0]})'
+    return method
+
+
+class _QueryProxy:
+    """Wraps a query builder chain; execute() is timed and recorded with the
+    chain's shape (methods and columns, no values)."""
+
+    def __init__(self, builder, table, shape=()):
+        self._builder = builder
+        self._table = table
+        self._shape = shape
+
+    def __getattr__(self, name):
+        attr = getattr(self._builder, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            if name != 'execute':
+                return _QueryProxy(attr(*args, **kwargs), self._table, self._shape + (_describe(name, args),))
+            start = time.perf_counter()
+            error = False
+            try:
+                return attr(*args, **kwargs)
+            except Exception:
+                error = True
+                raise
+            finally:
+                record_call('table', self._table, ' '.join(self._shape) or 'execute',
+                            time.perf_counter() - start, error)
+        return call
+
+
+class _CallProxy:
+    """Times every method call on an auth client or storage bucket."""
+
+    def __init__(self, target, kind, name):
+        self._target = target
+        self._kind = kind
+        self._name = name
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr) or name in LOCAL_METHODS or name.startswith('_'):
+            return attr
+
+        def call(*args, **kwargs):
+            with timed(self._kind, self._name, name):
+                return attr(*args, **kwargs)
+        return call
+
+
+class _StorageProxy:
+    def __init__(self, storage):
+        self._storage = storage
+
+    def from_(self, bucket):
+        return _CallProxy(self._storage.from_(bucket), 'storage', bucket)
+
+    def __getattr__(self, name):
+        return getattr(self._storage, name)
+
+
+class InstrumentedClient:
+    """A Supabase (or LocalClient) client whose table, auth and storage calls are recorded."""
+
+    def __init__(self, client):
+        self._client = client
+        self.auth = _CallProxy(client.auth, 'auth', 'auth')
+
+    @property
+    def storage(self):
+        return _StorageProxy(self._client.storage)
+
+    def table(self, name):
+        return _QueryProxy(self._client.table(name), name)
+
+    from_ = table
+
+    def rpc(self, fn, *args, **kwargs):
+        return _QueryProxy(self._client.rpc(fn, *args, **kwargs), f'rpc:{fn}')
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+class RequestLog:
+    """The last `size` finished traces, for the debug breakdown page."""
+
+    def __init__(self, size=200):
+        self._traces = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, trace):
+        with self._lock:
+            self._traces.appendleft(trace)
+
+    def recent(self):
+        with self._lock:
+            return list(self._traces)
+
+    def get(self, trace_id):
+        with self._lock:
+            return next((t for t in self._traces if t.id == trace_id), None)
@@ -0,0 +1,261 @@
+import atexit
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from instrumentation import JOB_RESULTS, JOB_SECONDS
+
+SCHEMA = """
+create table if not exists jobs (
+    id integer primary key autoincrement,
+    kind text not null,
+    payload text not null,
+    idempotency_key text unique,
+    state text not null default 'pending',
+    attempts integer not null default 0,
+    run_at real not null,
+    locked_until real,
+    last_error text,
+    created_at real not null,
+    finished_at real);
+create index if not exists jobs_due_idx on jobs (state, run_at);
+"""
+
+STATES = ('pending', 'running', 'done', 'dead')
+
+
+class JobQueue:
+    """Deferred work run by a bounded thread pool from a durable SQLite outbox.
+
+    enqueue() writes the job to the outbox before returning, so it survives
+    a crash or restart; an idempotency key makes enqueueing the same work
+    twice a no-op. Every process sharing the outbox file runs due jobs: a
+    claim leases a job for `lease` seconds, and a job whose process died is
+    claimed again once its lease runs out. Handlers must therefore be safe
+    to run more than once. A failed job is retried with exponential backoff
+    (plus jitter) and moved to the dead-letter state after `max_attempts`,
+    when the kind's on_dead() callback runs.
+    """
+
+    def __init__(self, path, workers=4, max_attempts=8, base_delay=2.0, max_delay=600.0,
+                 lease=300.0, retention=86400.0, poll_interval=1.0):
+        self.path = path
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.lease = lease
+        self.retention = retention
+        self.poll_interval = poll_interval
+        self._handlers = {}
+        self._dead_handlers = {}
+        self._conn = None
+        self._pid = None
+        self._lock = threading.RLock()
+        self._wake = threading.Event()
+        self._pool = None
+        self._slots = None
+        self._last_purge = 0.0
+
+    def handler(self, kind):
+        """Decorator registering the function that runs jobs of `kind` (called with the payload)."""
+        def register(fn):
+            self._handlers[kind] = fn
+            return fn
+        return register
+
+    def on_dead(self, kind):
+        """Decorator registering the function called with (payload, error) when
+        a job of `kind` is dead-lettered."""
+        def register(fn):
+            self._dead_handlers[kind] = fn
+            return fn
+        return register
+
+    def horizon(self):
+        """Seconds by which a job queued now is done or dead (an upper bound:
+        every attempt holds its lease, then waits its longest backoff)."""
+        return sum(self.lease + min(self.max_delay, self.base_delay * 2 ** (n - 1))
+                   for n in range(1, self.max_attempts + 1))
+
+    # -- outbox ------------------------------------------------------------
+
+    def _db(self):
+        if self._conn is None or self._pid != os.getpid():
+            with self._lock:
+                if self._conn is None or self._pid != os.getpid():
+                    if self.path != ':memory:':
+                        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                    conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+                    conn.row_factory = sqlite3.Row
+                    if self.path != ':memory:':
+                        conn.execute('pragma journal_mode=wal')
+                    conn.executescript(SCHEMA)
+                    self._conn = conn
+                    self._pid = os.getpid()
+                    self._pool = None
+        return self._conn
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._db().execute(sql, params).fetchall()
+
+    def enqueue(self, kind, payload, key=None, delay=0.0):
+        """Queue `kind` with a JSON-serializable payload; returns the job id
+        (the existing job's when `key` was already used). A dead job with the
+        same key is queued again with the new payload, as a fresh job."""
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            cursor = db.execute(
+                'insert or ignore into jobs (kind, payload, idempotency_key, run_at, created_at) values (?, ?, ?, ?, ?)',
+                (kind, json.dumps(payload), key, now + delay, now))
+            job_id = cursor.lastrowid if cursor.rowcount else None
+            if job_id is None:
+                job_id = db.execute('select id from jobs where idempotency_key = ?', (key,)).fetchone()['id']
+                db.execute("update jobs set kind = ?, payload = ?, state = 'pending', attempts = 0, run_at = ?,"
+                           " finished_at = null where id = ? and state = 'dead'",
+                           (kind, json.dumps(payload), now + delay, job_id))
+        self.start()
+        self._wake.set()
+        return job_id
+
+    def _claim(self, limit):
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            db.execute('begin immediate')
+            try:
+                rows = db.execute(
+                    "select id, kind, payload, attempts from jobs"
+                    " where (state = 'pending' and run_at <= ?) or (state = 'running' and locked_until < ?)"
+                    " order by run_at limit ?", (now, now, limit)).fetchall()
+                for row in rows:
+                    db.execute("update jobs set state = 'running', attempts = attempts + 1, locked_until = ?"
+                               " where id = ?", (now + self.lease, row['id']))
+                db.execute('commit')
+            except Exception:
+                db.execute('rollback')
+                raise
+        return [(row['id'], row['kind'], json.loads(row['payload']), row['attempts'] + 1) for row in rows]
+
+    def backoff(self, attempts):
+        """Seconds before retry number `attempts`: doubling from base_delay, capped, with jitter."""
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+    def _run(self, job_id, kind, payload, attempts):
+        start = time.perf_counter()
+        try:
+            handler = self._handlers.get(kind)
+            if handler is None:
+                raise LookupError(f'No handler for job kind {kind!r}')
+            handler(payload)
+        except Exception as e:
+            error = ''.join(traceback.format_exception_only(type(e), e)).strip()
+            if attempts >= self.max_attempts:
+                print(f"Job {job_id} ({kind}) failed for good after {attempts} attempts: {error}")
+                self._execute("update jobs set state = 'dead', last_error = ?, finished_at = ?, locked_until = null"
+                              " where id = ?", (error, time.time(), job_id))
+                JOB_RESULTS.inc(kind, 'dead')
+                on_dead = self._dead_handlers.get(kind)
+                if on_dead is not None:
+                    try:
+                        on_dead(payload, error)
+                    except Exception as e:
+                        print(f"Dead job {job_id} ({kind}) callback failed: {e}")
+            else:
+                delay = self.backoff(attempts)
+                print(f"Job {job_id} ({kind}) failed (attempt {attempts}), retrying in {delay:.0f}s: {error}")
+                self._execute("update jobs set state = 'pending', last_error = ?, run_at = ?, locked_until = null"
+                              " where id = ?", (error, time.time() + delay, job_id))
+                JOB_RESULTS.inc(kind, 'retry')
+        else:
+            self._execute("update jobs set state = 'done', finished_at = ?, locked_until = null where id = ?",
+                          (time.time(), job_id))
+            JOB_RESULTS.inc(kind, 'done')
+        finally:
+            JOB_SECONDS.observe(time.perf_counter() - start, kind)
+            self._slots.release()
+            self._wake.set()
+
+    # -- dispatcher ----------------------------------------------------------
+
+    def start(self):
+        """Start this process's dispatcher (again after a fork); cheap when running."""
+        self._db()
+        if self._pool is not None:
+            return
+        with self._lock:
+            if self._pool is not None:
+                return
+            self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix='job-worker')
+            self._slots = threading.BoundedSemaphore(self.workers)
+            threading.Thread(target=self._dispatch, args=(self._pool,), daemon=True, name='job-dispatcher').start()
+        atexit.register(self._pool.shutdown, wait=True)
+
+    def _dispatch(self, pool):
+        while pool is self._pool:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            try:
+                free = 0
+                while self._slots.acquire(blocking=False):
+                    free += 1
+                jobs = self._claim(free) if free else []
+                for _ in range(free - len(jobs)):
+                    self._slots.release()
+                for job in jobs:
+                    pool.submit(self._run, *job)
+                if time.time() - self._last_purge > 60:
+                    self.purge()
+            except Exception as e:
+                print(f"Job dispatch failed: {e}")
+
+    def purge(self):
+        """Forget finished jobs (and their idempotency keys) older than `retention`."""
+        self._last_purge = time.time()
+        self._execute("delete from jobs where state = 'done' and finished_at < ?", (time.time() - self.retention,))
+
+    def drain(self, timeout=10.0):
+        """Wait until no job is due or running (for tests, benchmarks and the CLI)."""
+        deadline = time.time() + timeout
+        self.start()
+        while time.time() < deadline:
+            self._wake.set()
+            row = self._execute("select count(*) as n from jobs where (state = 'pending' and run_at <= ?)"
+                                " or state = 'running'", (time.time(),))[0]
+            if not row['n']:
+                return True
+            time.sleep(0.01)
+        return False
+
+    # -- inspection ----------------------------------------------------------
+
+    def depth(self):
+        """{state: number of jobs}, every state included."""
+        counts = dict.fromkeys(STATES, 0)
+        for row in self._execute('select state, count(*) as n from jobs group by state'):
+            counts[row['state']] = row['n']
+        return counts
+
+    def dead(self, limit=100):
+        rows = self._execute("select * from jobs where state = 'dead' order by finished_at desc limit ?", (limit,))
+        return [dict(row, payload=json.loads(row['payload'])) for row in rows]
+
+    def retry(self, job_id=None):
+        """Move one dead job (or all of them) back to pending; returns how many."""
+        sql = "update jobs set state = 'pending', attempts = 0, run_at = ?, finished_at = null where state = 'dead'"
+        params = (time.time(),)
+        if job_id is not None:
+            sql += ' and id = ?'
+            params += (job_id,)
+        with self._lock:
+            count = self._db().execute(sql, params).rowcount
+        self._wake.set()
+        return count
@@ -0,0 +1,613 @@
+# SQLite stand-in for the Supabase project: implements the part of the
+# supabase-py client the app uses (table queries, auth, storage) so the app,
+# its benchmarks and local development run without a live project.
+import json
+import os
+import random
+import re
+import secrets
+import sqlite3
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlsplit
+from uuid import uuid4
+
+import jwt
+from postgrest.exceptions import APIError
+from supabase_auth.errors import AuthApiError
+from werkzeug.security import check_password_hash, generate_password_hash
+
+# Mirrors the Supabase tables; json columns hold jsonb values
+SCHEMA = """
+create table if not exists tweets (
+    id text primary key, name text, content text, image_url text,
+    image_variants json not null default '{}', author_id text, created_at text not null);
+create index if not exists tweets_created_idx on tweets (created_at, id);
+create index if not exists tweets_author_idx on tweets (author_id, created_at, id);
+
+create table if not exists likes (
+    id text primary key, resource_id text not null, user_id text not null, like_type text,
+    created_at text not null);
+create index if not exists likes_resource_idx on likes (resource_id, user_id);
+
+create table if not exists replies (
+    id text primary key, resource_id text not null, user_id text, content text, created_at text not null);
+create index if not exists replies_resource_idx on replies (resource_id);
+
+create table if not exists tweet_replies (
+    id text primary key, resource_id text not null, status_message text, crowd_level text,
+    chips_available text, queue_length text, user_id text, created_at text not null);
+create index if not exists tweet_replies_resource_idx on tweet_replies (resource_id, created_at, id);
+
+create table if not exists tweet_replies_archive (
+    id text primary key, resource_id text not null, status_message text, crowd_level text,
+    chips_available text, queue_length text, user_id text, created_at text not null, archived_at text not null);
+create index if not exists tweet_replies_archive_resource_idx on tweet_replies_archive (resource_id, created_at);
+
+create table if not exists status_rollups (
+    resource_id text not null, bucket_start text not null, bucket_seconds integer not null,
+    updates integer not null, crowd_min integer, crowd_max integer, crowd_last text, queue_min integer,
+    queue_max integer, queue_last text, importance_last text, last_at text not null,
+    primary key (resource_id, bucket_start));
+
+create table if not exists user_profiles (
+    id text primary key, user_id text unique not null, email text, role text, full_name text,
+    student_id text, faculty_id text, department text, created_at text not null);
+create index if not exists user_profiles_email_idx on user_profiles (email);
+
+create table if not exists post_summaries (
+    id text primary key, name text, content text, image_url text,
+    image_variants json not null default '{}', author_id text, author_name text,
+    created_at text not null, upvotes_count integer not null default 0,
+    comments_count integer not null default 0, latest_status json, importance text,
+    importance_rank integer not null default 0, updated_at text not null);
+create index if not exists post_summaries_feed_idx
+    on post_summaries (importance_rank, upvotes_count, created_at, id);
+
+-- The per-post views of sql/feed_views.sql (no DISTINCT ON in SQLite); the
+-- casts give the computed columns integer affinity, so filters compare numbers
+create view if not exists post_counts as
+select t.id as resource_id,
+       cast((select count(*) from likes l where l.resource_id = t.id) as integer) as upvotes_count,
+       cast((select count(*) from tweet_replies r where r.resource_id = t.id)
+            + (select coalesce(sum(s.updates), 0) from status_rollups s where s.resource_id = t.id) as integer)
+           as comments_count
+from tweets t;
+create view if not exists latest_statuses as
+select r.* from tweet_replies r
+where r.id = (select l.id from tweet_replies l where l.resource_id = r.resource_id
+              order by l.created_at desc, l.id desc limit 1);
+-- feed_ranks and its triggers, as in sql/feed_views.sql
+create table if not exists feed_ranks (
+    id text primary key, created_at text not null, upvotes_count integer not null default 0,
+    importance_rank integer not null default 0);
+create index if not exists feed_ranks_order_idx on feed_ranks (importance_rank, upvotes_count, created_at, id);
+create trigger if not exists feed_ranks_tweet_insert after insert on tweets begin
+    insert or ignore into feed_ranks (id, created_at) values (new.id, new.created_at);
+end;
+create trigger if not exists feed_ranks_tweet_update after update of created_at on tweets begin
+    update feed_ranks set created_at = new.created_at where id = new.id;
+end;
+create trigger if not exists feed_ranks_tweet_delete after delete on tweets begin
+    delete from feed_ranks where id = old.id;
+end;
+create trigger if not exists feed_ranks_like_insert after insert on likes begin
+    update feed_ranks set upvotes_count = upvotes_count + 1 where id = new.resource_id;
+end;
+create trigger if not exists feed_ranks_like_delete after delete on likes begin
+    update feed_ranks set upvotes_count = upvotes_count - 1 where id = old.resource_id;
+end;
+create trigger if not exists feed_ranks_status_insert after insert on tweet_replies begin
+    update feed_ranks set importance_rank = coalesce(
+        (select case lower(r.chips_available)
+                    when 'critical' then 4 when 'high' then 3 when 'medium' then 2 when 'low' then 1 else 0 end
+         from tweet_replies r where r.resource_id = new.resource_id
+         order by r.created_at desc, r.id desc limit 1), 0)
+    where id = new.resource_id;
+end;
+create trigger if not exists feed_ranks_status_update after update on tweet_replies begin
+    update feed_ranks set importance_rank = coalesce(
+        (select case lower(r.chips_available)
+                    when 'critical' then 4 when 'high' then 3 when 'medium' then 2 when 'low' then 1 else 0 end
+         from tweet_replies r where r.resource_id = new.resource_id
+         order by r.created_at desc, r.id desc limit 1), 0)
+    where id = new.resource_id;
+end;
+create trigger if not exists feed_ranks_status_delete after delete on tweet_replies begin
+    update feed_ranks set importance_rank = coalesce(
+        (select case lower(r.chips_available)
+                    when 'critical' then 4 when 'high' then 3 when 'medium' then 2 when 'low' then 1 else 0 end
+         from tweet_replies r where r.resource_id = old.resource_id
+         order by r.created_at desc, r.id desc limit 1), 0)
+    where id = old.resource_id;
+end;
+create view if not exists feed_ranking as
+select r.id, r.created_at, r.upvotes_count, r.importance_rank from feed_ranks r join tweets t on t.id = r.id;
+
+create table if not exists auth_users (
+    id text primary key, email text unique not null, password_hash text not null, created_at text not null);
+create table if not exists auth_refresh_tokens (token text primary key, user_id text not null);
+"""
+
+# auth_* tables are internal to the stand-in, like Supabase's auth schema
+PUBLIC_TABLES = ('tweets', 'likes', 'replies', 'tweet_replies', 'tweet_replies_archive', 'status_rollups',
+                 'user_profiles', 'post_summaries', 'post_counts', 'latest_statuses',
+                 'feed_ranking')
+LOCAL_JWT_SECRET = 'local-backend-jwt-secret-not-for-production'
+ACCESS_TOKEN_TTL = 3600
+
+OPERATORS = {'eq': '=', 'neq': '<>', 'gt': '>', 'gte': '>=', 'lt': '<', 'lte': '<='}
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _error(message, code='PGRST100'):
+    return APIError({'message': message, 'code': code, 'hint': None, 'details': None})
+
+
+class LocalDatabase:
+    """One SQLite database plus a storage directory, shared by every LocalClient.
+
+    `latency` (+ up to `jitter`) seconds are slept before each table, auth
+    or storage call to stand in for the network round trip; `calls` counts
+    them per (kind, name).
+    """
+
+    def __init__(self, path=':memory:', latency=0.0, jitter=0.0, storage_dir=None, jwt_secret=None):
+        self.path = path
+        self.latency = latency
+        self.jitter = jitter
+        self.storage_dir = storage_dir or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'local-storage')
+        self.jwt_secret = jwt_secret or LOCAL_JWT_SECRET
+        self.calls = Counter()
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        if path != ':memory:':
+            self._conn.execute('pragma journal_mode=wal')
+        self._conn.executescript(SCHEMA)
+        self.columns = {}
+        self.json_columns = {}
+        self.not_null = {}
+        for table in PUBLIC_TABLES + ('auth_users', 'auth_refresh_tokens'):
+            info = self._conn.execute(f'pragma table_info({table})').fetchall()
+            self.columns[table] = [c['name'] for c in info]
+            self.json_columns[table] = {c['name'] for c in info if c['type'].lower() == 'json'}
+            self.not_null[table] = {c['name'] for c in info if c['notnull'] or c['pk']}
+
+    def round_trip(self, kind, name):
+        self.calls[(kind, name)] += 1
+        delay = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay:
+            time.sleep(delay)
+
+    @property
+    def call_count(self):
+        return sum(self.calls.values())
+
+    def execute(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def transaction(self, statements):
+        """Run [(sql, params)] atomically; returns the rows of each statement."""
+        with self._lock:
+            self._conn.execute('begin')
+            try:
+                results = [self._conn.execute(sql, params).fetchall() for sql, params in statements]
+            except Exception:
+                self._conn.execute('rollback')
+                raise
+            self._conn.execute('commit')
+            return results
+
+    def decode(self, table, row):
+        data = dict(row)
+        for column in self.json_columns[table] & data.keys():
+            if data[column] is not None:
+                data[column] = json.loads(data[column])
+        return data
+
+    def encode(self, table, row):
+        return {k: json.dumps(v) if k in self.json_columns[table] and v is not None else v for k, v in row.items()}
+
+    def with_defaults(self, table, row):
+        row = dict(row)
+        for column, default in (('id', lambda: str(uuid4())), ('created_at', _now), ('updated_at', _now)):
+            if column in self.columns[table] and row.get(column) is None:
+                row[column] = default()
+        return row
+
+    def bulk_insert(self, table, rows):
+        """Load rows directly (no latency, not counted); for seeding."""
+        rows = [self.encode(table, self.with_defaults(table, r)) for r in rows]
+        if not rows:
+            return
+        columns = list(rows[0])
+        sql = f'insert into {table} ({", ".join(columns)}) values ({", ".join("?" for _ in columns)})'
+        with self._lock:
+            self._conn.execute('begin')
+            self._conn.executemany(sql, [[r.get(c) for c in columns] for r in rows])
+            self._conn.execute('commit')
+
+    def create_user(self, email, password, password_method='scrypt'):
+        """Add an auth user directly; returns its id."""
+        user_id = str(uuid4())
+        self.execute('insert into auth_users (id, email, password_hash, created_at) values (?, ?, ?, ?)',
+                     (user_id, email.lower(), generate_password_hash(password, method=password_method), _now()))
+        return user_id
+
+
+def _split_top_level(expr):
+    parts, depth, quoted, start = [], 0, False, 0
+    for i, ch in enumerate(expr):
+        if ch == '"':
+            quoted = not quoted
+        elif not quoted and ch == '(':
+            depth += 1
+        elif not quoted and ch == ')':
+            depth -= 1
+        elif not quoted and depth == 0 and ch == ',':
+            parts.append(expr[start:i])
+            start = i + 1
+    parts.append(expr[start:])
+    return [p.strip() for p in parts if p.strip()]
+
+
+def _unquote(value):
+    return value[1:-1] if len(value) >= 2 and value[0] == value[-1] == '"' else value
+
+
+class LocalQuery:
+    """The supabase-py query builder subset: filters, order, limit/range, execute()."""
+
+    def __init__(self, db, table):
+        if table not in PUBLIC_TABLES:
+            raise _error(f'relation "public.{table}" does not exist', '42P01')
+        self.db = db
+        self.table = table
+        self.action = 'select'
+        self.columns = None
+        self.count = None
+        self.payload = None
+        self.on_conflict = None
+        self.ignore_duplicates = False
+        self.returning = True
+        self.where = []
+        self.params = []
+        self.orders = []
+        self.limit_ = None
+        self.offset = None
+
+    def _column(self, name):
+        name = name.strip()
+        if name not in self.db.columns[self.table]:
+            raise _error(f"Could not find the '{name}' column of '{self.table}' in the schema cache", 'PGRST204')
+        return name
+
+    # -- actions -----------------------------------------------------------
+
+    def select(self, *columns, count=None, head=None):
+        self.action = 'select'
+        spec = ','.join(columns) or '*'
+        self.columns = None if spec.strip() == '*' else [self._column(c) for c in spec.split(',')]
+        self.count = count
+        return self
+
+    def insert(self, json, *, count=None, returning='representation', upsert=False, default_to_null=True):
+        self.action = 'upsert' if upsert else 'insert'
+        self.payload = json if isinstance(json, list) else [json]
+        self.returning = str(getattr(returning, 'value', returning)) == 'representation'
+        return self
+
+    def upsert(self, json, *, count=None, returning='representation', ignore_duplicates=False,
+               on_conflict='', default_to_null=True):
+        self.insert(json, returning=returning)
+        self.action = 'upsert'
+        self.ignore_duplicates = ignore_duplicates
+        self.on_conflict = on_conflict or None
+        return self
+
+    def update(self, json, *, count=None, returning='representation'):
+        self.action = 'update'
+        self.payload = json
+        return self
+
+    def delete(self, *, count=None, returning='representation'):
+        self.action = 'delete'
+        return self
+
+    # -- filters -----------------------------------------------------------
+
+    def _compare(self, column, op, value):
+        self.where.append(f'{self._column(column)} {OPERATORS[op]} ?')
+        self.params.append(value)
+        return self
+
+    def eq(self, column, value):
+        return self._compare(column, 'eq', value)
+
+    def neq(self, column, value):
+        return self._compare(column, 'neq', value)
+
+    def gt(self, column, value):
+        return self._compare(column, 'gt', value)
+
+    def gte(self, column, value):
+        return self._compare(column, 'gte', value)
+
+    def lt(self, column, value):
+        return self._compare(column, 'lt', value)
+
+    def lte(self, column, value):
+        return self._compare(column, 'lte', value)
+
+    def is_(self, column, value):
+        self.where.append(f'{self._column(column)} is {"null" if value in (None, "null") else "?"}')
+        if value not in (None, 'null'):
+            self.params.append(value)
+        return self
+
+    def in_(self, column, values):
+        values = list(values)
+        if not values:
+            self.where.append('0')
+        else:
+            self.where.append(f'{self._column(column)} in ({", ".join("?" for _ in values)})')
+            self.params.extend(values)
+        return self
+
+    def or_(self, filters, reference_table=None):
+        sql, params = self._logic('or', filters)
+        self.where.append(sql)
+        self.params.extend(params)
+        return self
+
+    def _logic(self, joiner, expr):
+        """SQL for a PostgREST logic tree such as `a.lt.1,and(a.eq.1,b.gt."x")`."""
+        clauses, params = [], []
+        for part in _split_top_level(expr):
+            match = re.match(r'^(and|or)\((.*)\)$', part, re.S)
+            if match:
+                sql, sub = self._logic(match.group(1), match.group(2))
+            else:
+                try:
+                    column, op, value = part.split('.', 2)
+                except ValueError:
+                    raise _error(f'"failed to parse logic tree ({expr})"')
+                if op == 'is':
+                    sql, sub = f'{self._column(column)} is null', []
+                elif op == 'in':
+                    values = [_unquote(v) for v in _split_top_level(value.strip('()'))]
+                    sql, sub = f'{self._column(column)} in ({", ".join("?" for _ in values)})', values
+                elif op in OPERATORS:
+                    sql, sub = f'{self._column(column)} {OPERATORS[op]} ?', [_unquote(value)]
+                else:
+                    raise _error(f'"failed to parse filter ({part})"')
+            clauses.append(sql)
+            params.extend(sub)
+        return '(' + f' {joiner} '.join(clauses) + ')', params
+
+    def order(self, column, *, desc=False, nullsfirst=None, foreign_table=None):
+        column = self._column(column)
+        direction = 'desc' if desc else 'asc'
+        if column in self.db.not_null[self.table]:
+            self.orders.append(f'{column} {direction}')
+        else:
+            # Postgres puts nulls last ascending and first descending
+            nulls_first = desc if nullsfirst is None else nullsfirst
+            self.orders.append(f'{column} is null {"desc" if nulls_first else "asc"}, {column} {direction}')
+        return self
+
+    def limit(self, size, *, foreign_table=None):
+        self.limit_ = size
+        return self
+
+    def range(self, start, end, foreign_table=None):
+        self.offset = start
+        self.limit_ = end - start + 1
+        return self
+
+    # -- execution ---------------------------------------------------------
+
+    def _where_sql(self):
+        return (' where ' + ' and '.join(self.where)) if self.where else ''
+
+    def execute(self):
+        self.db.round_trip('table', self.table)
+        try:
+            rows, count = getattr(self, f'_execute_{self.action}')()
+        except sqlite3.IntegrityError as e:
+            raise _error(str(e), '23505')
+        return SimpleNamespace(data=rows, count=count)
+
+    def _execute_select(self):
+        columns = ', '.join(self.columns) if self.columns else '*'
+        sql = f'select {columns} from {self.table}{self._where_sql()}'
+        if self.orders:
+            sql += ' order by ' + ', '.join(self.orders)
+        if self.limit_ is not None or self.offset:
+            sql += f' limit {int(self.limit_ if self.limit_ is not None else -1)} offset {int(self.offset or 0)}'
+        rows = [self.db.decode(self.table, r) for r in self.db.execute(sql, self.params)]
+        count = None
+        if self.count:
+            count = self.db.execute(f'select count(*) from {self.table}{self._where_sql()}', self.params)[0][0]
+        return rows, count
+
+    def _execute_insert(self):
+        statements = []
+        for given in self.payload:
+            row = self.db.encode(self.table, self.db.with_defaults(self.table, given))
+            columns = [self._column(c) for c in row]
+            sql = f'insert into {self.table} ({", ".join(columns)}) values ({", ".join("?" for _ in columns)})'
+            if self.action == 'upsert':
+                # on conflict only the columns the caller sent are updated
+                targets = [self._column(c.strip()) for c in (self.on_conflict or 'id').split(',')]
+                target = ', '.join(targets)
+                provided = [c for c in given if c not in targets]
+                if self.ignore_duplicates or not provided:
+                    sql += f' on conflict ({target}) do nothing'
+                else:
+                    sql += f' on conflict ({target}) do update set ' + ', '.join(f'{c} = excluded.{c}' for c in provided)
+            statements.append((sql + ' returning *', [row[c] for c in row]))
+        results = self.db.transaction(statements)
+        rows = [self.db.decode(self.table, r) for result in results for r in result]
+        return (rows if self.returning else []), None
+
+    _execute_upsert = _execute_insert
+
+    def _execute_update(self):
+        row = self.db.encode(self.table, self.payload)
+        columns = [self._column(c) for c in row]
+        sql = f'update {self.table} set ' + ', '.join(f'{c} = ?' for c in columns) + self._where_sql() + ' returning *'
+        rows = self.db.transaction([(sql, [row[c] for c in columns] + self.params)])[0]
+        return [self.db.decode(self.table, r) for r in rows], None
+
+    def _execute_delete(self):
+        sql = f'delete from {self.table}{self._where_sql()} returning *'
+        rows = self.db.transaction([(sql, self.params)])[0]
+        return [self.db.decode(self.table, r) for r in rows], None
+
+
+class LocalAuth:
+    """Password sign-up/sign-in and rotating refresh tokens, issuing HS256 JWTs."""
+
+    def __init__(self, db):
+        self.db = db
+        self._refresh_token = None
+
+    def _session(self, user_id, email):
+        now = int(time.time())
+        access_token = jwt.encode({'sub': user_id, 'email': email, 'aud': 'authenticated', 'role': 'authenticated',
+                                   'iat': now, 'exp': now + ACCESS_TOKEN_TTL}, self.db.jwt_secret, algorithm='HS256')
+        refresh_token = secrets.token_urlsafe(24)
+        self.db.execute('insert into auth_refresh_tokens (token, user_id) values (?, ?)', (refresh_token, user_id))
+        user = SimpleNamespace(id=user_id, email=email)
+        session = SimpleNamespace(access_token=access_token, refresh_token=refresh_token, expires_in=ACCESS_TOKEN_TTL,
+                                  expires_at=now + ACCESS_TOKEN_TTL, token_type='bearer', user=user)
+        return SimpleNamespace(user=user, session=session)
+
+    def sign_up(self, credentials):
+        self.db.round_trip('auth', 'signup')
+        email = credentials['email'].lower()
+        if self.db.execute('select 1 from auth_users where email = ?', (email,)):
+            raise AuthApiError('User already registered', 422, 'user_already_exists')
+        user_id = self.db.create_user(email, credentials['password'])
+        return self._session(user_id, email)
+
+    def sign_in_with_password(self, credentials):
+        self.db.round_trip('auth', 'token')
+        email = credentials['email'].lower()
+        rows = self.db.execute('select id, password_hash from auth_users where email = ?', (email,))
+        if not rows or not check_password_hash(rows[0]['password_hash'], credentials['password']):
+            raise AuthApiError('Invalid login credentials', 400, 'invalid_credentials')
+        return self._session(rows[0]['id'], email)
+
+    def refresh_session(self, refresh_token=None):
+        self.db.round_trip('auth', 'token')
+        rows = self.db.execute('delete from auth_refresh_tokens where token = ? returning user_id',
+                               (refresh_token or self._refresh_token,))
+        if not rows:
+            raise AuthApiError('Invalid Refresh Token: Refresh Token Not Found', 400, 'refresh_token_not_found')
+        user = self.db.execute('select id, email from auth_users where id = ?', (rows[0]['user_id'],))[0]
+        return self._session(user['id'], user['email'])
+
+    def set_session(self, access_token, refresh_token):
+        self._refresh_token = refresh_token
+
+    def sign_out(self, options=None):
+        self.db.round_trip('auth', 'logout')
+        if self._refresh_token:
+            self.db.execute('delete from auth_refresh_tokens where token = ?', (self._refresh_token,))
+            self._refresh_token = None
+
+
+class LocalBucket:
+    def __init__(self, db, bucket, public_url):
+        self.db = db
+        self.bucket = bucket
+        self.public_url = public_url
+
+    def _path(self, key):
+        root = os.path.abspath(os.path.join(self.db.storage_dir, self.bucket))
+        path = os.path.abspath(os.path.join(root, key))
+        if not path.startswith(root + os.sep):
+            raise ValueError(f'Invalid object key: {key}')
+        return path
+
+    def upload(self, path, file, file_options=None):
+        self.db.round_trip('storage', self.bucket)
+        target = self._path(path)
+        if os.path.exists(target) and str((file_options or {}).get('upsert', 'false')).lower() != 'true':
+            raise _error('The resource already exists', '409')
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if isinstance(file, (bytes, bytearray)):
+            with open(target, 'wb') as out:
+                out.write(file)
+        elif isinstance(file, (str, os.PathLike)):
+            with open(file, 'rb') as src, open(target, 'wb') as out:
+                out.write(src.read())
+        else:
+            with open(target, 'wb') as out:
+                out.write(file.read())
+        return SimpleNamespace(path=path, full_path=f'{self.bucket}/{path}')
+
+    def get_public_url(self, path, options=None):
+        return f'{self.public_url}{self.bucket}/{path}'
+
+    def remove(self, paths):
+        self.db.round_trip('storage', self.bucket)
+        for key in paths:
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+        return []
+
+
+class LocalStorage:
+    def __init__(self, db, public_url='/uploads/'):
+        self.db = db
+        self.public_url = public_url
+
+    def from_(self, bucket):
+        return LocalBucket(self.db, bucket, self.public_url)
+
+
+class LocalClient:
+    """Drop-in for a supabase Client backed by a LocalDatabase.
+
+    Access tokens are not checked here (there is no RLS); the app verifies
+    them itself before acting for a user.
+    """
+
+    def __init__(self, db, access_token=None):
+        self.db = db
+        self.access_token = access_token
+        self.auth = LocalAuth(db)
+        self.storage = LocalStorage(db)
+
+    def table(self, name):
+        return LocalQuery(self.db, name)
+
+    from_ = table
+
+
+def open_local_database(url, jwt_secret=None):
+    """LocalDatabase from sqlite:// (in memory) or sqlite:///path/to.db, with
+    optional ?latency_ms=&jitter_ms=&storage=<dir> query parameters."""
+    parts = urlsplit(url)
+    query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+    path = (parts.netloc + parts.path) or ':memory:'
+    if path != ':memory:':
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    return LocalDatabase(path,
+                         latency=float(query.get('latency_ms', 0)) / 1000,
+                         jitter=float(query.get('jitter_ms', 0)) / 1000,
+                         storage_dir=query.get('storage'),
+                         jwt_secret=jwt_secret)
@@ -0,0 +1,55 @@
+class ProfileCache:
+    """user_profiles rows by user_id, shared by feed, comments and login.
+
+    load_many(user_ids) returns the rows for those ids in one query. Ids
+    with no row are cached as missing (an empty dict) for `negative_ttl`
+    seconds, so authors without a profile don't cost a lookup on every
+    page. Emails map to user ids so a returning user's sign-in can skip the
+    profile lookup.
+    """
+
+    def __init__(self, cache, load_many, negative_ttl=60):
+        self.cache = cache
+        self.load_many = load_many
+        self.negative_ttl = negative_ttl
+
+    def get_many(self, user_ids, recheck_missing=False):
+        """{user_id: profile} for the ids that have a profile; misses are
+        fetched together. With recheck_missing, ids cached as missing are
+        fetched again."""
+        user_ids = list(dict.fromkeys(u for u in user_ids if u))
+        cached = self.cache.get_many([f'user:{u}' for u in user_ids])
+        found = {}
+        missing = []
+        for user_id in user_ids:
+            profile = cached.get(f'user:{user_id}')
+            if profile:
+                found[user_id] = profile
+            elif profile is None or recheck_missing:
+                missing.append(user_id)
+        if missing:
+            loaded = {row['user_id']: row for row in self.load_many(missing)}
+            self.cache.set_many({f'user:{u}': p for u, p in loaded.items()})
+            self.cache.set_many({f'user:{u}': {} for u in missing if u not in loaded}, ttl=self.negative_ttl)
+            self.cache.set_many({f"email:{p['email'].lower()}": u for u, p in loaded.items() if p.get('email')})
+            found.update(loaded)
+        return found
+
+    def get(self, user_id, recheck_missing=False):
+        return self.get_many([user_id], recheck_missing).get(user_id)
+
+    def cached_by_email(self, email):
+        """The cached profile for `email`, without going to the database."""
+        user_id = self.cache.get(f'email:{email.lower()}')
+        return (self.cache.get(f'user:{user_id}') or None) if user_id else None
+
+    def prime(self, profile):
+        self.cache.set(f"user:{profile['user_id']}", profile)
+        if profile.get('email'):
+            self.cache.set(f"email:{profile['email'].lower()}", profile['user_id'])
+
+    def invalidate(self, user_id, email=None):
+        keys = [f'user:{user_id}']
+        if email:
+            keys.append(f'email:{email.lower()}')
+        self.cache.delete(*keys)
@@ -0,0 +1,207 @@
+# Throttling for write endpoints: token buckets per user and endpoint, and
+# coalescing of identical requests (a double-submitted comment) into one backend
+# operation whose result both requests return. memory:// keeps both per
+# worker; redis:// shares them between workers.
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
+from uuid import uuid4
+
+from instrumentation import COALESCED, RATE_LIMITED
+
+
+class MemoryBuckets:
+    """Token buckets in this process, kept for the most recently used keys."""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst, cost=1):
+        """(allowed, seconds until `cost` tokens are available)."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (cost - tokens) / rate
+
+
+# Refill and take in one step, on the server's clock
+TAKE_SCRIPT = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local rate, burst, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+
+class RedisBuckets:
+    """Same interface as MemoryBuckets on Redis hashes, shared by all workers."""
+
+    def __init__(self, client, prefix='morphx:ratelimit:'):
+        self.client = client
+        self.prefix = prefix
+        self._take = client.register_script(TAKE_SCRIPT)
+
+    def take(self, key, rate, burst, cost=1):
+        wait = float(self._take(keys=[self.prefix + key], args=[rate, burst, cost]))
+        return wait == 0, wait
+
+
+class RateLimiter:
+    """Per-endpoint limits of `requests` per `seconds` for each caller.
+
+    A caller may use a whole window's requests in a burst; after that they
+    come back at requests/seconds. Endpoints without a limit are not
+    throttled. If the bucket store fails, requests are let through.
+    """
+
+    def __init__(self, buckets, limits):
+        self.buckets = buckets
+        self.limits = limits
+
+    def check(self, endpoint, caller):
+        """None when allowed, else the whole seconds to wait before retrying."""
+        limit = self.limits.get(endpoint)
+        if not limit:
+            return None
+        requests, seconds = limit
+        try:
+            allowed, wait = self.buckets.take(f'{endpoint}:{caller}', requests / seconds, requests)
+        except Exception as e:
+            print(f"Rate limit check failed, allowing: {e}")
+            return None
+        if allowed:
+            return None
+        RATE_LIMITED.inc(endpoint)
+        return max(1, math.ceil(wait))
+
+
+class MemoryCoalescer:
+    """Runs one of several identical operations and hands its result to all.
+
+    Requests arriving while the operation runs, or within `window` seconds
+    after it finished, get the same result (an exception is raised to the
+    waiters too, but is not kept). run(..., window=0) shares only while the
+    operation is in flight, for operations that aren't idempotent (a toggle).
+    """
+
+    def __init__(self, window=1.0, max_keys=10000):
+        self.window = window
+        self.max_keys = max_keys
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def run(self, key, fn, operation='', window=None):
+        window = self.window if window is None else window
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry['finished'] is not None and now - entry['finished'] >= window:
+                entry = None
+            owner = entry is None
+            if owner:
+                entry = self._entries[key] = {'done': threading.Event(), 'finished': None,
+                                              'result': None, 'error': None}
+                while len(self._entries) > self.max_keys:
+                    self._entries.popitem(last=False)
+        if not owner:
+            entry['done'].wait()
+            COALESCED.inc(operation)
+            if entry['error'] is not None:
+                raise entry['error']
+            return entry['result']
+        try:
+            entry['result'] = fn()
+            return entry['result']
+        except Exception as e:
+            entry['error'] = e
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+            raise
+        finally:
+            entry['finished'] = time.monotonic()
+            entry['done'].set()
+
+
+class RedisCoalescer:
+    """MemoryCoalescer across workers: the first request claims the key and
+    stores its (JSON-serializable) result under its claim; the claim is kept
+    for `window` seconds after it finished. The others wait up to `wait`
+    seconds for the result, then run the operation themselves."""
+
+    def __init__(self, client, window=1.0, wait=5.0, prefix='morphx:coalesce:'):
+        self.client = client
+        self.window = window
+        self.wait = wait
+        self.prefix = prefix
+
+    def run(self, key, fn, operation='', window=None):
+        window = self.window if window is None else window
+        key = self.prefix + key
+        ttl_ms = int((window + self.wait) * 1000)
+        claim = uuid4().hex
+        if self.client.set(key, claim, nx=True, px=ttl_ms):
+            try:
+                result = fn()
+            except Exception:
+                self.client.delete(key)
+                raise
+            # the result outlives the claim, so requests that saw the claim
+            # still find it
+            pipe = self.client.pipeline()
+            pipe.set(f'{key}:{claim}', json.dumps(result), px=ttl_ms)
+            if window:
+                pipe.pexpire(key, int(window * 1000))
+            else:
+                pipe.delete(key)
+            pipe.execute()
+            return result
+        claim = self.client.get(key)
+        deadline = time.monotonic() + self.wait
+        while claim and time.monotonic() < deadline:
+            raw = self.client.get(f'{key}:{claim}')
+            if raw is not None:
+                COALESCED.inc(operation)
+                return json.loads(raw)
+            if self.client.get(key) != claim:
+                break  # the operation failed
+            time.sleep(0.01)
+        return fn()
+
+
+def make_rate_limiting(url, limits, window):
+    """(RateLimiter, coalescer) for a URL: memory:// or redis://host:port/db."""
+    if not url or url.startswith('memory://'):
+        return RateLimiter(MemoryBuckets(), limits), MemoryCoalescer(window)
+    if url.startswith(('redis://', 'rediss://')):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("Install the 'redis' package to use a redis:// rate limit URL")
+        client = redis.Redis.from_url(url, decode_responses=True)
+        return RateLimiter(RedisBuckets(client), limits), RedisCoalescer(client, window)
+    raise ValueError(f"Unsupported rate limit URL: {url}")
@@ -0,0 +1,188 @@
+# Tiered retention for tweet_replies: status updates (replies with a crowd
+# level, queue length or importance) older than the hot window move to
+# tweet_replies_archive and are summarized per resource and time bucket in
+# status_rollups (min/max/last crowd level and queue length), so the table
+# the feed reads stays small as the dashboard ages. Comments and each post's
+# latest reply stay hot. See sql/status_retention.sql.
+from datetime import datetime, timezone
+
+from ingest import CROWD_LEVELS
+
+ARCHIVE_TABLE = 'tweet_replies_archive'
+ROLLUP_TABLE = 'status_rollups'
+STATUS_FIELDS = ('crowd_level', 'queue_length', 'chips_available')
+# PostgREST filter for rows with any of STATUS_FIELDS set
+STATUS_FILTER = ','.join(f'{field}.gt.""' for field in STATUS_FIELDS)
+DELETE_CHUNK = 200
+# Rows per read (stays under PostgREST's max-rows cap)
+PAGE_ROWS = 1000
+
+# Crowd levels in order (1 = Low), so buckets can keep a min and max
+CROWD_RANK = {level: rank for rank, level in enumerate(CROWD_LEVELS.values(), 1)}
+
+
+def parse_time(value):
+    stamp = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    return stamp if stamp.tzinfo else stamp.replace(tzinfo=timezone.utc)
+
+
+def bucket_start(value, bucket_seconds):
+    seconds = parse_time(value).timestamp()
+    return datetime.fromtimestamp(seconds - seconds % bucket_seconds, timezone.utc).isoformat()
+
+
+def queue_number(value):
+    value = str(value or '').strip()
+    return int(value) if value.isdigit() else None
+
+
+def _new_bucket(resource_id, start, bucket_seconds):
+    return {'resource_id': resource_id, 'bucket_start': start, 'bucket_seconds': bucket_seconds, 'updates': 0,
+            'crowd_min': None, 'crowd_max': None, 'crowd_last': None, 'queue_min': None, 'queue_max': None,
+            'queue_last': None, 'importance_last': None, 'last_at': None}
+
+
+def _low(a, b):
+    return b if a is None else a if b is None else min(a, b)
+
+
+def _high(a, b):
+    return b if a is None else a if b is None else max(a, b)
+
+
+def rollup(rows, bucket_seconds):
+    """Rollup rows, one per (resource, bucket), of status update rows."""
+    buckets = {}
+    for row in sorted(rows, key=lambda r: (parse_time(r['created_at']), r['id'])):
+        start = bucket_start(row['created_at'], bucket_seconds)
+        bucket = buckets.get((row['resource_id'], start))
+        if bucket is None:
+            bucket = buckets[(row['resource_id'], start)] = _new_bucket(row['resource_id'], start, bucket_seconds)
+        bucket['updates'] += 1
+        crowd = CROWD_RANK.get(row.get('crowd_level'))
+        if crowd:
+            bucket['crowd_min'] = _low(bucket['crowd_min'], crowd)
+            bucket['crowd_max'] = _high(bucket['crowd_max'], crowd)
+            bucket['crowd_last'] = row['crowd_level']
+        queue = queue_number(row.get('queue_length'))
+        if queue is not None:
+            bucket['queue_min'] = _low(bucket['queue_min'], queue)
+            bucket['queue_max'] = _high(bucket['queue_max'], queue)
+        if row.get('queue_length'):
+            bucket['queue_last'] = row['queue_length']
+        if row.get('chips_available'):
+            bucket['importance_last'] = row['chips_available']
+        bucket['last_at'] = row['created_at']
+    return list(buckets.values())
+
+
+def merge(buckets):
+    """Combine rollup rows of the same (resource, bucket), e.g. archived and hot
+    parts of one hour; sorted by bucket."""
+    merged = {}
+    for bucket in sorted(buckets, key=lambda b: parse_time(b['last_at'])):
+        key = (bucket['resource_id'], parse_time(bucket['bucket_start']))
+        into = merged.get(key)
+        if into is None:
+            merged[key] = dict(bucket)
+            continue
+        into['updates'] += bucket['updates']
+        for field in ('crowd_min', 'queue_min'):
+            into[field] = _low(into[field], bucket[field])
+        for field in ('crowd_max', 'queue_max'):
+            into[field] = _high(into[field], bucket[field])
+        # bucket is the later one
+        for field in ('crowd_last', 'queue_last', 'importance_last', 'last_at'):
+            into[field] = bucket[field] or into[field]
+    return [merged[key] for key in sorted(merged)]
+
+
+def _archive_resource(client, resource_id, cutoff, bucket_seconds, max_rows):
+    """Move up to max_rows of one post's status updates older than `cutoff`;
+    returns how many moved."""
+    latest = (client.table('tweet_replies').select('id').eq('resource_id', resource_id)
+              .order('created_at', desc=True).order('id', desc=True).limit(1).execute().data or [])
+    query = (client.table('tweet_replies').select('*').eq('resource_id', resource_id)
+             .lt('created_at', cutoff).or_(STATUS_FILTER))
+    if latest:
+        # the card shows the latest reply
+        query = query.neq('id', latest[0]['id'])
+    rows = query.order('created_at').order('id').limit(max_rows).execute().data or []
+    if not rows:
+        return 0
+    now = datetime.now(timezone.utc).isoformat()
+    client.table(ARCHIVE_TABLE).upsert([dict(row, archived_at=now) for row in rows],
+                                       on_conflict='id', ignore_duplicates=True).execute()
+    # Rebuild the touched buckets from everything archived in them, so running
+    # a step again (after a crash) gives the same rollups
+    first = bucket_start(rows[0]['created_at'], bucket_seconds)
+    end = parse_time(bucket_start(rows[-1]['created_at'], bucket_seconds)).timestamp() + bucket_seconds
+    archived = (client.table(ARCHIVE_TABLE).select('*').eq('resource_id', resource_id)
+                .gte('created_at', first)
+                .lt('created_at', datetime.fromtimestamp(end, timezone.utc).isoformat())
+                .execute().data or [])
+    client.table(ROLLUP_TABLE).upsert(rollup(archived, bucket_seconds), on_conflict='resource_id,bucket_start').execute()
+    ids = [row['id'] for row in rows]
+    for i in range(0, len(ids), DELETE_CHUNK):
+        client.table('tweet_replies').delete().in_('id', ids[i:i + DELETE_CHUNK]).execute()
+    return len(rows)
+
+
+def compact_step(client, cutoff, after=None, resources=100, max_rows=2000, bucket_seconds=3600):
+    """One resumable step of a compaction pass over posts in id order.
+
+    Archives the old status updates of the posts after `after`, moving at
+    most `max_rows` rows. Returns (after, touched, done): the post id to
+    continue after, the posts whose hot rows changed and whether the pass is
+    finished. Every step can safely be run again.
+    """
+    query = client.table('tweets').select('id').order('id').limit(resources)
+    if after:
+        query = query.gt('id', after)
+    ids = [row['id'] for row in query.execute().data or []]
+    touched = []
+    budget = max_rows
+    for resource_id in ids:
+        moved = _archive_resource(client, resource_id, cutoff, bucket_seconds, budget)
+        if moved:
+            touched.append(resource_id)
+        budget -= moved
+        if budget <= 0:
+            # this post may have more; the next step starts with it again
+            return after, touched, False
+        after = resource_id
+    return after, touched, len(ids) < resources
+
+
+def _select_all(make_query, order, page_rows):
+    """Every row of make_query(), read in pages of `page_rows` sorted by the
+    (together unique) `order` columns, so none is cut off by max-rows."""
+    rows = []
+    start = 0
+    while True:
+        query = make_query()
+        for column in order:
+            query = query.order(column)
+        page = query.range(start, start + page_rows - 1).execute().data or []
+        rows.extend(page)
+        if len(page) < page_rows:
+            return rows
+        start += page_rows
+
+
+def history(client, resource_id, since, bucket_seconds=3600, page_rows=PAGE_ROWS):
+    """Rollup rows of one post from `since` (ISO 8601) on: archived buckets
+    merged with buckets computed from its hot status updates."""
+    try:
+        archived = _select_all(lambda: client.table(ROLLUP_TABLE).select('*').eq('resource_id', resource_id)
+                               .gte('bucket_start', bucket_start(since, bucket_seconds)),
+                               ('bucket_start',), page_rows)
+    except Exception as e:
+        # sql/status_retention.sql not run yet
+        print(f"Status rollups unavailable: {e}")
+        archived = []
+    hot = _select_all(lambda: client.table('tweet_replies')
+                      .select('id,resource_id,crowd_level,queue_length,chips_available,created_at')
+                      .eq('resource_id', resource_id).gte('created_at', since).or_(STATUS_FILTER),
+                      ('created_at', 'id'), page_rows)
+    return merge(archived + rollup(hot, bucket_seconds))
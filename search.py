@@ -0,0 +1,355 @@
+# Full-text search over post names, contents and status updates: an
+# in-process inverted index kept current from post events (memory://), or
+# Postgres tsvector columns with GIN indexes behind the search_posts RPC
+# (supabase://, see sql/search.sql).
+import bisect
+import heapq
+import math
+import os
+import queue
+import re
+import threading
+import time
+import unicodedata
+
+from instrumentation import SEARCH_REBUILDS
+
+# Term weight per field occurrence
+NAME_WEIGHT = 4
+CONTENT_WEIGHT = 2
+STATUS_WEIGHT = 1
+# A prefix match counts for less than the whole word
+PREFIX_FACTOR = 0.7
+# Saturation of repeated terms (BM25's k1)
+TF_SATURATION = 1.2
+
+# Blend of text relevance with the feed's order
+IMPORTANCE_BOOST = 0.5
+UPVOTE_BOOST = 0.2
+
+# Events that change what a post's document contains
+REINDEX_EVENTS = {'created', 'edited', 'status', 'comments', 'deleted'}
+
+_WORD = re.compile(r'\w+')
+
+
+def tokenize(text):
+    """Lowercased, accent-folded words of `text`."""
+    if not text:
+        return []
+    folded = unicodedata.normalize('NFKD', str(text).casefold())
+    folded = ''.join(c for c in folded if not unicodedata.combining(c))
+    return _WORD.findall(folded)
+
+
+def document_terms(name, content, statuses):
+    """{term: weight} for one post."""
+    terms = {}
+    for text, weight in [(name, NAME_WEIGHT), (content, CONTENT_WEIGHT)] + [(s, STATUS_WEIGHT) for s in statuses]:
+        for term in tokenize(text):
+            terms[term] = terms.get(term, 0) + weight
+    return terms
+
+
+class InvertedIndex:
+    """Term -> {weight: {post_id}} postings plus a sorted vocabulary for prefix
+    lookups.
+
+    Grouping a term's posts by weight lets a search score whole groups at
+    once with dict/set operations instead of one post at a time.
+    """
+
+    def __init__(self, max_expansions=64):
+        self.max_expansions = max_expansions
+        self._postings = {}
+        self._df = {}
+        self._vocabulary = []
+        self._doc_terms = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._doc_terms)
+
+    def load(self, documents):
+        """Replace the whole index with `documents`: (post_id, name, content, statuses)."""
+        postings = {}
+        df = {}
+        doc_terms = {}
+        for post_id, name, content, statuses in documents:
+            terms = document_terms(name, content, statuses)
+            doc_terms[post_id] = tuple(terms.items())
+            for term, weight in terms.items():
+                postings.setdefault(term, {}).setdefault(weight, set()).add(post_id)
+                df[term] = df.get(term, 0) + 1
+        with self._lock:
+            self._postings = postings
+            self._df = df
+            self._vocabulary = sorted(postings)
+            self._doc_terms = doc_terms
+
+    def put(self, post_id, name, content, statuses):
+        terms = document_terms(name, content, statuses)
+        with self._lock:
+            self._remove(post_id)
+            self._doc_terms[post_id] = tuple(terms.items())
+            for term, weight in terms.items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = {}
+                    bisect.insort(self._vocabulary, term)
+                postings.setdefault(weight, set()).add(post_id)
+                self._df[term] = self._df.get(term, 0) + 1
+
+    def remove(self, post_id):
+        with self._lock:
+            self._remove(post_id)
+
+    def _remove(self, post_id):
+        for term, weight in self._doc_terms.pop(post_id, ()):
+            postings = self._postings.get(term)
+            if postings is None or post_id not in postings.get(weight, ()):
+                continue
+            postings[weight].discard(post_id)
+            if not postings[weight]:
+                del postings[weight]
+            self._df[term] -= 1
+            if not postings:
+                del self._postings[term]
+                del self._df[term]
+                i = bisect.bisect_left(self._vocabulary, term)
+                if i < len(self._vocabulary) and self._vocabulary[i] == term:
+                    del self._vocabulary[i]
+
+    def _expand(self, word):
+        """[(term, factor)]: the word itself and up to max_expansions words it prefixes."""
+        expansions = [(word, 1.0)] if word in self._postings else []
+        if len(word) < 2:
+            return expansions
+        i = bisect.bisect_right(self._vocabulary, word)
+        while i < len(self._vocabulary) and len(expansions) < self.max_expansions:
+            term = self._vocabulary[i]
+            if not term.startswith(word):
+                break
+            expansions.append((term, PREFIX_FACTOR))
+            i += 1
+        return expansions
+
+    def _groups(self, word, total):
+        """[(score, post_ids)] for one query word, lowest score first."""
+        groups = []
+        for term, factor in self._expand(word):
+            idf = factor * math.log(1 + total / self._df[term])
+            for weight, post_ids in self._postings[term].items():
+                groups.append((idf * weight / (weight + TF_SATURATION), post_ids))
+        groups.sort(key=lambda g: g[0])
+        return groups
+
+    def search(self, query, limit):
+        """[(post_id, relevance)] of posts matching every word of `query` (each
+        word also as a prefix), best first."""
+        words = list(dict.fromkeys(tokenize(query)))
+        if not words:
+            return []
+        with self._lock:
+            total = len(self._doc_terms) or 1
+            per_word = []
+            for word in words:
+                groups = self._groups(word, total)
+                if not groups:
+                    return []
+                per_word.append((sum(len(ids) for _, ids in groups), groups))
+            # start from the rarest word and narrow down with the others
+            per_word.sort(key=lambda w: w[0])
+            scores = None
+            for size, groups in per_word:
+                # a post's score for a word is its best group's (later wins)
+                best = {}
+                if scores is not None and len(scores) * len(groups) < size:
+                    for score, post_ids in groups:
+                        best.update(dict.fromkeys(scores.keys() & post_ids, score))
+                else:
+                    for score, post_ids in groups:
+                        best.update(dict.fromkeys(post_ids, score))
+                if scores is None:
+                    scores = best
+                else:
+                    scores = {post_id: scores[post_id] + best[post_id] for post_id in scores.keys() & best.keys()}
+                if not scores:
+                    return []
+        return [(post_id, scores[post_id]) for post_id in heapq.nlargest(limit, scores, key=scores.get)]
+
+
+class MemorySearch:
+    """InvertedIndex of every post, built in the background and then kept
+    current from post events.
+
+    load_documents(ids) returns (post_id, name, content, statuses) for those
+    posts, or for every post when ids is None; posts it doesn't return are
+    dropped. start() subscribes to events and starts a builder thread in
+    the process that calls it (a worker, not a preloading master), so writes
+    made by other workers reach this one through a shared event broker.
+    Searches wait up to `ready_timeout` seconds for the first build. The
+    builder rebuilds the index from scratch when events were lost (the
+    queue was full, or a broker message never arrived) and every
+    `rebuild_interval` seconds (0 = never); searches keep using the current
+    index until the new one replaces it.
+    """
+
+    def __init__(self, load_documents, events, max_expansions=64, max_queued=10000, rebuild_interval=3600,
+                 check_interval=5.0, ready_timeout=10.0):
+        self.load_documents = load_documents
+        self.events = events
+        self.max_queued = max_queued
+        self.rebuild_interval = rebuild_interval
+        self.check_interval = check_interval
+        self.ready_timeout = ready_timeout
+        self.index = InvertedIndex(max_expansions)
+        self._queue = None
+        self._dirty = set()
+        self._refreshed = None
+        self._dirty_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._pid = None
+        self._ready = threading.Event()
+        self._wake = threading.Event()
+        self._built_at = 0.0
+        self._dropped_at_build = 0
+
+    def _note(self, event):
+        if event.get('type') in REINDEX_EVENTS and event.get('id'):
+            with self._dirty_lock:
+                self._dirty.add(event['id'])
+
+    def _collect(self):
+        while True:
+            self._note(self._queue.get())
+
+    def start(self):
+        """Start this process's event collector and builder; cheap when running."""
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            # subscribe first so writes made during the build aren't missed
+            self._queue = self.events.subscribe(self.max_queued, name='search')
+            threading.Thread(target=self._collect, daemon=True, name='search-events').start()
+            threading.Thread(target=self._maintain, daemon=True, name='search-builder').start()
+
+    def _maintain(self):
+        while True:
+            reason = self._rebuild_reason() if self._ready.is_set() else 'initial'
+            if reason:
+                try:
+                    self._load()
+                    if reason != 'initial':
+                        SEARCH_REBUILDS.inc(reason)
+                    self._ready.set()
+                except Exception as e:
+                    # keep searching the current index; try again next round
+                    print(f"Search index build failed: {e}")
+            self._wake.wait(self.check_interval)
+            self._wake.clear()
+
+    def _load(self):
+        # events after this point are reapplied by refresh(), so none are lost
+        dropped, built_at = self._queue.dropped, time.monotonic()
+        with self._dirty_lock:
+            self._refreshed = set()
+        start = time.perf_counter()
+        try:
+            self.index.load(self.load_documents(None))
+        finally:
+            with self._dirty_lock:
+                # posts refreshed into the old index during the load may be
+                # older in the new one
+                self._dirty |= self._refreshed
+                self._refreshed = None
+        self._dropped_at_build, self._built_at = dropped, built_at
+        print(f"Search index built: {len(self.index)} posts in {time.perf_counter() - start:.1f}s")
+
+    def _rebuild_reason(self):
+        if self._queue.dropped != self._dropped_at_build:
+            return 'dropped'
+        if self.rebuild_interval and time.monotonic() - self._built_at >= self.rebuild_interval:
+            return 'interval'
+        return None
+
+    def refresh(self):
+        """Reindex the posts changed since the last search."""
+        # pick up events delivered but not collected yet (the in-memory broker
+        # delivers on the writer's thread)
+        while True:
+            try:
+                self._note(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        with self._dirty_lock:
+            ids, self._dirty = self._dirty, set()
+            if self._refreshed is not None:
+                self._refreshed |= ids
+        if not ids:
+            return
+        try:
+            documents = list(self.load_documents(list(ids)))
+        except Exception:
+            with self._dirty_lock:
+                self._dirty.update(ids)
+            raise
+        for post_id, name, content, statuses in documents:
+            self.index.put(post_id, name, content, statuses)
+            ids.discard(post_id)
+        for post_id in ids:
+            self.index.remove(post_id)
+
+    def search(self, query, limit):
+        self.start()
+        if not self._ready.wait(self.ready_timeout):
+            raise RuntimeError('Search index is still being built')
+        if self._rebuild_reason():
+            # rebuilt by the builder thread; this search uses the current index
+            self._wake.set()
+        self.refresh()
+        return self.index.search(query, limit)
+
+
+class PostgresSearch:
+    """search_posts() RPC over tsvector columns; Postgres keeps them current."""
+
+    def __init__(self, get_client):
+        self.get_client = get_client
+
+    def start(self):
+        pass
+
+    def search(self, query, limit):
+        if not tokenize(query):
+            return []
+        rows = self.get_client().rpc('search_posts', {'query': query, 'max_results': limit}).execute().data or []
+        return [(row['id'], float(row['rank'] or 0)) for row in rows]
+
+
+def blend(hits, posts, limit):
+    """The `limit` best of `posts` ({id: post}) for text `hits`, with relevance
+    (relative to the best hit) lifted by the feed's importance and upvotes."""
+    top = max((score for _, score in hits), default=0.0) or 1.0
+    ranked = []
+    for post_id, score in hits:
+        post = posts.get(post_id)
+        if not post:
+            continue
+        boost = (1 + IMPORTANCE_BOOST * post.get('importance_rank', 0)
+                 + UPVOTE_BOOST * math.log1p(post.get('upvotes_count', 0)))
+        ranked.append((score / top * boost, post))
+    ranked.sort(key=lambda r: r[0], reverse=True)
+    return [post for _, post in ranked[:limit]]
+
+
+def make_search(url, load_documents, events, get_client, rebuild_interval=3600):
+    """Build a search backend from a URL: memory:// or supabase://."""
+    if not url or url.startswith('memory://'):
+        return MemorySearch(load_documents, events, rebuild_interval=rebuild_interval)
+    if url.startswith('supabase://'):
+        return PostgresSearch(get_client)
+    raise ValueError(f"Unsupported search backend URL: {url}")
@@ -0,0 +1,246 @@
+# Server-side sessions: the cookie carries only a random session id, the data
+# (Supabase tokens, profile fields, role flags) lives in a store. memory://
+# keeps it in this process, sqlite:///path shares it between the processes
+# on one host (the local stand-in for Redis) and redis://host:port/db between
+# hosts. A session expires permanent_session_lifetime after its last use.
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+# The cookie session's serializer, so the same values round-trip
+serializer = TaggedJSONSerializer()
+
+
+def new_session_id():
+    return secrets.token_urlsafe(32)
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    def __init__(self, data=None, sid=None, new=False, touched=0.0):
+        def on_update(self):
+            self.modified = True
+            self.accessed = True
+        super().__init__(data, on_update)
+        self.sid = sid or new_session_id()
+        self.new = new
+        self.touched = touched
+        self.modified = False
+        self.previous_sid = None
+
+    def regenerate(self):
+        """Move the data to a new id (on sign-in, so an id planted in the
+        browser beforehand is worthless)."""
+        if not self.new and self.previous_sid is None:
+            self.previous_sid = self.sid
+        self.sid = new_session_id()
+        self.modified = True
+
+
+class MemorySessionStore:
+    """Sessions in this process, for a single worker."""
+
+    def __init__(self, max_sessions=100000):
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, sid):
+        """(data, last write time) of a live session, else None."""
+        with self._lock:
+            item = self._sessions.get(sid)
+            if item is None or item[2] < time.time():
+                return None
+            self._sessions.move_to_end(sid)
+        return serializer.loads(item[0]), item[1]
+
+    def save(self, sid, data, ttl):
+        now = time.time()
+        with self._lock:
+            self._sessions[sid] = (serializer.dumps(data), now, now + ttl)
+            self._sessions.move_to_end(sid)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def delete(self, sid):
+        with self._lock:
+            self._sessions.pop(sid, None)
+
+    def sweep(self):
+        """Drop expired sessions; returns how many."""
+        now = time.time()
+        with self._lock:
+            expired = [sid for sid, item in self._sessions.items() if item[2] < now]
+            for sid in expired:
+                del self._sessions[sid]
+        return len(expired)
+
+
+SQLITE_SCHEMA = """
+create table if not exists sessions (id text primary key, data text not null, touched real not null,
+                                     expires_at real not null);
+create index if not exists sessions_expires_idx on sessions (expires_at);
+"""
+
+
+class SqliteSessionStore:
+    """MemorySessionStore in a SQLite file, shared by the processes on one host."""
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            if self._conn is None or self._pid != os.getpid():
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+                conn.execute('pragma journal_mode=wal')
+                conn.executescript(SQLITE_SCHEMA)
+                self._conn, self._pid = conn, os.getpid()
+            cursor = self._conn.execute(sql, params)
+            return cursor.fetchall(), cursor.rowcount
+
+    def load(self, sid):
+        rows, _ = self._execute('select data, touched from sessions where id = ? and expires_at >= ?', (sid, time.time()))
+        return (serializer.loads(rows[0][0]), rows[0][1]) if rows else None
+
+    def save(self, sid, data, ttl):
+        now = time.time()
+        self._execute('insert or replace into sessions (id, data, touched, expires_at) values (?, ?, ?, ?)',
+                      (sid, serializer.dumps(data), now, now + ttl))
+
+    def delete(self, sid):
+        self._execute('delete from sessions where id = ?', (sid,))
+
+    def sweep(self):
+        return self._execute('delete from sessions where expires_at < ?', (time.time(),))[1]
+
+
+class RedisSessionStore:
+    """Sessions as Redis keys; Redis expires them itself."""
+
+    def __init__(self, client, prefix='morphx:session:'):
+        self.client = client
+        self.prefix = prefix
+
+    def load(self, sid):
+        raw = self.client.get(self.prefix + sid)
+        if raw is None:
+            return None
+        item = serializer.loads(raw)
+        return item['data'], item['touched']
+
+    def save(self, sid, data, ttl):
+        self.client.set(self.prefix + sid, serializer.dumps({'data': data, 'touched': time.time()}), ex=max(1, int(ttl)))
+
+    def delete(self, sid):
+        self.client.delete(self.prefix + sid)
+
+    def sweep(self):
+        return 0
+
+
+class ServerSessionInterface(SessionInterface):
+    """Flask session interface over one of the stores above.
+
+    A session is written when it changed, or to slide its expiry when the
+    last write is more than `refresh_interval` seconds old; visitors who
+    never sign in get no cookie and no row. Static files skip the session.
+    Expired sessions are swept every `sweep_interval` seconds. If the store
+    fails the request goes on without a session (signed out).
+    """
+
+    def __init__(self, store, refresh_interval=60, sweep_interval=300):
+        self.store = store
+        self.refresh_interval = refresh_interval
+        self.sweep_interval = sweep_interval
+        self._next_sweep = 0.0
+
+    def _sweep(self):
+        now = time.time()
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + self.sweep_interval
+        try:
+            self.store.sweep()
+        except Exception as e:
+            print(f"Session sweep failed: {e}")
+
+    def open_session(self, app, request):
+        if app.static_url_path and request.path.startswith(app.static_url_path + '/'):
+            return None
+        self._sweep()
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            try:
+                found = self.store.load(sid)
+            except Exception as e:
+                print(f"Session load failed: {e}")
+                found = None
+            if found is not None:
+                data, touched = found
+                return ServerSession(data, sid, touched=touched)
+        return ServerSession(new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        secure = self.get_cookie_secure(app)
+        partitioned = self.get_cookie_partitioned(app)
+        samesite = self.get_cookie_samesite(app)
+        httponly = self.get_cookie_httponly(app)
+        if session.accessed:
+            response.vary.add('Cookie')
+        try:
+            if session.previous_sid:
+                self.store.delete(session.previous_sid)
+            if not session:
+                if session.modified and not session.new:
+                    self.store.delete(session.sid)
+                    response.delete_cookie(name, domain=domain, path=path, secure=secure,
+                                           partitioned=partitioned, samesite=samesite, httponly=httponly)
+                    response.vary.add('Cookie')
+                return
+            if not session.modified and time.time() - session.touched < self.refresh_interval:
+                return
+            self.store.save(session.sid, dict(session), app.permanent_session_lifetime.total_seconds())
+        except Exception as e:
+            print(f"Session save failed: {e}")
+            return
+        # the id only changes on a new session or regenerate(); a permanent
+        # cookie is re-sent to slide its expiry too
+        if session.new or session.previous_sid or session.permanent:
+            response.set_cookie(name, session.sid, expires=self.get_expiration_time(app, session),
+                                httponly=httponly, domain=domain, path=path, secure=secure,
+                                partitioned=partitioned, samesite=samesite)
+            response.vary.add('Cookie')
+
+
+def make_session_interface(url, refresh_interval=60, sweep_interval=300):
+    """Session interface for a URL: cookie:// (Flask's signed cookie),
+    memory://, sqlite:///path or redis://host:port/db."""
+    if url.startswith('cookie://'):
+        return None
+    if not url or url.startswith('memory://'):
+        store = MemorySessionStore()
+    elif url.startswith('sqlite://'):
+        store = SqliteSessionStore(url[len('sqlite://'):])
+    elif url.startswith(('redis://', 'rediss://')):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("Install the 'redis' package to use a redis:// session URL")
+        store = RedisSessionStore(redis.Redis.from_url(url, decode_responses=True))
+    else:
+        raise ValueError(f"Unsupported session URL: {url}")
+    return ServerSessionInterface(store, refresh_interval, sweep_interval)
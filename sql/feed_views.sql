@@ -0,0 +1,113 @@
+-- Per-post aggregates for building feed posts (see build_posts in app.py): a
+-- batch of posts reads one count row and one status row per post instead of
+-- every like and reply. The views run as the caller (security_invoker), so
+-- the base tables' row level security still applies.
+
+-- Upvotes and replies per post (sql/status_retention.sql redefines it to
+-- count archived status updates too; run that file after this one)
+create or replace view public.post_counts with (security_invoker = true) as
+select t.id as resource_id,
+       (select count(*) from public.likes l where l.resource_id = t.id)::integer as upvotes_count,
+       (select count(*) from public.tweet_replies r where r.resource_id = t.id)::integer as comments_count
+from public.tweets t;
+
+-- Each post's latest status update (id breaks ties between equal times)
+create or replace view public.latest_statuses with (security_invoker = true) as
+select distinct on (resource_id) *
+from public.tweet_replies
+order by resource_id, created_at desc, id desc;
+
+-- Feed order of every post (the importance ranks of IMPORTANCE_ORDER in
+-- app.py), kept current by the triggers below, so a feed page is one keyset
+-- range scan of feed_ranks_order_idx and only its posts are built; nothing
+-- counts likes or looks up statuses when a page is read.
+create table if not exists public.feed_ranks (
+    id uuid primary key references public.tweets (id) on delete cascade,
+    created_at timestamptz not null,
+    upvotes_count integer not null default 0,
+    importance_rank smallint not null default 0
+);
+
+create index if not exists feed_ranks_order_idx
+    on public.feed_ranks (importance_rank desc, upvotes_count desc, created_at desc, id desc);
+
+create or replace function public.importance_rank(importance text) returns smallint
+language sql immutable as $$
+    select (case lower(importance)
+                when 'critical' then 4 when 'high' then 3 when 'medium' then 2 when 'low' then 1
+                else 0 end)::smallint
+$$;
+
+-- The triggers run as the owner, so any user's write keeps the ranks current
+create or replace function public.feed_ranks_tweet() returns trigger
+language plpgsql security definer set search_path = public as $$
+begin
+    insert into feed_ranks (id, created_at) values (new.id, new.created_at)
+    on conflict (id) do update set created_at = excluded.created_at;
+    return null;
+end $$;
+
+create or replace function public.feed_ranks_like() returns trigger
+language plpgsql security definer set search_path = public as $$
+begin
+    if tg_op = 'INSERT' then
+        update feed_ranks set upvotes_count = upvotes_count + 1 where id = new.resource_id;
+    else
+        update feed_ranks set upvotes_count = upvotes_count - 1 where id = old.resource_id;
+    end if;
+    return null;
+end $$;
+
+-- A post's rank follows its latest status update
+create or replace function public.feed_ranks_status() returns trigger
+language plpgsql security definer set search_path = public as $$
+declare
+    post uuid := case when tg_op = 'DELETE' then old.resource_id else new.resource_id end;
+begin
+    update feed_ranks set importance_rank = coalesce(
+        (select importance_rank(r.chips_available) from tweet_replies r
+         where r.resource_id = post order by r.created_at desc, r.id desc limit 1), 0)
+    where id = post;
+    return null;
+end $$;
+
+drop trigger if exists feed_ranks_tweet on public.tweets;
+create trigger feed_ranks_tweet after insert or update of created_at on public.tweets
+    for each row execute function public.feed_ranks_tweet();
+drop trigger if exists feed_ranks_like on public.likes;
+create trigger feed_ranks_like after insert or delete on public.likes
+    for each row execute function public.feed_ranks_like();
+drop trigger if exists feed_ranks_status on public.tweet_replies;
+create trigger feed_ranks_status after insert or update or delete on public.tweet_replies
+    for each row execute function public.feed_ranks_status();
+
+-- Posts written before the triggers existed (running the file again
+-- recounts them all)
+insert into public.feed_ranks (id, created_at, upvotes_count, importance_rank)
+select t.id, t.created_at,
+       (select count(*) from public.likes l where l.resource_id = t.id),
+       coalesce((select public.importance_rank(r.chips_available) from public.tweet_replies r
+                 where r.resource_id = t.id order by r.created_at desc, r.id desc limit 1), 0)
+from public.tweets t
+on conflict (id) do update set created_at = excluded.created_at, upvotes_count = excluded.upvotes_count,
+                               importance_rank = excluded.importance_rank;
+
+alter table public.feed_ranks enable row level security;
+drop policy if exists "feed ranks are readable by everyone" on public.feed_ranks;
+create policy "feed ranks are readable by everyone"
+    on public.feed_ranks for select using (true);
+
+-- Joined with tweets so their row level security still decides which posts
+-- a caller sees; the join is a primary key lookup per row of the page
+create or replace view public.feed_ranking with (security_invoker = true) as
+select r.id, r.created_at, r.upvotes_count, r.importance_rank
+from public.feed_ranks r
+join public.tweets t on t.id = r.id;
+
+-- Counts and latest status are index scans per post
+create index if not exists likes_resource_idx on public.likes (resource_id);
+create index if not exists tweet_replies_resource_created_idx
+    on public.tweet_replies (resource_id, created_at, id);
+
+grant select on public.post_counts, public.latest_statuses, public.feed_ranks, public.feed_ranking
+    to anon, authenticated;
@@ -0,0 +1,27 @@
+-- Denormalized feed rows, one per tweet (maintained by app.py, see summary.py)
+create table if not exists public.post_summaries (
+    id uuid primary key references public.tweets (id) on delete cascade,
+    name text,
+    content text,
+    image_url text,
+    image_variants jsonb not null default '{}'::jsonb,
+    author_id uuid,
+    author_name text,
+    created_at timestamptz not null,
+    upvotes_count integer not null default 0,
+    comments_count integer not null default 0,
+    latest_status jsonb,
+    importance text,
+    importance_rank smallint not null default 0,
+    updated_at timestamptz not null default now()
+);
+
+-- Feed order: importance, upvotes, newest first; id keeps cursors stable
+create index if not exists post_summaries_feed_idx
+    on public.post_summaries (importance_rank desc, upvotes_count desc, created_at desc, id desc);
+
+alter table public.post_summaries enable row level security;
+
+create policy "post summaries are readable by everyone"
+    on public.post_summaries for select using (true);
+-- Writes come from the server with the service role key, which bypasses RLS.
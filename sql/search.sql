@@ -0,0 +1,42 @@
+-- Full-text search for SEARCH_BACKEND_URL=supabase:// (see search.py).
+-- Generated columns keep the vectors current on every insert/update, so the
+-- app never reindexes; 'simple' matches the in-memory index (no stemming).
+alter table public.tweets add column if not exists search_vector tsvector
+    generated always as (
+        setweight(to_tsvector('simple', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(content, '')), 'B')
+    ) stored;
+create index if not exists tweets_search_idx on public.tweets using gin (search_vector);
+
+alter table public.tweet_replies add column if not exists search_vector tsvector
+    generated always as (to_tsvector('simple', coalesce(status_message, ''))) stored;
+create index if not exists tweet_replies_search_idx on public.tweet_replies using gin (search_vector);
+
+-- Posts whose name/content or one of whose status updates contains every
+-- word of `query` (each as a prefix), best first. Runs as the caller, so
+-- row level security still applies.
+create or replace function public.search_posts(query text, max_results integer default 200)
+returns table (id uuid, rank real)
+language sql stable
+as $$
+    with q as (
+        select to_tsquery('simple', string_agg(quote_literal(lexeme) || ':*', ' & ')) as tsq
+        from unnest(tsvector_to_array(to_tsvector('simple', query))) as lexeme
+    ),
+    hits as (
+        select t.id, ts_rank(t.search_vector, q.tsq) as rank
+        from public.tweets t, q
+        where t.search_vector @@ q.tsq
+        union all
+        select r.resource_id, ts_rank(r.search_vector, q.tsq) * 0.5
+        from public.tweet_replies r, q
+        where r.search_vector @@ q.tsq
+    )
+    select hits.id, sum(hits.rank)::real as rank
+    from hits
+    group by hits.id
+    order by rank desc
+    limit max_results;
+$$;
+
+grant execute on function public.search_posts(text, integer) to anon, authenticated;
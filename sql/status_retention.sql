@@ -0,0 +1,59 @@
+-- Tiered retention for tweet_replies (see retention.py): status updates older
+-- than STATUS_HOT_DAYS move to the archive, summarized per hour in the rollups
+create table if not exists public.tweet_replies_archive (
+    id uuid primary key,
+    resource_id uuid not null,
+    status_message text,
+    crowd_level text,
+    chips_available text,
+    queue_length text,
+    user_id uuid,
+    created_at timestamptz not null,
+    archived_at timestamptz not null default now()
+);
+
+create index if not exists tweet_replies_archive_resource_idx
+    on public.tweet_replies_archive (resource_id, created_at);
+
+-- One row per post and bucket; crowd_min/crowd_max are ranks (1 = Low)
+create table if not exists public.status_rollups (
+    resource_id uuid not null,
+    bucket_start timestamptz not null,
+    bucket_seconds integer not null,
+    updates integer not null,
+    crowd_min smallint,
+    crowd_max smallint,
+    crowd_last text,
+    queue_min integer,
+    queue_max integer,
+    queue_last text,
+    importance_last text,
+    last_at timestamptz not null,
+    primary key (resource_id, bucket_start)
+);
+
+-- Compaction looks up a post's old rows and its latest one
+create index if not exists tweet_replies_resource_created_idx
+    on public.tweet_replies (resource_id, created_at, id);
+
+alter table public.tweet_replies_archive enable row level security;
+alter table public.status_rollups enable row level security;
+
+create policy "status rollups are readable by everyone"
+    on public.status_rollups for select using (true);
+-- Archived rows are listed on /comments like hot ones; only the server
+-- (service role key) writes the archive, like the rollups during compaction.
+create policy "archived status updates are readable by everyone"
+    on public.tweet_replies_archive for select using (true);
+
+-- Archived rows still count in a post's comments_count: post_counts of
+-- sql/feed_views.sql, redefined to add them. The rollups hold one row per
+-- post and hour with the number of updates archived in it, so their sum is
+-- a short primary-key range scan rather than a count over the archive.
+create or replace view public.post_counts with (security_invoker = true) as
+select t.id as resource_id,
+       (select count(*) from public.likes l where l.resource_id = t.id)::integer as upvotes_count,
+       ((select count(*) from public.tweet_replies r where r.resource_id = t.id)
+        + (select coalesce(sum(s.updates), 0) from public.status_rollups s where s.resource_id = t.id))::integer
+           as comments_count
+from public.tweets t;
@@ -0,0 +1,5 @@
+-- Resized WebP copies of a post's image, {"<width>": "<public url>"}
+-- (written by the image pipeline in uploads.py)
+alter table public.tweets add column if not exists image_variants jsonb not null default '{}'::jsonb;
+
+alter table if exists public.post_summaries add column if not exists image_variants jsonb not null default '{}'::jsonb;
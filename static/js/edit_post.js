@@ -0,0 +1,17 @@
+const deleteBtn = document.getElementById('deleteBtn');
+if (deleteBtn) {
+    deleteBtn.addEventListener('click', function () {
+        if (confirm('Are you sure you want to permanently delete this post? This cannot be undone.')) {
+            fetch('/delete_resource/' + encodeURIComponent(deleteBtn.dataset.resourceId), { method: 'POST' })
+                .then(r => r.json())
+                .then(data => {
+                    if (data.success) {
+                        window.location.href = '/';
+                    } else {
+                        alert(data.error || 'Failed to delete post');
+                    }
+                })
+                .catch(() => alert('Failed to delete post'));
+        }
+    });
+}
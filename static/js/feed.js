@@ -0,0 +1,91 @@
+function upvoteResource(resourceId, button) {
+    fetch('/upvote_resource', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ resource_id: resourceId })
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            const countSpan = button.querySelector('.count');
+            countSpan.textContent = data.upvotes_count;
+
+            if (data.action === 'upvoted') {
+                button.classList.add('upvoted');
+            } else {
+                button.classList.remove('upvoted');
+            }
+        }
+    });
+}
+
+// Infinite scroll: fetch the next page when the sentinel comes into view
+(function () {
+    const sentinel = document.getElementById('feed-sentinel');
+    if (!sentinel || !('IntersectionObserver' in window)) return;
+    const list = document.getElementById('post-list');
+    let loading = false;
+
+    const observer = new IntersectionObserver(entries => {
+        if (!entries[0].isIntersecting || loading) return;
+        const cursor = sentinel.dataset.nextCursor;
+        if (!cursor) return;
+        loading = true;
+        fetch('/feed?cursor=' + encodeURIComponent(cursor))
+            .then(response => response.json())
+            .then(data => {
+                if (!data.success) return;
+                list.insertAdjacentHTML('beforeend', data.html);
+                if (data.next_cursor) {
+                    sentinel.dataset.nextCursor = data.next_cursor;
+                } else {
+                    observer.disconnect();
+                    sentinel.remove();
+                }
+            })
+            .finally(() => { loading = false; });
+    }, { rootMargin: '400px' });
+    observer.observe(sentinel);
+})();
+
+// Live updates: patch or replace the matching card in place
+(function () {
+    if (!('EventSource' in window)) return;
+    const list = document.getElementById('post-list');
+    const searching = document.querySelector('.posts-container[data-searching]') !== null;
+    const source = new EventSource('/events');
+    const cardFor = id => document.querySelector('.post-card[data-resource-id="' + id + '"]');
+    const setCount = (card, selector, value) => {
+        const span = card && card.querySelector(selector + ' .count');
+        if (span && value !== undefined) span.textContent = value;
+    };
+    const loadCard = (id, place) => {
+        fetch('/post_card/' + encodeURIComponent(id))
+            .then(response => response.ok ? response.text() : null)
+            .then(html => { if (html) place(html); });
+    };
+
+    source.addEventListener('upvotes', e => {
+        const data = JSON.parse(e.data);
+        setCount(cardFor(data.id), '.upvote-btn', data.upvotes_count);
+    });
+    // status and comments change the latest update box as well as counts
+    ['status', 'comments', 'edited'].forEach(type => source.addEventListener(type, e => {
+        const data = JSON.parse(e.data);
+        const card = cardFor(data.id);
+        if (card) loadCard(data.id, html => { card.outerHTML = html; });
+    }));
+    // new posts go to the top of the feed, not into search results
+    source.addEventListener('created', e => {
+        const data = JSON.parse(e.data);
+        if (list && !searching && !cardFor(data.id)) {
+            loadCard(data.id, html => list.insertAdjacentHTML('afterbegin', html));
+        }
+    });
+    source.addEventListener('deleted', e => {
+        const card = cardFor(JSON.parse(e.data).id);
+        if (card) card.remove();
+    });
+})();
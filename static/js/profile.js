@@ -0,0 +1,9 @@
+function toggleEditForm() {
+    const editForm = document.getElementById('editForm');
+    if (editForm.style.display === 'none') {
+        editForm.style.display = 'block';
+        editForm.scrollIntoView({ behavior: 'smooth' });
+    } else {
+        editForm.style.display = 'none';
+    }
+}
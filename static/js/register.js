@@ -0,0 +1,27 @@
+// Show/hide role-specific fields
+document.getElementById('role').addEventListener('change', function() {
+    const role = this.value;
+    const studentFields = document.getElementById('student_fields');
+    const facultyFields = document.getElementById('faculty_fields');
+
+    // Hide all fields first
+    studentFields.style.display = 'none';
+    facultyFields.style.display = 'none';
+
+    // Show relevant fields
+    if (role === 'student') {
+        studentFields.style.display = 'block';
+        document.getElementById('student_id').required = true;
+        document.getElementById('faculty_id').required = false;
+        document.getElementById('department').required = false;
+    } else if (role === 'faculty') {
+        facultyFields.style.display = 'block';
+        document.getElementById('faculty_id').required = true;
+        document.getElementById('department').required = true;
+        document.getElementById('student_id').required = false;
+    } else {
+        document.getElementById('student_id').required = false;
+        document.getElementById('faculty_id').required = false;
+        document.getElementById('department').required = false;
+    }
+});
@@ -0,0 +1,129 @@
+# post_summaries holds one pre-joined feed post per tweet, indexed in feed
+# order (see sql/post_summaries.sql), so a feed page is one range scan.
+from datetime import datetime, timezone
+
+SUMMARY_TABLE = 'post_summaries'
+SUMMARY_COLUMNS = (
+    'id', 'name', 'content', 'image_url', 'image_variants', 'author_id', 'author_name', 'created_at',
+    'upvotes_count', 'comments_count', 'latest_status', 'importance', 'importance_rank',
+)
+FEED_ORDER = ('importance_rank', 'upvotes_count', 'created_at', 'id')
+
+
+def summary_row(post):
+    row = {column: post.get(column) for column in SUMMARY_COLUMNS}
+    row['updated_at'] = datetime.now(timezone.utc).isoformat()
+    return row
+
+
+def keyset_filter(key):
+    """PostgREST or=() filter for rows strictly after `key` in descending feed order."""
+    rank, upvotes, created_at, post_id = key
+    rank, upvotes = int(rank), int(upvotes)
+    return ','.join([
+        f'importance_rank.lt.{rank}',
+        f'and(importance_rank.eq.{rank},upvotes_count.lt.{upvotes})',
+        f'and(importance_rank.eq.{rank},upvotes_count.eq.{upvotes},created_at.lt."{created_at}")',
+        f'and(importance_rank.eq.{rank},upvotes_count.eq.{upvotes},created_at.eq."{created_at}",id.lt."{post_id}")',
+    ])
+
+
+def page_query(client, limit=None, after_key=None, table=SUMMARY_TABLE, columns='*'):
+    """Rows of `table` in descending feed order after `after_key`; also used
+    on the feed_ranking view of sql/feed_views.sql, which has the same order
+    columns."""
+    query = client.table(table).select(columns)
+    if after_key:
+        query = query.or_(keyset_filter(after_key))
+    for column in FEED_ORDER:
+        query = query.order(column, desc=True)
+    if limit:
+        query = query.limit(limit)
+    return query
+
+
+def upsert_summaries(client, posts, chunk=500):
+    rows = [summary_row(p) for p in posts]
+    for i in range(0, len(rows), chunk):
+        client.table(SUMMARY_TABLE).upsert(rows[i:i + chunk], on_conflict='id').execute()
+
+
+def delete_summary(client, resource_id):
+    client.table(SUMMARY_TABLE).delete().eq('id', resource_id).execute()
+
+
+def tweet_batches(client, batch_size):
+    """All tweets, oldest first, in keyset-paginated batches."""
+    last = None
+    while True:
+        query = client.table('tweets').select('*')
+        if last:
+            query = query.or_(f'created_at.gt."{last["created_at"]}",and(created_at.eq."{last["created_at"]}",id.gt."{last["id"]}")')
+        batch = query.order('created_at').order('id').limit(batch_size).execute().data or []
+        if not batch:
+            return
+        yield batch
+        last = batch[-1]
+        if len(batch) < batch_size:
+            return
+
+
+def rebuild_all(client, build_posts, batch_size=100):
+    """Backfill every summary row from the raw tables; returns the number written."""
+    written = 0
+    for tweets in tweet_batches(client, batch_size):
+        posts = build_posts(tweets)
+        upsert_summaries(client, posts)
+        written += len(posts)
+    return written
+
+
+def _normalize(column, value):
+    if column == 'created_at':
+        return str(value or '')
+    if column in ('upvotes_count', 'comments_count', 'importance_rank'):
+        return int(value or 0)
+    return value if value is not None else ''
+
+
+def check_all(client, build_posts, batch_size=100, fix=False):
+    """Compare stored summaries with a fresh build from the raw tables.
+
+    Returns {'checked', 'missing', 'stale', 'orphaned'} where the last three
+    are lists of post ids; with fix=True those rows are rewritten/removed.
+    """
+    report = {'checked': 0, 'missing': [], 'stale': [], 'orphaned': []}
+    tweet_ids = set()
+    for tweets in tweet_batches(client, batch_size):
+        ids = [t['id'] for t in tweets]
+        tweet_ids.update(ids)
+        stored = {r['id']: r for r in client.table(SUMMARY_TABLE).select('*').in_('id', ids).execute().data or []}
+        repair = []
+        for post in build_posts(tweets):
+            report['checked'] += 1
+            row = stored.get(post['id'])
+            if row is None:
+                report['missing'].append(post['id'])
+                repair.append(post)
+            elif any(_normalize(c, row.get(c)) != _normalize(c, post.get(c)) for c in SUMMARY_COLUMNS):
+                report['stale'].append(post['id'])
+                repair.append(post)
+        if fix and repair:
+            upsert_summaries(client, repair)
+
+    last_id = None
+    while True:
+        query = client.table(SUMMARY_TABLE).select('id')
+        if last_id:
+            query = query.gt('id', last_id)
+        rows = query.order('id').limit(batch_size).execute().data or []
+        for row in rows:
+            if row['id'] not in tweet_ids:
+                report['orphaned'].append(row['id'])
+        if len(rows) < batch_size:
+            break
+        last_id = rows[-1]['id']
+    if fix:
+        for resource_id in report['orphaned']:
+            delete_summary(client, resource_id)
+    return report
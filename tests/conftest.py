@@ -0,0 +1,39 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# The app reads its settings at import: run it on the local SQLite backend
+# (see localdb.py) with scratch directories for its files
+_scratch = tempfile.mkdtemp(prefix='morphx-tests-')
+os.environ.update({
+    'DATA_BACKEND_URL': 'sqlite://',
+    'SESSION_URL': 'memory://',
+    'JOB_OUTBOX_PATH': os.path.join(_scratch, 'jobs.sqlite3'),
+    'UPVOTE_JOURNAL_DIR': os.path.join(_scratch, 'journal'),
+    'IMAGE_STORAGE_URL': 'file://' + os.path.join(_scratch, 'images'),
+    'ASSET_BUILD_DIR': os.path.join(_scratch, 'assets'),
+    'RATE_LIMITS': '',
+})
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    return app_module
+
+
+@pytest.fixture
+def db(app):
+    """The local database, emptied, with the app's caches cleared."""
+    database = app.local_database()
+    for table in ('tweets', 'likes', 'tweet_replies', 'tweet_replies_archive', 'status_rollups', 'user_profiles',
+                  'post_summaries'):
+        database.execute(f'delete from {table}')
+    for cache in (app.feed_cache, app.delete_marks, app.post_versions, app.card_cache, app.profile_cache.cache,
+                  app.ingest_watermarks):
+        cache.clear()
+    return database
@@ -0,0 +1,32 @@
+import gzip
+import os
+
+import pytest
+
+import assets
+
+
+def build(tmp_path):
+    source = tmp_path / 'static'
+    (source / 'js').mkdir(parents=True)
+    (source / 'js' / 'feed.js').write_text('function  load() {\n  // next page\n  return 1;\n}\n')
+    pipeline = assets.AssetPipeline(str(source), str(tmp_path / 'build'))
+    return pipeline, pipeline.built_name('js/feed.js')
+
+
+def test_assets_are_fingerprinted_and_precompressed(tmp_path):
+    pipeline, built = build(tmp_path)
+    assert built.startswith('js/feed.') and built != 'js/feed.js'
+    path = os.path.join(pipeline.build_dir, built)
+    with open(path + '.gz', 'rb') as f, open(path, 'rb') as original:
+        assert gzip.decompress(f.read()) == original.read()
+    assert pipeline.encodings(built)[-1] == 'gzip'
+
+
+def test_brotli_copies_are_built_and_preferred(tmp_path):
+    brotli = pytest.importorskip('brotli')
+    pipeline, built = build(tmp_path)
+    path = os.path.join(pipeline.build_dir, built)
+    with open(path + '.br', 'rb') as f, open(path, 'rb') as original:
+        assert brotli.decompress(f.read()) == original.read()
+    assert pipeline.encodings(built) == ['br', 'gzip']
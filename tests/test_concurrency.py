@@ -0,0 +1,38 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.stub_server import BENCH_JWT_SECRET, bench_token, start_stub
+
+USERS = 20
+REQUESTS_PER_USER = 5
+
+
+def test_concurrent_users_only_get_their_own_rows(app, monkeypatch):
+    """Per-request clients over the shared pool never answer with another
+    user's token (the stub hides other authors' rows like RLS)."""
+    users = [f'user{i}' for i in range(USERS)]
+    tables = {'tweets': [{'id': f'p{i}', 'name': f'post-of-{user}', 'content': '', 'author_id': user,
+                          'created_at': '2025-01-01T00:00:00+00:00'} for i, user in enumerate(users)]}
+    url, _, server = start_stub(0.002, tables)
+    monkeypatch.setattr(app.Config, 'DATA_BACKEND_URL', '')
+    monkeypatch.setattr(app.Config, 'SUPABASE_URL', url)
+    monkeypatch.setattr(app.Config, 'SUPABASE_JWT_SECRET', BENCH_JWT_SECRET)
+    flask_app = app.create_app()
+
+    def wrong_user_responses(user):
+        client = flask_app.test_client()
+        with client.session_transaction() as s:
+            s.update(username=f'{user}@campus.edu', user_id=user, user_role='student',
+                     sb_access=bench_token(user), sb_refresh='r', sb_expires_at=time.time() + 3600)
+        wrong = 0
+        for _ in range(REQUESTS_PER_USER):
+            body = client.get('/profile').get_data(as_text=True)
+            if f'post-of-{user}<' not in body or body.count('post-of-') != 1:
+                wrong += 1
+        return wrong
+
+    try:
+        with ThreadPoolExecutor(max_workers=USERS) as pool:
+            assert sum(pool.map(wrong_user_responses, users)) == 0
+    finally:
+        server.shutdown()
@@ -0,0 +1,105 @@
+import html
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+import pytest
+
+from localdb import LocalAuth
+
+NOW = datetime(2025, 3, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def signed_in_client(app, db):
+    user_id = str(uuid4())
+    tokens = LocalAuth(db)._session(user_id, 'alice@campus.edu').session
+    client = app.create_app().test_client()
+    with client.session_transaction() as s:
+        s.update(username='alice@campus.edu', user_id=user_id, user_role='student', sb_access=tokens.access_token,
+                 sb_refresh=tokens.refresh_token, sb_expires_at=tokens.expires_at,
+                 sb_refresh_at=time.time() + 3600)
+    return client, user_id
+
+
+def follow(client, url, pattern):
+    """Texts matching `pattern` on every page, following the "Older" links."""
+    found = []
+    while url:
+        page = client.get(url)
+        assert page.status_code == 200
+        text = page.get_data(as_text=True)
+        found.extend(re.findall(pattern, text))
+        link = re.search(r'href="([^"]*cursor=[^"]*)"', text)
+        url = html.unescape(link.group(1)) if link else None
+    return found
+
+
+def test_profile_and_comments_page_through_everything(app, db):
+    client, user_id = signed_in_client(app, db)
+    # equal times: the id decides
+    tweets = [{'id': str(uuid4()), 'name': f'Post {i:02}', 'content': '', 'author_id': user_id,
+               'created_at': (NOW - timedelta(minutes=i // 2)).isoformat()} for i in range(7)]
+    db.bulk_insert('tweets', tweets)
+    db.bulk_insert('tweet_replies', [{'id': str(uuid4()), 'resource_id': tweets[0]['id'], 'status_message': f'Note {i:02}',
+                                      'created_at': (NOW + timedelta(minutes=i // 3)).isoformat()} for i in range(8)])
+
+    assert sorted(follow(client, '/profile?limit=2', r'Post \d\d')) == [f'Post {i:02}' for i in range(7)]
+    notes = follow(client, f"/comments/{tweets[0]['id']}?limit=3", r'Note \d\d')
+    assert sorted(notes) == [f'Note {i:02}' for i in range(8)]
+
+
+@pytest.mark.parametrize('cursor', [
+    'garbage',
+    '2025-03-01T12:00:00+00:00|p1',
+    '2025-03-01T12:00:00+00:00|' + str(uuid4()) + '",id.neq."0',
+    '2025-03-01"),created_at.gt.("|' + str(uuid4()),
+    '2025-02-30T12:00:00+00:00|' + str(uuid4()),
+    '2025-03-01T12:00:00,5|' + str(uuid4()),
+])
+def test_malformed_keyset_cursors_are_rejected(app, db, cursor):
+    client, _ = signed_in_client(app, db)
+    assert client.get('/profile', query_string={'cursor': cursor}).status_code == 400
+    assert client.get(f'/comments/{uuid4()}', query_string={'cursor': cursor}).status_code == 400
+
+
+def test_malformed_feed_cursors_are_rejected(app, db):
+    client = app.create_app().test_client()
+    post_id = str(uuid4())
+    good = app.encode_cursor([0, 0, NOW.isoformat(), post_id])
+    assert client.get('/feed', query_string={'cursor': good}).status_code == 200
+    for key in ([0, 0, NOW.isoformat() + '")', post_id], [0, '0', NOW.isoformat(), post_id],
+                [True, 0, NOW.isoformat(), post_id], [0, 0, NOW.isoformat(), 'p1),id.gt.(x']):
+        assert client.get('/feed', query_string={'cursor': app.encode_cursor(key)}).status_code == 400
+    assert client.get('/feed', query_string={'cursor': '!!'}).status_code == 400
+
+
+def test_feed_ranks_follow_likes_and_statuses(app, db):
+    tweets = [{'id': str(uuid4()), 'name': name, 'content': '', 'author_id': 'a',
+               'created_at': (NOW - timedelta(minutes=i)).isoformat()} for i, name in enumerate(('new', 'old'))]
+    db.bulk_insert('tweets', tweets)
+    new, old = (t['id'] for t in tweets)
+
+    def ranking():
+        rows = db.execute('select id, upvotes_count, importance_rank from feed_ranking'
+                          ' order by importance_rank desc, upvotes_count desc, created_at desc, id desc')
+        return [(row['id'], row['upvotes_count'], row['importance_rank']) for row in rows]
+
+    assert ranking() == [(new, 0, 0), (old, 0, 0)]
+    db.bulk_insert('likes', [{'id': str(uuid4()), 'resource_id': old, 'user_id': u, 'like_type': 'upvote'}
+                             for u in ('u1', 'u2')])
+    db.execute("delete from likes where user_id = 'u2'")
+    assert ranking() == [(old, 1, 0), (new, 0, 0)]
+
+    status = {'id': str(uuid4()), 'resource_id': new, 'chips_available': 'Critical', 'created_at': NOW.isoformat()}
+    db.bulk_insert('tweet_replies', [status])
+    assert ranking() == [(new, 0, 4), (old, 1, 0)]
+    # a newer update without importance resets it, deleting that one restores it
+    later = dict(status, id=str(uuid4()), chips_available='', created_at=(NOW + timedelta(minutes=1)).isoformat())
+    db.bulk_insert('tweet_replies', [later])
+    assert ranking()[1] == (new, 0, 0)
+    db.execute('delete from tweet_replies where id = ?', (later['id'],))
+    assert ranking()[0] == (new, 0, 4)
+
+    db.execute('delete from tweets where id = ?', (new,))
+    assert ranking() == [(old, 1, 0)]
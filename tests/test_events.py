@@ -0,0 +1,14 @@
+def test_events_streams_beyond_the_limit_get_204(app, monkeypatch):
+    monkeypatch.setattr(app.Config, 'SSE_MAX_STREAMS', 1)
+    client = app.create_app().test_client()
+
+    first = client.get('/events', buffered=False)
+    assert first.status_code == 200
+    assert client.get('/events', buffered=False).status_code == 204
+    # a page that can't stream still loads
+    assert client.get('/about').status_code == 200
+
+    first.close()
+    again = client.get('/events', buffered=False)
+    assert again.status_code == 200
+    again.close()
@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+
+def seed(db, posts, likes_per_post, replies_per_post):
+    """`posts` posts by one author; returns their tweet rows, newest first."""
+    now = datetime.now(timezone.utc)
+    author = str(uuid4())
+    db.bulk_insert('user_profiles', [{'user_id': author, 'email': 'author@campus.edu', 'full_name': 'Author'}])
+    tweets = [{'id': str(uuid4()), 'name': f'Resource {i}', 'content': '', 'author_id': author,
+               'created_at': (now - timedelta(minutes=i)).isoformat()} for i in range(posts)]
+    db.bulk_insert('tweets', tweets)
+    db.bulk_insert('likes', [{'resource_id': t['id'], 'user_id': str(uuid4()), 'like_type': 'upvote'}
+                             for t in tweets for _ in range(likes_per_post)])
+    db.bulk_insert('tweet_replies', [{'resource_id': t['id'], 'status_message': f'update {j}',
+                                      'chips_available': 'high' if j == replies_per_post - 1 else 'low',
+                                      'created_at': (now + timedelta(seconds=j)).isoformat()}
+                                     for t in tweets for j in range(replies_per_post)])
+    return tweets
+
+
+def build_calls(app, db, tweets):
+    before = db.call_count
+    posts = app.build_posts(tweets)
+    return posts, db.call_count - before
+
+
+def test_build_posts_calls_do_not_grow_with_likes_and_replies(app, db):
+    quiet = seed(db, app.FEED_PAGE_SIZE, likes_per_post=1, replies_per_post=1)
+    _, quiet_calls = build_calls(app, db, quiet)
+
+    app.profile_cache.cache.clear()
+    # more likes and replies per post than one page of rows
+    busy = seed(db, app.FEED_PAGE_SIZE, likes_per_post=120, replies_per_post=60)
+    posts, busy_calls = build_calls(app, db, busy)
+
+    assert busy_calls == quiet_calls == 3
+    for post in posts:
+        assert post['upvotes_count'] == 120
+        assert post['comments_count'] == 60
+        assert post['latest_status']['status_message'] == 'update 59'
+        assert post['importance'] == 'high'
+
+
+def page_calls(app, db, client):
+    before = db.call_count
+    assert client.get('/').status_code == 200
+    return db.call_count - before
+
+
+def test_cold_feed_page_calls_do_not_grow_with_the_feed(app, db):
+    client = app.create_app().test_client()
+    seed(db, 30, likes_per_post=1, replies_per_post=1)
+    small = page_calls(app, db, client)
+
+    for cache in (app.feed_cache, app.post_versions, app.card_cache, app.profile_cache.cache):
+        cache.clear()
+    # past PostgREST's 1000-row cap
+    seed(db, 1200, likes_per_post=1, replies_per_post=1)
+    large = page_calls(app, db, client)
+
+    assert large == small
+    assert large <= 6
+
+
+def test_writes_patch_the_cached_order(app, db):
+    tweets = seed(db, 50, likes_per_post=0, replies_per_post=1)
+    order = app.feed_order()
+    last = order[0][-1]
+    assert last == tweets[-1]['id']
+
+    # an upvote moves the post to the top, building only that post
+    before = db.call_count
+    app.patch_cached_post(last, upvotes_count=1)
+    assert db.call_count - before <= 4
+    assert app.feed_cache.get('order')[-1][-1] == last
+
+    # a new critical status rebuilds only that post
+    first = tweets[0]['id']
+    db.bulk_insert('tweet_replies', [{'resource_id': tweets[5]['id'], 'chips_available': 'critical'}])
+    before = db.call_count
+    app.invalidate_post(tweets[5]['id'])
+    assert db.call_count - before <= 4
+    order = app.feed_cache.get('order')
+    assert [key[-1] for key in order[-2:]] == [last, tweets[5]['id']]
+    assert len(order) == 50
+
+    # a deleted post drops out
+    db.execute('delete from tweets where id = ?', (first,))
+    app.invalidate_post(first, membership_changed=True)
+    assert first not in [key[-1] for key in app.feed_cache.get('order')]
+
+
+def test_feed_pages_cover_the_feed_once(app, db):
+    tweets = seed(db, 45, likes_per_post=0, replies_per_post=1)
+    seen, cursor = [], None
+    with app.create_app().test_request_context():
+        while True:
+            posts, cursor = app.fetch_feed_page(20, cursor)
+            seen.extend(p['id'] for p in posts)
+            if cursor is None:
+                break
+    assert seen == [t['id'] for t in tweets]
@@ -0,0 +1,96 @@
+import json
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+import pytest
+
+import ingest
+
+NOW = datetime(2025, 3, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def test_batches_are_read_from_json_and_ndjson():
+    assert ingest.parse_batch(b'[{"a": 1}, {"a": 2}]', 'application/json') == [{'a': 1}, {'a': 2}]
+    assert ingest.parse_batch(b'{"updates": [{"a": 1}]}', 'application/json') == [{'a': 1}]
+    assert ingest.parse_batch(b'{"a": 1}', 'application/json') == [{'a': 1}]
+
+    items = ingest.parse_batch(b'{"a": 1}\n\nnot json\n{"a": 2}\n', 'application/x-ndjson')
+    assert items[0] == {'a': 1} and items[2] == {'a': 2}
+    assert str(items[1]) == 'Line 3 is not valid JSON'
+
+    for body in (b'[{"a": 1}', b'"text"', b'\xff'):
+        with pytest.raises(ingest.IngestError):
+            ingest.parse_batch(body, 'application/json')
+
+
+def test_readings_are_normalized():
+    reading = ingest.validate({'resource_id': 'r1', 'crowd_level': ' VERY high', 'importance': 'critical',
+                               'queue_length': 12, 'status_message': ' open ', 'observed_at': '2025-03-01T11:00:00Z'},
+                              NOW, 300)
+    assert reading == {'resource_id': 'r1', 'status_message': 'open', 'crowd_level': 'Very High',
+                       'chips_available': 'Critical', 'queue_length': '12',
+                       'observed_at': NOW - timedelta(hours=1)}
+    assert ingest.validate({'resource_id': 'r1', 'queue_length': 'short'}, NOW, 300)['observed_at'] == NOW
+    assert ingest.validate({'resource_id': 'r1', 'crowd_level': 'low', 'observed_at': NOW.timestamp() - 60},
+                           NOW, 300)['observed_at'] == NOW - timedelta(minutes=1)
+
+
+@pytest.mark.parametrize('item, error', [
+    ('r1', 'must be an object'),
+    ({'crowd_level': 'low'}, 'resource_id is required'),
+    ({'resource_id': 'r1', 'crowd_level': 'packed'}, 'crowd_level must be one of'),
+    ({'resource_id': 'r1', 'queue_length': -1}, 'must not be negative'),
+    ({'resource_id': 'r1', 'queue_length': True}, 'queue_length must be'),
+    ({'resource_id': 'r1', 'status_message': 'x' * 501}, 'status_message must be'),
+    ({'resource_id': 'r1', 'crowd_level': 'low', 'observed_at': 'yesterday'}, 'observed_at must be'),
+    ({'resource_id': 'r1', 'crowd_level': 'low', 'observed_at': '2025-03-01T12:10:00Z'}, 'in the future'),
+    ({'resource_id': 'r1'}, 'Nothing to update'),
+])
+def test_invalid_readings_are_rejected(item, error):
+    with pytest.raises(ValueError, match=error):
+        ingest.validate(item, NOW, 300)
+
+
+def test_newest_reading_per_resource_wins():
+    items = [
+        {'resource_id': 'r1', 'crowd_level': 'low', 'observed_at': '2025-03-01T11:00:00Z'},
+        {'resource_id': 'r1', 'crowd_level': 'high', 'observed_at': '2025-03-01T10:00:00Z'},
+        ValueError('Line 3 is not valid JSON'),
+        {'resource_id': 'r2', 'crowd_level': 'low', 'observed_at': '2025-03-01T11:00:00Z'},
+        {'resource_id': 'r2', 'crowd_level': 'medium', 'observed_at': '2025-03-01T11:00:00Z'},
+        {'resource_id': 'r1'},
+    ]
+    results, latest = ingest.latest_readings(items, NOW, 300)
+
+    # survivors are settled by the route, once it has checked them
+    assert [r.get('status') for r in results] == [None, 'superseded', 'invalid', 'superseded', None, 'invalid']
+    assert {rid: index for rid, (index, _) in latest.items()} == {'r1': 0, 'r2': 4}
+    assert latest['r2'][1]['crowd_level'] == 'Medium'
+
+
+def test_route_drops_readings_older_than_the_last_ingested(app, db, monkeypatch):
+    monkeypatch.setattr(app.Config, 'INGEST_KEYS', {'kiosk-key': 'kiosk'})
+    resource_id = str(uuid4())
+    db.bulk_insert('tweets', [{'id': resource_id, 'name': 'Library', 'content': '', 'author_id': 'kiosk',
+                               'created_at': '2025-01-01T00:00:00+00:00'}])
+    client = app.create_app().test_client()
+    now = datetime.now(timezone.utc)
+
+    def post(*updates):
+        response = client.post('/api/status_updates', data=json.dumps(list(updates)),
+                               content_type='application/json', headers={'Authorization': 'Bearer kiosk-key'})
+        return response.status_code, [r['status'] for r in response.get_json()['results']]
+
+    def reading(minutes_ago, level, rid=resource_id):
+        return {'resource_id': rid, 'crowd_level': level,
+                'observed_at': (now - timedelta(minutes=minutes_ago)).isoformat()}
+
+    assert post(reading(5, 'low'), reading(10, 'high'), reading(1, 'low', 'missing')) == \
+        (200, ['accepted', 'superseded', 'invalid'])
+    assert post(reading(7, 'high')) == (200, ['stale'])
+    assert post(reading(2, 'medium')) == (200, ['accepted'])
+
+    rows = db.execute('select crowd_level from tweet_replies where resource_id = ? order by created_at',
+                      (resource_id,))
+    assert [row['crowd_level'] for row in rows] == ['Low', 'Medium']
+    assert client.post('/api/status_updates', json=[reading(1, 'low')]).status_code == 401
@@ -0,0 +1,45 @@
+import logging
+import time
+import types
+
+import instrumentation
+
+
+def test_metrics_need_the_token(app, monkeypatch):
+    client = app.create_app().test_client()
+    monkeypatch.setattr(app.Config, 'METRICS_TOKEN', '')
+    assert client.get('/metrics').status_code == 404
+
+    monkeypatch.setattr(app.Config, 'METRICS_TOKEN', 'scrape-token')
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    response = client.get('/metrics', headers={'Authorization': 'Bearer scrape-token'})
+    assert response.status_code == 200
+    assert 'morphx_http_request_duration_seconds' in response.text
+
+
+def test_n_plus_one_warnings_are_rate_limited(app, monkeypatch, caplog):
+    flask_app = app.create_app()
+
+    @flask_app.route('/_test/n-plus-one')
+    def n_plus_one():
+        for _ in range(app.Config.N_PLUS_ONE_THRESHOLD + 1):
+            instrumentation.record_call('table', 'likes', 'select eq:resource_id', 0.0)
+        return ''
+
+    now = [1000.0]
+    monkeypatch.setattr(instrumentation, 'time', types.SimpleNamespace(
+        monotonic=lambda: now[0], perf_counter=time.perf_counter, time=time.time))
+    client = flask_app.test_client()
+    with caplog.at_level(logging.WARNING):
+        for _ in range(3):
+            client.get('/_test/n-plus-one')
+        now[0] += instrumentation.N_PLUS_ONE_LOG_INTERVAL
+        client.get('/_test/n-plus-one')
+
+    warnings = [r.getMessage() for r in caplog.records if 'N+1' in r.getMessage()]
+    assert warnings == [
+        'Possible N+1 in GET /_test/n-plus-one: 11 x table likes: select eq:resource_id',
+        'Possible N+1 in GET /_test/n-plus-one: 11 x table likes: select eq:resource_id'
+        ' (and 2 more since the last warning)',
+    ]
@@ -0,0 +1,92 @@
+import time
+
+from jobs import JobQueue
+
+
+def make_queue(tmp_path, **options):
+    options.setdefault('base_delay', 0.01)
+    options.setdefault('poll_interval', 0.01)
+    return JobQueue(str(tmp_path / 'jobs.sqlite3'), **options)
+
+
+def test_dead_job_runs_again_when_enqueued_again(tmp_path):
+    jobs = make_queue(tmp_path, max_attempts=1)
+    runs, dead = [], []
+
+    @jobs.handler('flaky')
+    def flaky(payload):
+        runs.append(payload)
+        if len(runs) == 1:
+            raise RuntimeError('backend down')
+
+    jobs.on_dead('flaky')(lambda payload, error: dead.append(error))
+
+    first = jobs.enqueue('flaky', {'n': 1}, key='delete:post')
+    assert jobs.drain()
+    assert jobs.depth()['dead'] == 1
+    assert dead == ['RuntimeError: backend down']
+
+    # the user tries again: the dead job is queued with the new payload
+    assert jobs.enqueue('flaky', {'n': 2}, key='delete:post') == first
+    assert jobs.drain()
+    assert runs == [{'n': 1}, {'n': 2}]
+    assert jobs.depth()['done'] == 1
+
+
+def test_backoff_doubles_up_to_the_cap(tmp_path):
+    jobs = make_queue(tmp_path, base_delay=2.0, max_delay=10.0)
+    for attempts, full in ((1, 2.0), (2, 4.0), (3, 8.0), (4, 10.0), (9, 10.0)):
+        assert full * 0.5 <= jobs.backoff(attempts) <= full
+
+
+def test_same_key_runs_once(tmp_path):
+    jobs = make_queue(tmp_path)
+    runs = []
+    jobs.handler('notify')(runs.append)
+
+    first = jobs.enqueue('notify', {'n': 1}, key='notify:post1')
+    assert jobs.enqueue('notify', {'n': 2}, key='notify:post1') == first
+    assert jobs.drain()
+    assert jobs.enqueue('notify', {'n': 3}, key='notify:post1') == first
+    assert jobs.drain()
+    assert runs == [{'n': 1}]
+
+
+def test_failing_job_is_retried_then_dead_lettered(tmp_path):
+    jobs = make_queue(tmp_path, max_attempts=3, base_delay=0.001)
+    runs, dead = [], []
+
+    @jobs.handler('broken')
+    def broken(payload):
+        runs.append(payload)
+        raise ValueError('bad payload')
+
+    jobs.on_dead('broken')(lambda payload, error: dead.append((payload, error)))
+    jobs.enqueue('broken', {'n': 1})
+    assert jobs.drain()
+
+    assert len(runs) == 3
+    assert dead == [({'n': 1}, 'ValueError: bad payload')]
+    [row] = jobs.dead()
+    assert row['attempts'] == 3 and row['last_error'] == 'ValueError: bad payload'
+    assert jobs.retry() == 1
+    assert jobs.drain()
+    assert len(runs) == 6
+
+
+def test_job_of_a_dead_process_is_claimed_after_its_lease(tmp_path):
+    jobs = make_queue(tmp_path, lease=60)
+    runs = []
+    jobs.handler('notify')(runs.append)
+    now = time.time()
+    # claimed by a process that died: its lease has not run out yet
+    jobs._execute("insert into jobs (kind, payload, state, attempts, run_at, locked_until, created_at)"
+                  " values ('notify', '{\"n\": 1}', 'running', 1, ?, ?, ?)", (now, now + 60, now))
+    jobs.start()
+    assert not jobs.drain(timeout=0.1)
+    assert runs == []
+
+    jobs._execute("update jobs set locked_until = ?", (now - 1,))
+    assert jobs.drain()
+    assert runs == [{'n': 1}]
+    assert jobs.depth()['done'] == 1
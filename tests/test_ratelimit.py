@@ -0,0 +1,81 @@
+import threading
+import types
+
+import pytest
+
+import ratelimit
+from ratelimit import MemoryBuckets, MemoryCoalescer, RateLimiter
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ratelimit, 'time', types.SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def test_bucket_allows_a_burst_then_refills(clock):
+    limiter = RateLimiter(MemoryBuckets(), {'comment': (3, 60)})
+    assert [limiter.check('comment', 'alice') for _ in range(3)] == [None, None, None]
+    assert limiter.check('comment', 'alice') == 20
+    # other callers and endpoints have their own buckets
+    assert limiter.check('comment', 'bob') is None
+    assert limiter.check('upvote', 'alice') is None
+
+    clock[0] += 15
+    assert limiter.check('comment', 'alice') == 5
+    clock[0] += 5
+    assert limiter.check('comment', 'alice') is None
+    clock[0] += 3600
+    assert [limiter.check('comment', 'alice') for _ in range(4)] == [None, None, None, 20]
+
+
+def test_limiter_lets_requests_through_when_the_store_fails():
+    class Broken:
+        def take(self, *args):
+            raise ConnectionError('redis down')
+
+    assert RateLimiter(Broken(), {'comment': (1, 60)}).check('comment', 'alice') is None
+
+
+def test_identical_requests_in_flight_share_one_run():
+    coalescer = MemoryCoalescer(window=0)
+    started, release, calls = threading.Event(), threading.Event(), []
+
+    def post_comment():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return {'id': 'c1'}
+
+    results = []
+    first = threading.Thread(target=lambda: results.append(coalescer.run('alice:post1:hi', post_comment)))
+    first.start()
+    started.wait(5)
+    second = threading.Thread(target=lambda: results.append(coalescer.run('alice:post1:hi', post_comment)))
+    second.start()
+    second.join(0.1)
+    release.set()
+    first.join(5)
+    second.join(5)
+
+    assert calls == [1]
+    assert results == [{'id': 'c1'}, {'id': 'c1'}]
+    # with no window, a later request runs again
+    assert coalescer.run('alice:post1:hi', lambda: 'again') == 'again'
+
+
+def test_result_is_shared_within_the_window_but_errors_are_not_kept(clock):
+    coalescer = MemoryCoalescer(window=1.0)
+    assert coalescer.run('k', lambda: 'first') == 'first'
+    clock[0] += 0.5
+    assert coalescer.run('k', lambda: 'second') == 'first'
+    clock[0] += 1
+    assert coalescer.run('k', lambda: 'third') == 'third'
+
+    def fail():
+        raise RuntimeError('backend down')
+
+    with pytest.raises(RuntimeError):
+        coalescer.run('broken', fail)
+    assert coalescer.run('broken', lambda: 'retried') == 'retried'
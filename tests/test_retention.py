@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+import pytest
+
+import retention
+
+HOUR = datetime(2025, 3, 1, 9, 0, tzinfo=timezone.utc)
+
+
+def status(minutes, crowd='', queue='', importance='', resource_id='r1', message=''):
+    return {'id': str(uuid4()), 'resource_id': resource_id, 'status_message': message, 'crowd_level': crowd,
+            'queue_length': queue, 'chips_available': importance, 'user_id': None,
+            'created_at': (HOUR + timedelta(minutes=minutes)).isoformat()}
+
+
+def test_rollup_keeps_min_max_and_last_per_bucket():
+    rows = [status(50, crowd='High', queue='7'), status(10, crowd='Low', queue='12', importance='High'),
+            status(30, queue='long'), status(70, crowd='Medium', resource_id='r2'), status(65, crowd='Very High')]
+    buckets = {(b['resource_id'], b['bucket_start']): b for b in retention.rollup(rows, 3600)}
+
+    nine = buckets[('r1', HOUR.isoformat())]
+    assert nine['updates'] == 3
+    assert (nine['crowd_min'], nine['crowd_max'], nine['crowd_last']) == (1, 3, 'High')
+    # labels are kept as the last queue but are not numbers
+    assert (nine['queue_min'], nine['queue_max'], nine['queue_last']) == (7, 12, '7')
+    assert nine['importance_last'] == 'High'
+    assert nine['last_at'] == rows[0]['created_at']
+    assert buckets[('r1', (HOUR + timedelta(hours=1)).isoformat())]['crowd_last'] == 'Very High'
+    assert buckets[('r2', (HOUR + timedelta(hours=1)).isoformat())]['updates'] == 1
+
+
+def test_archived_and_hot_parts_of_a_bucket_merge():
+    archived = retention.rollup([status(5, crowd='High', queue='3'), status(20, crowd='Medium')], 3600)
+    hot = retention.rollup([status(40, crowd='Low', queue='9'), status(80, crowd='Low')], 3600)
+    # a rollup row read back from Postgres has its own timestamp format
+    archived[0]['bucket_start'] = archived[0]['bucket_start'].replace('+00:00', 'Z')
+
+    first, second = retention.merge(hot + archived)
+    assert first['updates'] == 3
+    assert (first['crowd_min'], first['crowd_max'], first['crowd_last']) == (1, 3, 'Low')
+    assert (first['queue_min'], first['queue_max'], first['queue_last']) == (3, 9, '9')
+    assert second['updates'] == 1
+
+
+def seed(db, resource_id, rows):
+    db.bulk_insert('tweets', [{'id': resource_id, 'name': 'Library', 'content': '', 'author_id': 'a',
+                               'created_at': HOUR.isoformat()}])
+    db.bulk_insert('tweet_replies', [dict(row, resource_id=resource_id) for row in rows])
+
+
+def counts(app, resource_id):
+    row = app.make_client().table('post_counts').select('*').eq('resource_id', resource_id).execute().data[0]
+    return row['comments_count']
+
+
+def test_compaction_archives_old_statuses_and_history_merges_them(app, db):
+    resource_id = str(uuid4())
+    old = [status(5, crowd='High'), status(15, crowd='Low', queue='4'), status(25, message='a comment'),
+           status(75, crowd='Medium')]
+    recent = [status(24 * 60 + m, crowd=c) for m, c in ((10, 'Low'), (20, 'Very High'))]
+    seed(db, resource_id, old + recent)
+    client = app.make_client()
+    cutoff = (HOUR + timedelta(hours=12)).isoformat()
+
+    after, touched, done = retention.compact_step(client, cutoff, max_rows=2)
+    assert (touched, done) == ([resource_id], False)
+    after, touched, done = retention.compact_step(client, cutoff, after)
+    assert (touched, done) == ([resource_id], True)
+    assert retention.compact_step(client, cutoff, after)[1:] == ([], True)
+
+    hot = {row['id'] for row in db.execute('select id from tweet_replies')}
+    # comments and the latest status stay hot
+    assert hot == {old[2]['id'], recent[0]['id'], recent[1]['id']}
+    assert db.execute('select count(*) as n from tweet_replies_archive')[0]['n'] == 3
+    assert counts(app, resource_id) == 6
+
+    buckets = retention.history(client, resource_id, HOUR.isoformat())
+    # read in pages, so PostgREST's max-rows can't cut the history short
+    assert retention.history(client, resource_id, HOUR.isoformat(), page_rows=1) == buckets
+    assert [(b['updates'], b['crowd_min'], b['crowd_max'], b['crowd_last']) for b in buckets] == [
+        (2, 1, 3, 'Low'), (1, 2, 2, 'Medium'), (2, 1, 4, 'Very High')]
+    assert [b['updates'] for b in retention.history(client, resource_id, (HOUR + timedelta(hours=1)).isoformat())] \
+        == [1, 2]
+
+
+def test_retention_needs_the_service_key(app, monkeypatch):
+    monkeypatch.setattr(app.Config, 'STATUS_HOT_DAYS', 14)
+    monkeypatch.setattr(app.Config, 'DATA_BACKEND_URL', '')
+    monkeypatch.setattr(app.Config, 'SUPABASE_SERVICE_KEY', '')
+    with pytest.raises(RuntimeError, match='STATUS_HOT_DAYS'):
+        app.create_app()
+    monkeypatch.setattr(app.Config, 'SUPABASE_SERVICE_KEY', 'service-key')
+    app.create_app()
@@ -0,0 +1,125 @@
+import threading
+import time
+
+import pytest
+
+from events import EventBus
+from search import InvertedIndex, MemorySearch, tokenize
+
+
+def ids(hits):
+    return [post_id for post_id, _ in hits]
+
+
+def test_words_are_folded():
+    assert tokenize('Café RÉSUMÉ, room-101') == ['cafe', 'resume', 'room', '101']
+
+
+def test_put_replaces_and_remove_drops_a_post():
+    index = InvertedIndex()
+    index.put('p1', 'Library', 'quiet study rooms', ['crowded'])
+    index.put('p2', 'Gym', 'weights', [])
+    assert ids(index.search('library', 10)) == ['p1']
+    assert ids(index.search('crowded study', 10)) == ['p1']
+
+    index.put('p1', 'Cafeteria', 'lunch', [])
+    assert index.search('library', 10) == []
+    assert ids(index.search('lunch', 10)) == ['p1']
+
+    index.remove('p1')
+    assert index.search('lunch', 10) == []
+    assert len(index) == 1
+    # every posting of the removed post is gone
+    assert not index._postings.get('cafeteria') and 'lunch' not in index._vocabulary
+
+
+def test_prefixes_match_below_whole_words():
+    index = InvertedIndex(max_expansions=3)
+    index.load([('p1', 'Lab', '', []), ('p2', 'Labs', '', []), ('p3', 'Laboratory', '', []),
+                ('p4', 'Lake', '', [])])
+    assert ids(index.search('lab', 10))[0] == 'p1'
+    assert sorted(ids(index.search('lab', 10))) == ['p1', 'p2', 'p3']
+    # at most max_expansions terms per word, the word itself included
+    index.put('p5', 'Labels', '', [])
+    assert sorted(ids(index.search('lab', 10))) == ['p1', 'p3', 'p5']
+    assert index.search('l', 10) == []
+    assert ids(index.search('lak', 10)) == ['p4']
+
+
+def test_names_weigh_more_than_statuses():
+    index = InvertedIndex()
+    index.load([('status', 'Gym', '', ['printer jammed']), ('name', 'Printer', '', [])])
+    assert ids(index.search('printer', 10)) == ['name', 'status']
+    assert ids(index.search('printer', 1)) == ['name']
+
+
+def make_search(documents, gate=None, **options):
+    loads = []
+
+    def load_documents(post_ids):
+        if post_ids is None and gate is not None:
+            gate.wait(5)
+        loads.append(post_ids)
+        wanted = documents if post_ids is None else [i for i in post_ids if i in documents]
+        return [(post_id,) + documents[post_id] for post_id in wanted]
+
+    events = EventBus()
+    options.setdefault('check_interval', 0.01)
+    return MemorySearch(load_documents, events, **options), events, loads
+
+
+def wait_for(predicate):
+    deadline = time.monotonic() + 5
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_index_follows_post_events():
+    documents = {'p1': ('Library', '', []), 'p2': ('Gym', '', [])}
+    search, events, loads = make_search(documents)
+    assert ids(search.search('library', 10)) == ['p1']
+
+    documents['p2'] = ('Gym', '', ['library card needed'])
+    events.publish({'type': 'status', 'id': 'p2'})
+    del documents['p1']
+    events.publish({'type': 'deleted', 'id': 'p1'})
+    events.publish({'type': 'upvote', 'id': 'p3'})
+
+    assert ids(search.search('library', 10)) == ['p2']
+    assert loads[0] is None and sorted(loads[1]) == ['p1', 'p2']
+
+
+def test_index_is_built_in_the_background():
+    gate = threading.Event()
+    search, _, _ = make_search({'p1': ('Library', '', [])}, gate=gate, ready_timeout=0.05)
+    search.start()
+    # a search before the first build is done waits for it, up to ready_timeout
+    with pytest.raises(RuntimeError):
+        search.search('library', 10)
+    gate.set()
+    assert ids(search.search('library', 10)) == ['p1']
+
+
+def test_index_is_rebuilt_after_lost_events_while_searches_use_the_old_one():
+    documents = {'p1': ('Library', '', [])}
+    gate = threading.Event()
+    gate.set()
+    search, events, loads = make_search(documents, gate=gate, rebuild_interval=0)
+    search.search('library', 10)
+
+    # an event that never arrived, and a rebuild that takes a while
+    gate.clear()
+    documents['p2'] = ('Library annex', '', [])
+    search._queue.dropped += 1
+    assert ids(search.search('library', 10)) == ['p1']
+    # a post changed during the rebuild is reindexed after the swap too
+    documents['p1'] = ('Library', '', ['closed'])
+    events.publish({'type': 'status', 'id': 'p1'})
+    assert ids(search.search('closed', 10)) == ['p1']
+
+    gate.set()
+    wait_for(lambda: len(search.index) == 2)
+    assert sorted(ids(search.search('library', 10))) == ['p1', 'p2']
+    assert ids(search.search('closed', 10)) == ['p1']
+    assert loads.count(None) == 2
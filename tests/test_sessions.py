@@ -0,0 +1,106 @@
+import types
+from datetime import timedelta
+
+import pytest
+from flask import Flask, session
+
+import sessions
+from sessions import MemorySessionStore, ServerSessionInterface, SqliteSessionStore
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(sessions, 'time', types.SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path):
+    return MemorySessionStore() if request.param == 'memory' else SqliteSessionStore(str(tmp_path / 's.sqlite3'))
+
+
+def make_client(store, lifetime=600, refresh_interval=60):
+    app = Flask(__name__)
+    app.permanent_session_lifetime = timedelta(seconds=lifetime)
+    app.session_interface = ServerSessionInterface(store, refresh_interval=refresh_interval, sweep_interval=0)
+
+    @app.route('/login/<name>')
+    def login(name):
+        session.regenerate()
+        session['user'] = name
+        return ''
+
+    @app.route('/me')
+    def me():
+        return session.get('user', '')
+
+    @app.route('/logout')
+    def logout():
+        session.clear()
+        return ''
+
+    return app.test_client()
+
+
+def sid(client):
+    cookie = client.get_cookie('session')
+    return cookie.value if cookie else None
+
+
+def test_anonymous_visitors_get_no_session(store, clock):
+    client = make_client(store)
+    assert client.get('/me').text == ''
+    assert sid(client) is None
+
+
+def test_sign_in_rotates_the_session_id(store, clock):
+    client = make_client(store)
+    client.get('/login/alice')
+    first = sid(client)
+    assert client.get('/me').text == 'alice'
+
+    client.get('/login/bob')
+    second = sid(client)
+    assert second != first
+    assert store.load(first) is None
+    assert client.get('/me').text == 'bob'
+
+    # an id planted before sign-in is not carried over
+    client.set_cookie('session', 'planted')
+    client.get('/login/carol')
+    third = sid(client)
+    assert third not in (None, 'planted')
+
+    client.get('/logout')
+    assert sid(client) is None
+    assert store.load(third) is None
+
+
+def test_sessions_expire_after_their_last_use(store, clock):
+    client = make_client(store, lifetime=600, refresh_interval=60)
+    client.get('/login/alice')
+
+    # used within the refresh interval: no write, expiry is not moved
+    clock[0] += 30
+    assert client.get('/me').text == 'alice'
+    assert store.load(sid(client))[1] == 1000.0
+    # later use slides the expiry
+    clock[0] += 500
+    assert client.get('/me').text == 'alice'
+    assert store.load(sid(client))[1] == 1530.0
+    clock[0] += 599
+    assert client.get('/me').text == 'alice'
+
+    expired = sid(client)
+    clock[0] += 601
+    assert client.get('/me').text == ''
+    assert store.load(expired) is None
+
+
+def test_sweep_drops_expired_sessions(store, clock):
+    store.save('old', {'user': 'alice'}, 60)
+    store.save('new', {'user': 'bob'}, 600)
+    clock[0] += 61
+    assert store.sweep() == 1
+    assert store.load('new') == ({'user': 'bob'}, 1000.0)
@@ -0,0 +1,99 @@
+import json
+import os
+
+from upvotes import MemoryUpvoteStore, UpvoteEngine
+
+
+def make_engine(tmp_path, members=None, write_batch=None, **options):
+    members = members if members is not None else {}
+    written = []
+    engine = UpvoteEngine(MemoryUpvoteStore(), load_members=lambda rid: members.get(rid, set()),
+                          write_batch=write_batch or written.extend, journal_dir=str(tmp_path),
+                          flush_interval=3600, **options)
+    return engine, written
+
+
+def test_journal_of_a_dead_process_with_our_pid_is_replayed(tmp_path):
+    # a restarted worker reusing the pid of one that died with unflushed toggles
+    orphan = tmp_path / f'upvotes-{os.getpid()}-0.journal'
+    orphan.write_text(json.dumps({'r': 'post1', 'u': 'alice', 'm': True, 'a': None, 't': 0}) + '\n')
+    engine, written = make_engine(tmp_path)
+
+    engine.toggle('post2', 'bob')
+    engine.flush()
+
+    assert ('post1', 'alice', True, None) in written
+    assert not orphan.exists()
+    assert [p.name for p in tmp_path.iterdir()] == [os.path.basename(engine._journal_path())]
+
+
+def test_changes_failing_every_flush_are_dropped(tmp_path):
+    def write_batch(ops):
+        raise RuntimeError('JWT expired')
+
+    engine, _ = make_engine(tmp_path, members={'post1': {'carol'}}, write_batch=write_batch, max_attempts=3)
+    assert engine.toggle('post1', 'alice', 'token') == ('upvoted', 2)
+
+    for _ in range(3):
+        assert engine.flush() == 0
+    assert not engine._pending
+    # counts are read from likes again, without the change that never landed
+    assert engine.counts(['post1']) == {}
+    engine.ensure_loaded('post1')
+    assert engine.counts(['post1']) == {'post1': 1}
+    assert open(engine._journal_path()).read() == ''
+
+
+def test_toggles_coalesce_into_one_write_per_user(tmp_path):
+    engine, written = make_engine(tmp_path, members={'post1': {'carol'}})
+    assert engine.toggle('post1', 'alice', 't1') == ('upvoted', 2)
+    assert engine.toggle('post1', 'alice', 't2') == ('unupvoted', 1)
+    assert engine.toggle('post1', 'alice', 't3') == ('upvoted', 2)
+    assert engine.toggle('post1', 'carol', 't4') == ('unupvoted', 1)
+
+    assert engine.flush() == 2
+    assert written == [('post1', 'alice', True, 't3'), ('post1', 'carol', False, 't4')]
+    assert engine.flush() == 0
+
+
+def test_journal_keeps_only_what_is_pending(tmp_path):
+    calls = []
+
+    def write_batch(ops):
+        calls.append(ops)
+        if len(calls) == 1:
+            raise RuntimeError('backend down')
+
+    engine, _ = make_engine(tmp_path, write_batch=write_batch)
+    engine.toggle('post1', 'alice', 't1')
+    engine.toggle('post1', 'alice', 't2')
+    engine.toggle('post2', 'bob', 't3')
+
+    def journaled():
+        with open(engine._journal_path()) as f:
+            return [(e['r'], e['u'], e['m']) for e in map(json.loads, f)]
+
+    # every toggle is appended until a flush succeeds
+    assert journaled() == [('post1', 'alice', True), ('post1', 'alice', False), ('post2', 'bob', True)]
+    assert engine.flush() == 0
+    assert engine.flush() == 2
+    assert journaled() == []
+    engine.toggle('post2', 'bob', 't4')
+    assert journaled() == [('post2', 'bob', False)]
+
+
+def test_journal_of_a_dead_process_is_replayed_with_its_tokens(tmp_path):
+    orphan = tmp_path / 'upvotes-999999999-123.journal'
+    orphan.write_text(''.join(json.dumps({'r': 'post1', 'u': 'alice', 'm': member, 'a': token, 't': 0}) + '\n'
+                              for member, token in ((True, 't1'), (False, 't2'))) + '{"r": "post1", "u')
+    alive = tmp_path / f'upvotes-{os.getppid()}-alive.journal'
+    alive.write_text(json.dumps({'r': 'post2', 'u': 'bob', 'm': True, 'a': None, 't': 0}) + '\n')
+    engine, written = make_engine(tmp_path)
+
+    engine.toggle('post3', 'carol')
+
+    # the latest change per user wins; the torn last line is skipped, and
+    # the journal of a process that still runs is left to it
+    assert written == [('post1', 'alice', False, 't2')]
+    assert not orphan.exists()
+    assert alive.exists()
@@ -0,0 +1,206 @@
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # variants are skipped without Pillow
+    Image = None
+
+
+class UploadError(Exception):
+    pass
+
+
+# (magic bytes, content type, extension)
+IMAGE_SIGNATURES = [
+    (b'\xff\xd8\xff', 'image/jpeg', '.jpg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png', '.png'),
+    (b'GIF87a', 'image/gif', '.gif'),
+    (b'GIF89a', 'image/gif', '.gif'),
+]
+
+
+def sniff_image_type(head):
+    """(content_type, ext) from a file's first bytes, or None if it isn't a supported image."""
+    for magic, content_type, ext in IMAGE_SIGNATURES:
+        if head.startswith(magic):
+            return content_type, ext
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp', '.webp'
+    return None
+
+
+def spool_upload(file_storage, max_bytes, chunk_size=64 * 1024):
+    """Stream an uploaded file to a temporary file without holding it in memory.
+
+    Returns (path, content_type, ext); the content type comes from the file's
+    magic bytes, not the client-supplied mimetype. Raises UploadError when
+    the file is too large or not an image.
+    """
+    fd, path = tempfile.mkstemp(prefix='morphx-upload-')
+    size = 0
+    head = b''
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = file_storage.stream.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadError(f"Image is larger than {max_bytes // (1024 * 1024)} MB")
+                if len(head) < 16:
+                    head += chunk[:16 - len(head)]
+                out.write(chunk)
+        kind = sniff_image_type(head)
+        if kind is None:
+            raise UploadError("Upload a JPEG, PNG, GIF or WebP image")
+        return path, kind[0], kind[1]
+    except Exception:
+        os.remove(path)
+        raise
+
+
+def make_variants(path, widths, quality=80):
+    """Resized WebP copies of an image, one per requested width.
+
+    Returns [(width, temp_path)]; the caller removes the files.
+    """
+    if Image is None:
+        return []
+    variants = []
+    with Image.open(path) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+        # never upscale: widths past the original collapse into one full-size copy
+        for width in sorted({min(w, image.width) for w in widths}):
+            resized = image.copy()
+            resized.thumbnail((width, width * 10))
+            fd, variant_path = tempfile.mkstemp(prefix='morphx-variant-', suffix='.webp')
+            os.close(fd)
+            variants.append((width, variant_path))
+            resized.save(variant_path, 'WEBP', quality=quality, method=4)
+    return variants
+
+
+class SupabaseImageStorage:
+    """Uploads to a Supabase Storage bucket and returns public URLs."""
+
+    def __init__(self, bucket):
+        self.bucket = bucket
+
+    def put(self, key, path, content_type, client):
+        # a path (not bytes) makes storage3 stream the file
+        client.storage.from_(self.bucket).upload(
+            key, path, {'content-type': content_type, 'cache-control': '31536000', 'upsert': 'true'})
+        return client.storage.from_(self.bucket).get_public_url(key)
+
+    def delete(self, keys, client):
+        if keys:
+            client.storage.from_(self.bucket).remove(list(keys))
+
+    def key_for(self, url):
+        """Storage key of a public URL from this bucket, else None."""
+        marker = f'/{self.bucket}/'
+        if not url or marker not in url:
+            return None
+        return url.split(marker, 1)[1].split('?', 1)[0]
+
+
+class LocalImageStorage:
+    """Filesystem stand-in for Supabase Storage; files are served from base_url."""
+
+    def __init__(self, root, base_url='/uploads/'):
+        self.root = root
+        self.base_url = base_url
+
+    def put(self, key, path, content_type, client=None):
+        target = os.path.join(self.root, key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copyfile(path, target)
+        return self.base_url + key
+
+    def delete(self, keys, client=None):
+        for key in keys:
+            try:
+                os.remove(os.path.join(self.root, key))
+            except FileNotFoundError:
+                pass
+
+    def key_for(self, url):
+        if not url or not url.startswith(self.base_url):
+            return None
+        return url[len(self.base_url):].split('?', 1)[0]
+
+
+def make_image_storage(url):
+    """Build image storage from a URL: supabase://<bucket> or file://<directory>."""
+    if url.startswith('supabase://'):
+        return SupabaseImageStorage(url[len('supabase://'):] or 'images')
+    if url.startswith('file://'):
+        return LocalImageStorage(os.path.abspath(url[len('file://'):]))
+    raise ValueError(f"Unsupported image storage URL: {url}")
+
+
+class ImagePipeline:
+    """Background resizing and upload of post images.
+
+    submit() returns immediately; a worker makes the WebP variants, uploads
+    the original and the variants in parallel and hands the URLs to the
+    on_done callback. Spooled and temporary files are always removed.
+    """
+
+    def __init__(self, storage, widths=(320, 640, 1280), workers=2, upload_workers=4):
+        self.storage = storage
+        self.widths = widths
+        self.workers = workers
+        self.upload_workers = upload_workers
+        self._pools = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _get_pools(self):
+        if self._pools is None or self._pid != os.getpid():
+            with self._lock:
+                if self._pools is None or self._pid != os.getpid():
+                    self._pools = (ThreadPoolExecutor(self.workers, thread_name_prefix='image-worker'),
+                                   ThreadPoolExecutor(self.upload_workers, thread_name_prefix='image-upload'))
+                    self._pid = os.getpid()
+        return self._pools
+
+    def submit(self, spooled, key_base, client, on_done):
+        """Process a spool_upload() result stored under `key_base` (no extension)."""
+        workers, _ = self._get_pools()
+        return workers.submit(self._process, spooled, key_base, client, on_done)
+
+    def keys_for(self, image_url, variants, key_prefix):
+        """Storage keys of a post's uploaded image and its variants; links to
+        images stored elsewhere (or under another prefix) are left out."""
+        keys = [self.storage.key_for(url) for url in [image_url] + list((variants or {}).values())]
+        return [key for key in keys if key and key.startswith(key_prefix)]
+
+    def _process(self, spooled, key_base, client, on_done):
+        path, content_type, ext = spooled
+        variants = []
+        try:
+            try:
+                variants = make_variants(path, self.widths)
+            except Exception as e:
+                print(f"Image resize failed for {key_base}: {e}")
+            jobs = [(f"{key_base}{ext}", path, content_type)]
+            jobs += [(f"{key_base}-{width}w.webp", variant_path, 'image/webp') for width, variant_path in variants]
+            _, uploads = self._get_pools()
+            urls = list(uploads.map(lambda job: self.storage.put(*job, client=client), jobs))
+            on_done(urls[0], {str(width): url for (width, _), url in zip(variants, urls[1:])})
+        except Exception as e:
+            print(f"Image processing failed for {key_base}: {e}")
+        finally:
+            for p in [path] + [variant_path for _, variant_path in variants]:
+                try:
+                    os.remove(p)
+                except OSError:
+                    pass
@@ -0,0 +1,391 @@
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+
+class MemoryUpvoteStore:
+    """Per-resource sets of upvoting users, kept for the most recently used resources.
+
+    A set is reloaded from `likes` once it is `ttl` seconds old (0 keeps it
+    until evicted), so likes written by other processes show up; a stale
+    set is left out of counts() until then.
+    """
+
+    def __init__(self, max_resources=10000, ttl=300):
+        self.max_resources = max_resources
+        self.ttl = ttl
+        self._members = OrderedDict()
+        self._loaded_at = {}
+        self._lock = threading.Lock()
+
+    def _fresh(self, resource_id):
+        loaded_at = self._loaded_at.get(resource_id)
+        return loaded_at is not None and (not self.ttl or time.time() - loaded_at < self.ttl)
+
+    def loaded(self, resource_id):
+        with self._lock:
+            return self._fresh(resource_id)
+
+    def load(self, resource_id, user_ids):
+        with self._lock:
+            if not self._fresh(resource_id):
+                self._members[resource_id] = set(user_ids)
+                self._members.move_to_end(resource_id)
+                self._loaded_at[resource_id] = time.time()
+                while len(self._members) > self.max_resources:
+                    evicted, _ = self._members.popitem(last=False)
+                    self._loaded_at.pop(evicted, None)
+
+    def set_member(self, resource_id, user_id, member):
+        with self._lock:
+            members = self._members.get(resource_id)
+            if members is not None:
+                if member:
+                    members.add(user_id)
+                else:
+                    members.discard(user_id)
+
+    def toggle(self, resource_id, user_id):
+        with self._lock:
+            members = self._members.setdefault(resource_id, set())
+            self._members.move_to_end(resource_id)
+            if user_id in members:
+                members.discard(user_id)
+                return False, len(members)
+            members.add(user_id)
+            return True, len(members)
+
+    def counts(self, resource_ids):
+        """{resource_id: count} of the loaded, fresh resources."""
+        with self._lock:
+            return {rid: len(self._members[rid]) for rid in resource_ids if self._fresh(rid)}
+
+    def forget(self, resource_id):
+        with self._lock:
+            self._members.pop(resource_id, None)
+            self._loaded_at.pop(resource_id, None)
+
+
+class RedisUpvoteStore:
+    """Same interface as MemoryUpvoteStore on Redis sets, shared by all workers."""
+
+    def __init__(self, client, prefix='morphx:upvotes:', ttl=300):
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def _members_key(self, resource_id):
+        return f"{self.prefix}m:{resource_id}"
+
+    def _loaded_key(self, resource_id):
+        return f"{self.prefix}l:{resource_id}"
+
+    def loaded(self, resource_id):
+        return bool(self.client.exists(self._loaded_key(resource_id)))
+
+    def load(self, resource_id, user_ids):
+        # only the first worker to (re)load a resource seeds it; the marker
+        # expires after ttl seconds so the set is read from `likes` again
+        if self.client.set(self._loaded_key(resource_id), 1, nx=True, ex=self.ttl or None):
+            user_ids = list(user_ids)
+            pipe = self.client.pipeline()
+            pipe.delete(self._members_key(resource_id))
+            if user_ids:
+                pipe.sadd(self._members_key(resource_id), *user_ids)
+            pipe.execute()
+
+    def set_member(self, resource_id, user_id, member):
+        if member:
+            self.client.sadd(self._members_key(resource_id), user_id)
+        else:
+            self.client.srem(self._members_key(resource_id), user_id)
+
+    def toggle(self, resource_id, user_id):
+        key = self._members_key(resource_id)
+        member = bool(self.client.sadd(key, user_id))
+        if not member:
+            self.client.srem(key, user_id)
+        return member, self.client.scard(key)
+
+    def counts(self, resource_ids):
+        """{resource_id: count} of the loaded resources, in one round trip."""
+        resource_ids = list(resource_ids)
+        pipe = self.client.pipeline(transaction=False)
+        for rid in resource_ids:
+            pipe.exists(self._loaded_key(rid))
+            pipe.scard(self._members_key(rid))
+        replies = pipe.execute() if resource_ids else []
+        return {rid: count for rid, loaded, count in zip(resource_ids, replies[::2], replies[1::2]) if loaded}
+
+    def forget(self, resource_id):
+        self.client.delete(self._members_key(resource_id), self._loaded_key(resource_id))
+
+
+class UpvoteEngine:
+    """Upvote toggles answered from the store, written to `likes` in the background.
+
+    Pending writes are keyed by (resource_id, user_id) and hold the latest
+    desired membership, so bursts of toggles coalesce into at most one
+    insert or delete per user and resource. Writes are idempotent (the app
+    upserts with a deterministic id and deletes by resource/user), and every
+    change is appended to a per-process journal, with the access token it is
+    written with, that a later process replays if this one dies before
+    flushing. The store reloads a resource's members every so often; writes
+    pending or in flight are applied on top of what was loaded. A change
+    that fails `max_attempts` flushes in a row is dropped (its token has
+    likely expired) and the resource is reloaded from `likes`.
+
+    load_members(resource_id) returns the user ids with a like in the
+    database; write_batch(ops) applies a list of
+    (resource_id, user_id, member, access_token) tuples.
+    """
+
+    def __init__(self, store, load_members, write_batch, journal_dir=None,
+                 flush_interval=1.0, batch_size=500, max_attempts=10):
+        self.store = store
+        self.load_members = load_members
+        self.write_batch = write_batch
+        self.journal_dir = journal_dir
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self._pending = OrderedDict()
+        self._attempts = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._journal = None
+        self._pid = None
+        self._stamp = None
+        self._wake = threading.Event()
+
+    # -- reads -----------------------------------------------------------
+
+    def _apply_pending(self, resource_id):
+        with self._lock:
+            ops = list(self._inflight.items()) + list(self._pending.items())
+        pending = [(user_id, op[0]) for (rid, user_id), op in ops if rid == resource_id]
+        for user_id, member in pending:
+            self.store.set_member(resource_id, user_id, member)
+
+    def seed(self, resource_id, user_ids):
+        """Load a resource's members from rows the caller already fetched."""
+        if not self.store.loaded(resource_id):
+            self.store.load(resource_id, user_ids)
+            self._apply_pending(resource_id)
+
+    def ensure_loaded(self, resource_id):
+        if not self.store.loaded(resource_id):
+            self.seed(resource_id, self.load_members(resource_id))
+
+    def counts(self, resource_ids):
+        """{resource_id: count} for the resources the store knows about."""
+        return self.store.counts(resource_ids)
+
+    # -- writes ----------------------------------------------------------
+
+    def toggle(self, resource_id, user_id, access_token=None):
+        """Flip the user's upvote; returns ('upvoted'|'unupvoted', new count)."""
+        self._ensure_started()
+        self.ensure_loaded(resource_id)
+        member, count = self.store.toggle(resource_id, user_id)
+        with self._lock:
+            self._pending[(resource_id, user_id)] = (member, access_token)
+            self._pending.move_to_end((resource_id, user_id))
+            self._attempts.pop((resource_id, user_id), None)
+            self._append_journal(resource_id, user_id, member, access_token)
+            backlog = len(self._pending)
+        if backlog >= self.batch_size:
+            self._wake.set()
+        return ('upvoted' if member else 'unupvoted'), count
+
+    def forget(self, resource_id):
+        """Drop a deleted resource and any writes still pending for it."""
+        with self._lock:
+            for key in [k for k in self._pending if k[0] == resource_id]:
+                del self._pending[key]
+        self.store.forget(resource_id)
+
+    def flush(self):
+        """Write pending changes now; failed ones are retried on the next flush."""
+        with self._flush_lock:
+            with self._lock:
+                batch = list(self._pending.items())[:self.batch_size]
+                for key, _ in batch:
+                    del self._pending[key]
+                # a resource reloaded from `likes` meanwhile still gets these
+                self._inflight = dict(batch)
+            if not batch:
+                return 0
+            try:
+                self.write_batch([(rid, uid, member, token) for (rid, uid), (member, token) in batch])
+            except Exception as e:
+                print(f"Upvote flush failed: {e}")
+                dropped = set()
+                with self._lock:
+                    for key, op in batch:
+                        if key in self._pending:
+                            continue  # a newer toggle replaced it
+                        attempts = self._attempts.get(key, 0) + 1
+                        if attempts >= self.max_attempts:
+                            self._attempts.pop(key, None)
+                            dropped.add(key[0])
+                            continue
+                        self._attempts[key] = attempts
+                        self._pending[key] = op
+                    self._inflight = {}
+                    if dropped:
+                        self._compact_journal()
+                for resource_id in dropped:
+                    print(f"Upvote changes on {resource_id} dropped after {self.max_attempts} failed flushes")
+                    self.store.forget(resource_id)
+                return 0
+            with self._lock:
+                for key, _ in batch:
+                    self._attempts.pop(key, None)
+                self._inflight = {}
+                self._compact_journal()
+            return len(batch)
+
+    # -- background flusher and journal -----------------------------------
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stamp = _process_start(self._pid) or uuid.uuid4().hex
+            self._journal = None
+            self._pending.clear()
+            self._attempts.clear()
+        self.replay_orphans()
+        threading.Thread(target=self._run, daemon=True, name='upvote-flusher').start()
+        atexit.register(self._drain)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            while self.flush() == self.batch_size:
+                pass
+
+    def _drain(self):
+        for _ in range(10):
+            if not self._pending or not self.flush():
+                break
+
+    def _journal_path(self):
+        # the start time (or a random stamp) tells this process's journal
+        # from one left by a dead process that had the same pid
+        return os.path.join(self.journal_dir, f"upvotes-{self._pid}-{self._stamp}.journal")
+
+    def _append_journal(self, resource_id, user_id, member, access_token):
+        if not self.journal_dir:
+            return
+        try:
+            if self._journal is None:
+                os.makedirs(self.journal_dir, exist_ok=True)
+                self._journal = open(self._journal_path(), 'a', encoding='utf-8')
+            self._journal.write(json.dumps({'r': resource_id, 'u': user_id, 'm': member, 'a': access_token,
+                                            't': time.time()}) + '\n')
+            self._journal.flush()
+        except Exception as e:
+            print(f"Upvote journal write failed: {e}")
+
+    def _compact_journal(self):
+        """Rewrite this process's journal with only what is still pending."""
+        if not self.journal_dir or self._journal is None:
+            return
+        try:
+            self._journal.close()
+            path = self._journal_path()
+            tmp = path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                for (rid, uid), (member, token) in self._pending.items():
+                    f.write(json.dumps({'r': rid, 'u': uid, 'm': member, 'a': token, 't': time.time()}) + '\n')
+            os.replace(tmp, path)
+            self._journal = open(path, 'a', encoding='utf-8')
+        except Exception as e:
+            print(f"Upvote journal compaction failed: {e}")
+            self._journal = None
+
+    def replay_orphans(self):
+        """Apply journals left behind by processes that exited without flushing,
+        each change with the token it was journaled with."""
+        if not self.journal_dir:
+            return
+        own = self._journal_path()
+        for path in glob.glob(os.path.join(self.journal_dir, 'upvotes-*.journal')):
+            name = os.path.basename(path)[len('upvotes-'):-len('.journal')]
+            pid, _, stamp = name.partition('-')
+            try:
+                pid = int(pid)
+            except ValueError:
+                continue
+            if path == own or (pid != os.getpid() and _process_alive(pid, stamp)):
+                continue
+            claimed = f"{path}.replay-{os.getpid()}"
+            try:
+                # rename is atomic: only one process gets to replay a journal
+                os.rename(path, claimed)
+            except OSError:
+                continue
+            latest = OrderedDict()
+            with open(claimed, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line
+                    latest[(entry['r'], entry['u'])] = (entry['m'], entry.get('a'))
+            try:
+                if latest:
+                    self.write_batch([(rid, uid, member, token) for (rid, uid), (member, token) in latest.items()])
+                os.remove(claimed)
+            except Exception as e:
+                print(f"Upvote journal replay failed for {claimed}: {e}")
+                os.rename(claimed, path)
+
+
+def _process_start(pid):
+    """Start time of `pid` in clock ticks since boot (Linux), else None."""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            # the command name may contain spaces; fields follow its ')'
+            return f.read().rsplit(')', 1)[1].split()[19]
+    except (OSError, IndexError):
+        return None
+
+
+def _process_alive(pid, stamp=''):
+    """Whether `pid` runs and, if its journal recorded a start time, is still
+    the same process."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    start = _process_start(pid)
+    return not (stamp and start and stamp.isdigit() and start != stamp)
+
+
+def make_upvote_store(url, max_resources=10000, ttl=300):
+    """Build an upvote store from a URL: memory:// or redis://host:port/db;
+    members are reloaded from `likes` every `ttl` seconds."""
+    if not url or url.startswith('memory://'):
+        return MemoryUpvoteStore(max_resources=max_resources, ttl=ttl)
+    if url.startswith(('redis://', 'rediss://')):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("Install the 'redis' package to use a redis:// upvote store URL")
+        return RedisUpvoteStore(redis.Redis.from_url(url, decode_responses=True), ttl=ttl)
+    raise ValueError(f"Unsupported upvote store URL: {url}")